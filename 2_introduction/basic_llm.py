@@ -1,6 +1,11 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.http_clients import pooled_chat_openai
 
 
 # Load variables from .env
@@ -11,7 +16,8 @@ if not api_key:
     raise ValueError("OPENAI_API_KEY not found. Check your .env file.")
 
 # Initialize LLM
-llm = ChatOpenAI(api_key=api_key)  # or ChatOpenAI(openai_api_key=api_key) depending on version
+# ChatOpenAI(api_key=api_key) on the shared connection pool (shared/http_clients.py)
+llm = pooled_chat_openai(api_key=api_key)
 
 # Standard Invoke call
 try:
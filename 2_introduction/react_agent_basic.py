@@ -1,45 +1,68 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
 from langchain_tavily import TavilySearch
 from langchain.agents import create_agent
 
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.http_clients import pooled_chat_openai, pooled_tavily_search
+from shared.local_search import local_search
+
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found. Check your .env file.")
-if not TAVILY_API_KEY:
-    raise ValueError("TAVILY_API_KEY not found. Add it to your .env file.")
+def build_llm() -> ChatOpenAI:
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found. Check your .env file.")
+
+    # model and search clients share one keep-alive connection pool (shared/http_clients.py)
+    return pooled_chat_openai(
+        api_key=OPENAI_API_KEY,
+        model="gpt-4o-mini",
+        temperature=0.7,
+    )
+
+
+# SEARCH_BACKEND=local: the local index (shared/local_search.py) instead of the Tavily api
+def build_tavily_tool() -> TavilySearch:
+    if os.getenv("SEARCH_BACKEND", "tavily").lower() == "local":
+        return local_search(max_results=5)
+    if not os.getenv("TAVILY_API_KEY"):
+        raise ValueError("TAVILY_API_KEY not found. Add it to your .env file.")
 
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model="gpt-4o-mini",
-    temperature=0.7,
-)
+    return pooled_tavily_search(
+        max_results=5,
+        search_depth="basic",
+    )
 
-tavily_tool = TavilySearch(
-    max_results=5,
-    search_depth="basic",
-)
 
 # Create the ReAct agent using the latest create_agent function
 # This is the modern approach from langchain.agents
 # this create agent is providing tool to the llm
-agent_executor = create_agent(
-    model=llm,
-    tools=[tavily_tool],
-)
-
-# Example usage:
-response = agent_executor.invoke({"messages": [("user", "What is the weather in San Francisco?")]})
-print("\n=== Agent Response ===")
-for message in response["messages"]:
-    print(f"{message.type}: {message.content}")
-    print()
+# llm / tools can be passed in (e.g. fake ones in benchmarks/), by default the real clients are built
+# middleware: hooks around the model / tool calls (react_runner.py adds caching and a budget)
+def build_agent(llm=None, tools=None, middleware=()):
+    return create_agent(
+        model=llm if llm is not None else build_llm(),
+        tools=tools if tools is not None else [build_tavily_tool()],
+        middleware=middleware,
+    )
+
+
+if __name__ == "__main__":
+    agent_executor = build_agent()
+
+    # Example usage:
+    response = agent_executor.invoke({"messages": [("user", "What is the weather in San Francisco?")]})
+    print("\n=== Agent Response ===")
+    for message in response["messages"]:
+        print(f"{message.type}: {message.content}")
+        print()
 
 """
 ReAct pattern is all about - Reasoning, Action, and Observation
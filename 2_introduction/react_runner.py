@@ -0,0 +1,401 @@
+"""
+Production runner for the ReAct agent of react_agent_basic.py
+
+build_agent() gives the plain reason -> act -> observe loop: no limit on the
+number of cycles, and the same search is paid for again in every run (and
+sometimes twice in one run). The runner builds the same agent with two
+middlewares and a trace:
+
+    ToolResultCacheMiddleware   identical tool calls (tool name + arguments, strings
+                                lower-cased / whitespace collapsed) are answered without
+                                calling the tool:
+                                  run     - an earlier ToolMessage of this run (from the
+                                            message history, so it survives checkpoints)
+                                  shared  - ToolResultCache, shared by all runs in the
+                                            process, LRU + TTL
+                                  joined  - the same call is already running (two calls
+                                            of one turn, or another run): wait for it
+                                errors are never cached: neither a tool that raised
+                                (status="error") nor one that returns its own error
+                                (TavilySearch: {"error": e})
+    ReActBudget                 before every model call: stop when the run made
+                                max_steps model calls or used max_tokens tokens since
+                                the last user message; the agent ends with an AIMessage
+                                saying so and state["stop_reason"] is set
+                                ("max_steps" / "max_tokens", None for a normal answer)
+    ReActTrace                  callback handler, one per run: per cycle the time in
+                                the model (reasoning) and in the tools step (wall time of
+                                the parallel tool calls, and their summed time)
+
+Tool calls of one AI turn already run concurrently: create_agent sends every call
+to the tools node as its own task, sync tools go to LangGraph's thread pool and
+async tools are awaited together. max_parallel_tools caps how many run at once
+(the run's max_concurrency).
+
+    agent = build_react_runner(max_steps=6, max_tokens=20_000)
+    result, trace = run_react(agent, "What is the weather in San Francisco?")
+    print(trace.summary_table())
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, hook_config
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from typing_extensions import NotRequired
+
+from react_agent_basic import build_agent
+
+DEFAULT_MAX_STEPS = 8
+DEFAULT_MAX_TOKENS = 50_000
+DEFAULT_MAX_PARALLEL_TOOLS = 8
+DEFAULT_TOOL_CACHE_TTL_SECONDS = 15 * 60
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def tool_call_key(name: str, args: Any) -> Tuple[str, str]:
+    return name, json.dumps(_normalize(args), sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """Tool results shared across runs: LRU with a TTL, plus the calls still running."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TOOL_CACHE_TTL_SECONDS, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (stored_at, (content, artifact))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, tuple]]" = OrderedDict()
+        # key -> Future of the call that is running now
+        self._running: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.run_hits = 0
+        self.shared_hits = 0
+        self.joined = 0
+        self.misses = 0
+
+    def lookup(self, key: Tuple[str, str]) -> Tuple[Optional[tuple], Optional[Future], bool]:
+        """(cached result, running future, caller must run it)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.shared_hits += 1
+                return entry[1], None, False
+            if entry is not None:
+                del self._entries[key]
+            running = self._running.get(key)
+            if running is not None:
+                self.joined += 1
+                return None, running, False
+            self.misses += 1
+            self._running[key] = Future()
+            return None, self._running[key], True
+
+    def finish(self, key: Tuple[str, str], message: Any, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            future = self._running.pop(key, None)
+            ok = error is None and isinstance(message, ToolMessage) and not is_tool_error(message)
+            if ok:
+                self._entries[key] = (time.time(), (message.content, message.artifact))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if future is not None:
+            # waiting calls get the result, or run the tool themselves when it failed
+            future.set_result((message.content, message.artifact) if ok else None)
+
+    def count_run_hit(self) -> None:
+        with self._lock:
+            self.run_hits += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.run_hits + self.shared_hits + self.joined
+            lookups = hits + self.misses
+            return {
+                "run_hits": self.run_hits,
+                "shared_hits": self.shared_hits,
+                "joined": self.joined,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+def is_tool_error(message: ToolMessage) -> bool:
+    # status="error" when the tool raised; tools that catch their own exceptions
+    # (TavilySearch returns {"error": e}) come back as a "successful" {"error": ...}
+    if message.status == "error":
+        return True
+    content = message.content
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            # str() of the dict when the error object is not json serializable
+            return content.startswith("{'error'")
+    return isinstance(content, dict) and "error" in content
+
+
+def _since_last_user(messages: List[Any]) -> List[Any]:
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index + 1:]
+    return messages
+
+
+def _earlier_result(messages: List[Any], key: Tuple[str, str]) -> Optional[ToolMessage]:
+    # the ToolMessage answering an earlier identical call of this run
+    call_ids = {
+        call["id"]
+        for message in _since_last_user(messages)
+        if isinstance(message, AIMessage)
+        for call in message.tool_calls
+        if tool_call_key(call["name"], call["args"]) == key
+    }
+    for message in messages:
+        if isinstance(message, ToolMessage) and message.tool_call_id in call_ids and not is_tool_error(message):
+            return message
+    return None
+
+
+def _cached_message(request: Any, content: Any, artifact: Any, source: str) -> ToolMessage:
+    call = request.tool_call
+    return ToolMessage(
+        content=content,
+        artifact=artifact,
+        name=call["name"],
+        tool_call_id=call["id"],
+        response_metadata={"cached": source},
+    )
+
+
+class ToolResultCacheMiddleware(AgentMiddleware):
+    def __init__(self, cache: ToolResultCache):
+        super().__init__()
+        self.cache = cache
+
+    def _from_run(self, request: Any, key: Tuple[str, str]) -> Optional[ToolMessage]:
+        earlier = _earlier_result(request.state.get("messages", []), key)
+        if earlier is None:
+            return None
+        self.cache.count_run_hit()
+        return _cached_message(request, earlier.content, earlier.artifact, "run")
+
+    def wrap_tool_call(self, request, handler):
+        key = tool_call_key(request.tool_call["name"], request.tool_call["args"])
+        earlier = self._from_run(request, key)
+        if earlier is not None:
+            return earlier
+        cached, running, owner = self.cache.lookup(key)
+        if cached is None and not owner:
+            cached = running.result()
+            if cached is None:
+                # the call we waited for failed: try it ourselves, without the cache
+                return handler(request)
+            return _cached_message(request, *cached, "joined")
+        if cached is not None:
+            return _cached_message(request, *cached, "shared")
+        try:
+            message = handler(request)
+        except BaseException as error:
+            self.cache.finish(key, None, error)
+            raise
+        self.cache.finish(key, message)
+        return message
+
+    async def awrap_tool_call(self, request, handler):
+        key = tool_call_key(request.tool_call["name"], request.tool_call["args"])
+        earlier = self._from_run(request, key)
+        if earlier is not None:
+            return earlier
+        cached, running, owner = self.cache.lookup(key)
+        if cached is None and not owner:
+            cached = await asyncio.wrap_future(running)
+            if cached is None:
+                return await handler(request)
+            return _cached_message(request, *cached, "joined")
+        if cached is not None:
+            return _cached_message(request, *cached, "shared")
+        try:
+            message = await handler(request)
+        except BaseException as error:
+            self.cache.finish(key, None, error)
+            raise
+        self.cache.finish(key, message)
+        return message
+
+
+class ReActState(AgentState):
+    stop_reason: NotRequired[Optional[str]]
+
+
+def budget_reason(messages: List[Any], max_steps: int, max_tokens: int) -> Optional[str]:
+    replies = [m for m in _since_last_user(messages) if isinstance(m, AIMessage)]
+    if len(replies) >= max_steps:
+        return "max_steps"
+    tokens = sum((m.usage_metadata or {}).get("total_tokens", 0) for m in replies)
+    if tokens >= max_tokens:
+        return "max_tokens"
+    return None
+
+
+class ReActBudget(AgentMiddleware):
+    state_schema = ReActState
+
+    def __init__(self, max_steps: int = DEFAULT_MAX_STEPS, max_tokens: int = DEFAULT_MAX_TOKENS):
+        super().__init__()
+        self.max_steps = max_steps
+        self.max_tokens = max_tokens
+
+    @hook_config(can_jump_to=["end"])
+    def before_model(self, state, runtime) -> Optional[dict]:
+        reason = budget_reason(state["messages"], self.max_steps, self.max_tokens)
+        if reason is None:
+            # a new question on the same thread starts without the previous stop reason
+            return {"stop_reason": None} if state.get("stop_reason") else None
+        budget = f"{self.max_steps} steps" if reason == "max_steps" else f"{self.max_tokens} tokens"
+        return {
+            "messages": [AIMessage(content=f"Stopped before a final answer: the run used its budget of {budget}.")],
+            "stop_reason": reason,
+            "jump_to": "end",
+        }
+
+
+class ReActTrace(BaseCallbackHandler):
+    """Reasoning vs tool time per cycle (one model call + the tool calls it asked for)."""
+
+    MODEL_NODE = "model"
+    TOOLS_NODE = "tools"
+
+    def __init__(self):
+        self.cycles: List[dict] = []
+        self._open: Dict[Any, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node not in (self.MODEL_NODE, self.TOOLS_NODE) or kwargs.get("name") != node:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._open[run_id] = (node, now)
+            if node == self.MODEL_NODE:
+                self.cycles.append({
+                    "cycle": len(self.cycles) + 1, "reasoning_ms": 0.0, "tool_calls": 0,
+                    "tools_wall_ms": 0.0, "tools_sum_ms": 0.0, "_first": None, "_last": None,
+                })
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id):
+        now = time.perf_counter()
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+            if opened is None or not self.cycles:
+                return
+            node, started = opened
+            cycle = self.cycles[-1]
+            if node == self.MODEL_NODE:
+                cycle["reasoning_ms"] += (now - started) * 1000
+                return
+            # tool calls of a turn overlap: wall = first start .. last end
+            cycle["tool_calls"] += 1
+            cycle["tools_sum_ms"] += (now - started) * 1000
+            cycle["_first"] = started if cycle["_first"] is None else min(cycle["_first"], started)
+            cycle["_last"] = now if cycle["_last"] is None else max(cycle["_last"], now)
+            cycle["tools_wall_ms"] = (cycle["_last"] - cycle["_first"]) * 1000
+
+    def summary(self) -> dict:
+        with self._lock:
+            reasoning = sum(c["reasoning_ms"] for c in self.cycles)
+            tools = sum(c["tools_wall_ms"] for c in self.cycles)
+            return {
+                "cycles": len(self.cycles),
+                "reasoning_ms": round(reasoning, 3),
+                "tools_ms": round(tools, 3),
+                "tool_calls": sum(c["tool_calls"] for c in self.cycles),
+                "reasoning_share": reasoning / (reasoning + tools) if reasoning + tools else 0.0,
+            }
+
+    def summary_table(self) -> str:
+        header = f"{'cycle':>5} {'reasoning ms':>13} {'tool calls':>11} {'tools wall ms':>14} {'tools sum ms':>13}"
+        lines = [header, "-" * len(header)]
+        with self._lock:
+            for c in self.cycles:
+                lines.append(
+                    f"{c['cycle']:5} {c['reasoning_ms']:13.1f} {c['tool_calls']:11} "
+                    f"{c['tools_wall_ms']:14.1f} {c['tools_sum_ms']:13.1f}"
+                )
+        return "\n".join(lines)
+
+
+# one cache for every agent built in this process (cross-run reuse)
+@lru_cache(maxsize=None)
+def get_tool_cache() -> ToolResultCache:
+    return ToolResultCache()
+
+
+def build_react_runner(
+    llm=None,
+    tools=None,
+    max_steps: int = DEFAULT_MAX_STEPS,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: Optional[ToolResultCache] = None,
+):
+    """build_agent() with the tool-result cache and the step / token budget."""
+    return build_agent(
+        llm=llm,
+        tools=tools,
+        middleware=[ToolResultCacheMiddleware(cache or get_tool_cache()), ReActBudget(max_steps, max_tokens)],
+    )
+
+
+def _run_config(config: Optional[dict], trace: ReActTrace, max_parallel_tools: int) -> dict:
+    config = dict(config or {})
+    config["callbacks"] = [*(config.get("callbacks") or []), trace]
+    config.setdefault("max_concurrency", max_parallel_tools)
+    return config
+
+
+def run_react(agent, question: str, config: Optional[dict] = None, max_parallel_tools: int = DEFAULT_MAX_PARALLEL_TOOLS):
+    trace = ReActTrace()
+    result = agent.invoke({"messages": [("user", question)]}, _run_config(config, trace, max_parallel_tools))
+    return result, trace
+
+
+async def arun_react(agent, question: str, config: Optional[dict] = None, max_parallel_tools: int = DEFAULT_MAX_PARALLEL_TOOLS):
+    trace = ReActTrace()
+    result = await agent.ainvoke({"messages": [("user", question)]}, _run_config(config, trace, max_parallel_tools))
+    return result, trace
+
+
+if __name__ == "__main__":
+    agent = build_react_runner(max_steps=6, max_tokens=20_000)
+    for question in ["What is the weather in San Francisco?", "What is the weather in San Francisco?"]:
+        result, trace = run_react(agent, question)
+        print(result["messages"][-1].content)
+        print(f"stop_reason: {result.get('stop_reason')}")
+        print(trace.summary_table())
+    # the second run answers its searches from the shared cache
+    print(get_tool_cache().stats())
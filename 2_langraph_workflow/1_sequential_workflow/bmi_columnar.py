@@ -0,0 +1,135 @@
+"""
+Columnar version of 1_bmi_non_llm_worklfow.ipynb
+
+Same graph (START -> calculate_bmi -> label_bmi -> END), but every state field is
+a NumPy array with one row per person, so one invoke scores the whole batch.
+
+    workflow = build_columnar_workflow()
+    state = workflow.invoke({"weight_kg": np.array([79.0, 50.0]), "height_m": np.array([1.75, 1.80])})
+    state["bmi"]                       -> array([25.8 , 15.43])
+    category_labels(state["category"]) -> array(['Overweight', 'Underweight'])
+
+- label_bmi's if / elif chain becomes np.select over masks; the category is kept as
+  a small int code (index into CATEGORIES), not a million python strings
+- the thresholds are the notebook's, gaps included: a bmi of 24.9 .. 24.99 or
+  29.9 .. 29.99 falls through to "Obesity" in both versions
+- build_record_workflow() is the notebook graph, one record per invoke; the
+  benchmarks use it as the baseline and to check both give the same results
+"""
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from langgraph.graph import END, START, StateGraph
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from shared.columnar import round_half, run_columns, to_columns
+
+CATEGORIES = np.array(["Underweight", "Normal weight", "Overweight", "Obesity"])
+
+FIELDS = {"weight_kg": np.float64, "height_m": np.float64}
+
+
+class BMIColumns(TypedDict):
+    weight_kg: np.ndarray
+    height_m: np.ndarray
+    bmi: np.ndarray
+    category: np.ndarray  # int8 index into CATEGORIES
+
+
+def calculate_bmi(state: BMIColumns):
+    bmi = state["weight_kg"] / (state["height_m"] ** 2)
+    # round_half: same 2 decimals as the notebook's round(), a .xx5 bmi can change the category
+    return {"bmi": round_half(bmi, 2)}
+
+
+def label_bmi(state: BMIColumns):
+    bmi = state["bmi"]
+    conditions = [
+        bmi < 18.5,
+        (18.5 <= bmi) & (bmi < 24.9),
+        (25 <= bmi) & (bmi < 29.9),
+    ]
+    # rows matching no condition take the default, like the notebook's else
+    category = np.select(conditions, [0, 1, 2], default=3).astype(np.int8)
+    return {"category": category}
+
+
+@lru_cache(maxsize=None)
+def build_columnar_workflow():
+    graph = StateGraph(BMIColumns)
+    graph.add_node("calculate_bmi", calculate_bmi)
+    graph.add_node("label_bmi", label_bmi)
+    graph.add_edge(START, "calculate_bmi")
+    graph.add_edge("calculate_bmi", "label_bmi")
+    graph.add_edge("label_bmi", END)
+    return graph.compile()
+
+
+def category_labels(codes: np.ndarray) -> np.ndarray:
+    return CATEGORIES[codes]
+
+
+def score_records(records, chunk_size=None) -> dict:
+    """[{"weight_kg": ..., "height_m": ...}, ...] -> columns with bmi and category."""
+    return run_columns(build_columnar_workflow(), to_columns(records, FIELDS), chunk_size=chunk_size)
+
+
+# --- the notebook graph, one record per invoke -------------------------------
+
+
+class BMIState(TypedDict):
+    weight_kg: float
+    height_m: float
+    bmi: float
+    category: str
+
+
+def calculate_bmi_record(state: BMIState) -> BMIState:
+    state["bmi"] = round(state["weight_kg"] / (state["height_m"] ** 2), 2)
+    return state
+
+
+def label_bmi_record(state: BMIState) -> BMIState:
+    bmi = state["bmi"]
+    if bmi < 18.5:
+        category = "Underweight"
+    elif 18.5 <= bmi < 24.9:
+        category = "Normal weight"
+    elif 25 <= bmi < 29.9:
+        category = "Overweight"
+    else:
+        category = "Obesity"
+    state["category"] = category
+    return state
+
+
+@lru_cache(maxsize=None)
+def build_record_workflow():
+    graph = StateGraph(BMIState)
+    graph.add_node("calculate_bmi", calculate_bmi_record)
+    graph.add_node("label_bmi", label_bmi_record)
+    graph.add_edge(START, "calculate_bmi")
+    graph.add_edge("calculate_bmi", "label_bmi")
+    graph.add_edge("label_bmi", END)
+    return graph.compile()
+
+
+def random_columns(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {"weight_kg": rng.uniform(40, 130, n).round(1), "height_m": rng.uniform(1.45, 2.05, n).round(2)}
+
+
+if __name__ == "__main__":
+    import time
+
+    columns = random_columns(1_000_000)
+    started = time.perf_counter()
+    state = build_columnar_workflow().invoke(columns)
+    print(f"1,000,000 records in {(time.perf_counter() - started) * 1000:.1f} ms")
+    for code, label in enumerate(CATEGORIES):
+        print(f"  {label:14} {np.count_nonzero(state['category'] == code):8}")
@@ -0,0 +1,157 @@
+"""
+Columnar version of cricket_workflow.ipynb
+
+Same parallel graph, every state field is a NumPy array with one row per innings:
+
+                  ┌─► calculate_sr ───────────────┐
+    START ────────┼─► calculate_bpb ──────────────┼──► END
+                  └─► calculate_boundary_percent ─┘
+
+    state = build_columnar_workflow().invoke({
+        "runs": np.array([150, 30]), "balls": np.array([120, 40]),
+        "fours": np.array([10, 2]), "sixes": np.array([5, 0]),
+    })
+    state["sr"] -> array([125.,  75.])
+
+- the three nodes still run in parallel; NumPy releases the GIL for large
+  arrays, so the parallel branches really overlap
+- the per-row summary string is not built in the graph (a million f-strings
+  would take longer than the whole calculation): summaries(state, start, stop)
+  formats the rows that are actually shown or written out
+- no boundaries (fours + sixes == 0) or no runs give inf / nan in that row
+  instead of the ZeroDivisionError that stops the notebook graph
+- build_record_workflow() is the notebook graph, used by the benchmarks as the
+  baseline and to check both give the same numbers
+"""
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import TypedDict
+
+import numpy as np
+from langgraph.graph import END, START, StateGraph
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from shared.columnar import run_columns, to_columns
+
+FIELDS = {"runs": np.int64, "balls": np.int64, "fours": np.int64, "sixes": np.int64}
+
+SUMMARY = """
+Strike Rate - {sr} \n
+Balls per boundary - {bpb} \n
+Boundary percent - {boundary_percent}
+"""
+
+
+class BatsmanColumns(TypedDict):
+    runs: np.ndarray
+    balls: np.ndarray
+    fours: np.ndarray
+    sixes: np.ndarray
+
+    sr: np.ndarray
+    bpb: np.ndarray
+    boundary_percent: np.ndarray
+
+
+def calculate_sr(state: BatsmanColumns):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"sr": (state["runs"] / state["balls"]) * 100}
+
+
+def calculate_bpb(state: BatsmanColumns):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"bpb": state["balls"] / (state["fours"] + state["sixes"])}
+
+
+def calculate_boundary_percent(state: BatsmanColumns):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"boundary_percent": (((state["fours"] * 4) + (state["sixes"] * 6)) / state["runs"]) * 100}
+
+
+@lru_cache(maxsize=None)
+def build_columnar_workflow():
+    graph = StateGraph(BatsmanColumns)
+    for node in (calculate_sr, calculate_bpb, calculate_boundary_percent):
+        graph.add_node(node.__name__, node)
+        graph.add_edge(START, node.__name__)
+        graph.add_edge(node.__name__, END)
+    return graph.compile()
+
+
+def summaries(state: BatsmanColumns, start: int = 0, stop=None) -> list:
+    sr, bpb, boundary_percent = (state[key][start:stop].tolist() for key in ("sr", "bpb", "boundary_percent"))
+    return [SUMMARY.format(sr=a, bpb=b, boundary_percent=c) for a, b, c in zip(sr, bpb, boundary_percent)]
+
+
+def score_records(records, chunk_size=None) -> dict:
+    """[{"runs", "balls", "fours", "sixes"}, ...] -> columns with sr, bpb and boundary_percent."""
+    return run_columns(build_columnar_workflow(), to_columns(records, FIELDS), chunk_size=chunk_size)
+
+
+# --- the notebook graph, one record per invoke -------------------------------
+
+
+class BatsmanState(TypedDict):
+    runs: int
+    balls: int
+    fours: int
+    sixes: int
+
+    sr: float
+    bpb: float
+    boundary_percent: float
+    summary: str
+
+
+def calculate_sr_record(state: BatsmanState):
+    return {"sr": (state["runs"] / state["balls"]) * 100}
+
+
+def calculate_bpb_record(state: BatsmanState):
+    return {"bpb": state["balls"] / (state["fours"] + state["sixes"])}
+
+
+def calculate_boundary_percent_record(state: BatsmanState):
+    return {"boundary_percent": (((state["fours"] * 4) + (state["sixes"] * 6)) / state["runs"]) * 100}
+
+
+def summary_record(state: BatsmanState):
+    return {"summary": SUMMARY.format(**state)}
+
+
+@lru_cache(maxsize=None)
+def build_record_workflow():
+    graph = StateGraph(BatsmanState)
+    graph.add_node("calculate_sr", calculate_sr_record)
+    graph.add_node("calculate_bpb", calculate_bpb_record)
+    graph.add_node("calculate_boundary_percent", calculate_boundary_percent_record)
+    graph.add_node("summary", summary_record)
+    for node in ("calculate_sr", "calculate_bpb", "calculate_boundary_percent"):
+        graph.add_edge(START, node)
+        graph.add_edge(node, "summary")
+    graph.add_edge("summary", END)
+    return graph.compile()
+
+
+def random_columns(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    balls = rng.integers(10, 200, n)
+    fours = rng.integers(1, 20, n)
+    sixes = rng.integers(0, 10, n)
+    # at least the runs from the boundaries
+    runs = fours * 4 + sixes * 6 + rng.integers(1, 100, n)
+    return {"runs": runs, "balls": balls, "fours": fours, "sixes": sixes}
+
+
+if __name__ == "__main__":
+    import time
+
+    columns = random_columns(1_000_000)
+    started = time.perf_counter()
+    state = build_columnar_workflow().invoke(columns)
+    print(f"1,000,000 innings in {(time.perf_counter() - started) * 1000:.1f} ms")
+    print(f"  mean strike rate {state['sr'].mean():.1f}, best {state['sr'].max():.1f}")
+    print(summaries(state, 0, 1)[0])
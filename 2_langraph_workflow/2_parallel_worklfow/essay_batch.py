@@ -0,0 +1,213 @@
+"""
+Batch evaluation for the essay workflow (essay_evaluation_workflow.ipynb as a module)
+
+    python essay_batch.py essays.jsonl scores.jsonl --concurrency 16
+
+input  (one per line): {"id": "e1", "essay": "Artificial Intelligence (AI) refers to ..."}
+output (one per line): {"id": "e1", "individual_scores": [7, 6, 8], "avg_score": 7.0,
+                        "language_feedback": ..., "analysis_feedback": ...,
+                        "clarity_feedback": ..., "overall_feedback": ..., "latency_s": 4.1}
+                   or: {"id": "e1", "error": "...", "latency_s": ...}
+
+Same graph as the notebook: language / analysis / clarity evaluated in parallel,
+then final_evaluation summarizes and averages the scores.
+
+                  ┌─► evaluate_language ─┐
+    START ────────┼─► evaluate_analysis ─┼──► final_evaluation ──► END
+                  └─► evaluate_thought  ─┘
+
+- the graph is compiled once and shared by all essays (build_essay_workflow)
+- nodes have async versions, so the three evaluations of an essay are concurrent
+  model calls and `concurrency` essays are in flight (at most 3 x concurrency calls)
+- --llm-rps puts one token bucket in front of every model call of the process
+- results are appended as soon as an essay is done; a restarted run skips essays
+  that already have a score in the output file
+- progress and final stats: essays/min and p50 / p95 latency per essay
+"""
+
+import argparse
+import asyncio
+import operator
+import os
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Annotated, AsyncIterator, Iterable, TypedDict
+
+from dotenv import load_dotenv
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+from pydantic import BaseModel, Field
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from shared.batching import BatchStats, append_result, completed_ids, read_jsonl, run_pool
+from shared.http_clients import pooled_chat_openai
+
+load_dotenv()
+
+
+class EvaluationSchema(BaseModel):
+    feedback: str = Field(description="Detailed feedback on the essay")
+    score: int = Field(description="Score out of 10 for the essay", ge=0, le=10)
+
+
+class UPSCState(TypedDict):
+    essay: str
+    language_feedback: str
+    analysis_feedback: str
+    clarity_feedback: str
+    overall_feedback: str
+    avg_score: float
+    individual_scores: Annotated[list[int], operator.add]
+
+
+# model is created on first use; OPENAI_REQUESTS_PER_SECOND (optional) rate limits every call
+# all concurrent essays share one connection pool (shared/http_clients.py)
+@lru_cache(maxsize=None)
+def get_model():
+    requests_per_second = float(os.getenv("OPENAI_REQUESTS_PER_SECOND", "0"))
+    rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_second) if requests_per_second > 0 else None
+    return pooled_chat_openai(model="gpt-4o-mini", rate_limiter=rate_limiter)
+
+
+@lru_cache(maxsize=None)
+def get_structured_model():
+    return get_model().with_structured_output(EvaluationSchema)
+
+
+# (node name, state key for the feedback, prompt)
+EVALUATIONS = [
+    ("evaluate_language", "language_feedback",
+     "Evaluate the language quality of the following essay and provide a feedback and assign a score out of 10 \n {essay}"),
+    ("evaluate_analysis", "analysis_feedback",
+     "Evaluate the depth of analysis of the following essay and provide a feedback and assign a score out of 10 \n {essay}"),
+    ("evaluate_thought", "clarity_feedback",
+     "Evaluate the clarity of thought of the following essay and provide a feedback and assign a score out of 10 \n {essay}"),
+]
+
+SUMMARY_PROMPT = (
+    "Based on the following feedbacks create a summarized feedback \n"
+    " language feedback - {language_feedback} \n"
+    " depth of analysis feedback - {analysis_feedback} \n"
+    " clarity of thought feedback - {clarity_feedback}"
+)
+
+
+def make_evaluator(feedback_key: str, prompt: str) -> RunnableLambda:
+    def evaluate(state: UPSCState):
+        output = get_structured_model().invoke(prompt.format(essay=state["essay"]))
+        return {feedback_key: output.feedback, "individual_scores": [output.score]}
+
+    async def aevaluate(state: UPSCState):
+        output = await get_structured_model().ainvoke(prompt.format(essay=state["essay"]))
+        return {feedback_key: output.feedback, "individual_scores": [output.score]}
+
+    return RunnableLambda(evaluate, afunc=aevaluate)
+
+
+def _average(state: UPSCState) -> float:
+    return sum(state["individual_scores"]) / len(state["individual_scores"])
+
+
+def final_evaluation(state: UPSCState):
+    overall_feedback = get_model().invoke(SUMMARY_PROMPT.format(**state)).content
+    return {"overall_feedback": overall_feedback, "avg_score": _average(state)}
+
+
+async def afinal_evaluation(state: UPSCState):
+    overall_feedback = (await get_model().ainvoke(SUMMARY_PROMPT.format(**state))).content
+    return {"overall_feedback": overall_feedback, "avg_score": _average(state)}
+
+
+@lru_cache(maxsize=None)
+def build_essay_workflow():
+    graph = StateGraph(UPSCState)
+
+    for node, feedback_key, prompt in EVALUATIONS:
+        graph.add_node(node, make_evaluator(feedback_key, prompt))
+        graph.add_edge(START, node)
+        graph.add_edge(node, "final_evaluation")
+
+    graph.add_node("final_evaluation", RunnableLambda(final_evaluation, afunc=afinal_evaluation))
+    graph.add_edge("final_evaluation", END)
+
+    return graph.compile()
+
+
+RESULT_KEYS = ("individual_scores", "avg_score", "language_feedback", "analysis_feedback", "clarity_feedback", "overall_feedback")
+
+
+async def evaluate_one(workflow, record: dict) -> dict:
+    started = time.perf_counter()
+    try:
+        state = await workflow.ainvoke({"essay": record["essay"]})
+        result = {"id": record["id"], **{key: state[key] for key in RESULT_KEYS}}
+    except Exception as e:
+        result = {"id": record["id"], "error": f"{type(e).__name__}: {e}"}
+    result["latency_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+async def evaluate_stream(records: Iterable[dict], concurrency: int = 8, workflow=None) -> AsyncIterator[dict]:
+    """Evaluate a stream of {"id", "essay"} records, yield results in completion order."""
+    workflow = workflow or build_essay_workflow()
+    async for result in run_pool(records, lambda record: evaluate_one(workflow, record), concurrency=concurrency):
+        yield result
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    progress_every: int = 50,
+    workflow=None,
+) -> BatchStats:
+    workflow = workflow or build_essay_workflow()
+    done = completed_ids(output_path, "avg_score")
+    stats = BatchStats("essays")
+
+    def already_done(record: dict) -> bool:
+        if str(record["id"]) in done:
+            stats.skipped += 1
+            return True
+        return False
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async for result in run_pool(
+            read_jsonl(input_path),
+            lambda record: evaluate_one(workflow, record),
+            concurrency=concurrency,
+            skip=already_done,
+        ):
+            append_result(out, result)
+            stats.add(result["latency_s"], ok="avg_score" in result)
+            if len(stats.latencies) % progress_every == 0:
+                print(stats.summary(), flush=True)
+
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluate a JSONL file of essays with the parallel essay workflow")
+    parser.add_argument("input", help="JSONL file with {\"id\", \"essay\"} per line (- for stdin)")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="essays in flight at once")
+    parser.add_argument("--llm-rps", type=float, default=0, help="max openai requests per second (0 = no limit)")
+    parser.add_argument("--progress-every", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    # read by get_model() when the client is created
+    if args.llm_rps:
+        os.environ["OPENAI_REQUESTS_PER_SECOND"] = str(args.llm_rps)
+
+    stats = asyncio.run(
+        run_batch(args.input, args.output, concurrency=args.concurrency, progress_every=args.progress_every)
+    )
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Fast path for the sentiment step of review_reply_workflow.ipynb
+
+Every review used to go to the llm (structured_model / SentimentSchema), also
+"Love it, works great!". FastPathSentiment puts a local classifier in front:
+
+    review ──► local classifier ──confidence >= threshold──► sentiment (no llm call)
+                     │ uncertain
+                     ▼
+               structured_model ──► sentiment
+
+- LexiconSentiment is the default local model: word weights, negation ("not good"),
+  intensifiers ("very", "extremely") and "but" (the part after it counts more).
+  Anything with classify(text) -> (label, confidence) can be plugged in instead,
+  e.g. a small trained model
+- confidence is 0.5 when there is no evidence, so short neutral or mixed reviews
+  always go to the llm
+- classify_batch / aclassify_batch send all uncertain reviews of a batch to the
+  llm in one .batch() call
+- audit_rate: a random share of fast-path answers is also sent to the llm, to
+  measure how often the fast path would disagree with it
+- stats(): llm calls avoided, escalation rate, disagreement rates
+
+    router = FastPathSentiment(llm=structured_model, threshold=0.9)
+    def find_sentiment(state):
+        return {"sentiment": router.classify(state["review"]).sentiment}
+"""
+
+import math
+import random
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional, Protocol, Sequence, Tuple
+
+POSITIVE = "positive"
+NEGATIVE = "negative"
+
+LLM_PROMPT = "For the following review find out the sentiment \n {review}"
+
+_POSITIVE_WORDS = {
+    "good": 1.0, "great": 1.5, "excellent": 2.0, "amazing": 2.0, "awesome": 2.0, "fantastic": 2.0,
+    "love": 1.8, "loved": 1.8, "loving": 1.5, "like": 0.8, "liked": 0.8, "nice": 1.0, "perfect": 2.0,
+    "best": 1.8, "wonderful": 2.0, "brilliant": 2.0, "smooth": 1.2, "fast": 1.0, "easy": 1.0,
+    "intuitive": 1.2, "helpful": 1.2, "reliable": 1.2, "recommend": 1.5, "recommended": 1.5,
+    "happy": 1.5, "satisfied": 1.2, "impressed": 1.5, "efficient": 1.0, "useful": 1.0, "clean": 0.8,
+    "beautiful": 1.5, "works": 0.6, "worth": 1.0, "thanks": 0.8, "thank": 0.8, "superb": 2.0,
+    "outstanding": 2.0, "solid": 1.0, "enjoy": 1.2, "enjoyed": 1.2, "glad": 1.0, "responsive": 1.0,
+}
+
+_NEGATIVE_WORDS = {
+    "bad": -1.2, "terrible": -2.0, "awful": -2.0, "horrible": -2.0, "worst": -2.0, "hate": -1.8,
+    "hated": -1.8, "poor": -1.2, "slow": -1.2, "bug": -1.2, "bugs": -1.2, "buggy": -1.5,
+    "crash": -1.5, "crashes": -1.5, "crashed": -1.5, "crashing": -1.5, "freeze": -1.5,
+    "freezes": -1.5, "freezing": -1.5, "broken": -1.8, "useless": -2.0, "waste": -1.8,
+    "disappointed": -1.5, "disappointing": -1.5, "frustrating": -1.5, "frustrated": -1.5,
+    "annoying": -1.2, "confusing": -1.0, "unacceptable": -2.0, "fail": -1.5, "fails": -1.5,
+    "failed": -1.5, "error": -1.0, "errors": -1.0, "problem": -1.0, "problems": -1.0,
+    "issue": -0.8, "issues": -0.8, "refund": -1.2, "scam": -2.0, "lag": -1.2, "laggy": -1.5,
+    "unusable": -2.0, "stuck": -1.0, "worse": -1.5, "uninstall": -1.5,
+    "uninstalled": -1.5, "angry": -1.5, "expensive": -0.8, "ugly": -1.2, "lost": -0.8,
+}
+
+_NEGATIONS = {"not", "no", "never", "don't", "dont", "doesn't", "doesnt", "isn't", "isnt", "wasn't",
+              "wasnt", "can't", "cant", "cannot", "won't", "wont", "didn't", "didnt", "hardly", "nothing"}
+_INTENSIFIERS = {"very": 1.5, "really": 1.3, "so": 1.3, "extremely": 1.8, "absolutely": 1.6,
+                 "totally": 1.4, "super": 1.5, "incredibly": 1.8, "completely": 1.5, "too": 1.2}
+
+_TOKEN = re.compile(r"[a-z']+|[!?]")
+
+
+class SentimentClassifier(Protocol):
+    def classify(self, text: str) -> Tuple[str, float]:
+        """(label, confidence in 0.5 .. 1.0)"""
+
+
+class LexiconSentiment:
+    def __init__(self, positive: Optional[dict] = None, negative: Optional[dict] = None, scale: float = 0.8):
+        self.weights = {**_NEGATIVE_WORDS, **_POSITIVE_WORDS}
+        self.weights.update(positive or {})
+        self.weights.update(negative or {})
+        # how fast confidence grows with the score
+        self.scale = scale
+
+    def score(self, text: str) -> float:
+        tokens = _TOKEN.findall(text.lower())
+        score = 0.0
+        weight = 1.0  # 0.5 before "but", 1.5 after it
+        negate_for = 0
+        boost = 1.0
+        for token in tokens:
+            if token == "but":
+                score *= 0.5
+                weight = 1.5
+                negate_for = 0
+                continue
+            if token in _NEGATIONS:
+                negate_for = 3  # "not really that good" - negation reaches a few words ahead
+                continue
+            if token in _INTENSIFIERS:
+                boost = _INTENSIFIERS[token]
+                continue
+            value = self.weights.get(token)
+            if value is not None:
+                if negate_for:
+                    value = -0.75 * value  # "not good" is less negative than "bad"
+                score += value * boost * weight
+                boost = 1.0
+            if token == "!" and score:
+                score *= 1.1
+            negate_for = max(negate_for - 1, 0)
+        return score
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        score = self.score(text)
+        # logistic: no evidence -> 0.5, |score| 3 -> ~0.92
+        confidence = 1.0 / (1.0 + math.exp(-self.scale * abs(score)))
+        return (POSITIVE if score > 0 else NEGATIVE), confidence
+
+
+@dataclass
+class SentimentDecision:
+    sentiment: str
+    source: str  # "fast" or "llm"
+    confidence: float  # of the local classifier
+
+
+class FastPathSentiment:
+    def __init__(
+        self,
+        llm: Any,
+        classifier: Optional[SentimentClassifier] = None,
+        threshold: float = 0.9,
+        audit_rate: float = 0.0,
+        prompt: str = LLM_PROMPT,
+        seed: Optional[int] = None,
+    ):
+        # llm: runnable returning an object with .sentiment (structured_model in the notebook)
+        self.llm = llm
+        self.classifier = classifier or LexiconSentiment()
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.prompt = prompt
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.reviews = 0
+        self.fast = 0
+        self.escalated = 0
+        self.audited = 0
+        # fast path label != llm label, for audited fast answers / for escalated reviews
+        self.audit_disagreements = 0
+        self.escalated_disagreements = 0
+
+    # --- steps shared by the single / batch / async versions -----------------
+
+    def _prepare(self, reviews: Sequence[str]) -> Tuple[List[Tuple[str, float]], List[int], List[int]]:
+        guesses = [self.classifier.classify(review) for review in reviews]
+        uncertain = [i for i, (_, confidence) in enumerate(guesses) if confidence < self.threshold]
+        with self._lock:
+            audit = [
+                i for i, (_, confidence) in enumerate(guesses)
+                if confidence >= self.threshold and self.audit_rate and self._random.random() < self.audit_rate
+            ]
+        return guesses, uncertain, audit
+
+    def _finish(self, guesses, uncertain, audit, llm_labels: List[str]) -> List[SentimentDecision]:
+        by_index = dict(zip(uncertain + audit, llm_labels))
+        decisions = []
+        with self._lock:
+            self.reviews += len(guesses)
+            self.escalated += len(uncertain)
+            self.fast += len(guesses) - len(uncertain)
+            self.audited += len(audit)
+            for i, (label, confidence) in enumerate(guesses):
+                if i in by_index and by_index[i] != label:
+                    if confidence >= self.threshold:
+                        self.audit_disagreements += 1
+                    else:
+                        self.escalated_disagreements += 1
+        for i, (label, confidence) in enumerate(guesses):
+            if confidence < self.threshold:
+                decisions.append(SentimentDecision(by_index[i], "llm", confidence))
+            else:
+                # audited answers still keep the fast label: the audit only measures
+                decisions.append(SentimentDecision(label, "fast", confidence))
+        return decisions
+
+    def _prompts(self, reviews: Sequence[str], indexes: List[int]) -> List[str]:
+        return [self.prompt.format(review=reviews[i]) for i in indexes]
+
+    # --- public api -----------------------------------------------------------
+
+    def classify(self, review: str) -> SentimentDecision:
+        return self.classify_batch([review])[0]
+
+    async def aclassify(self, review: str) -> SentimentDecision:
+        return (await self.aclassify_batch([review]))[0]
+
+    def classify_batch(self, reviews: Sequence[str], max_concurrency: Optional[int] = None) -> List[SentimentDecision]:
+        guesses, uncertain, audit = self._prepare(reviews)
+        prompts = self._prompts(reviews, uncertain + audit)
+        outputs = self.llm.batch(prompts, config={"max_concurrency": max_concurrency}) if prompts else []
+        return self._finish(guesses, uncertain, audit, [output.sentiment for output in outputs])
+
+    async def aclassify_batch(self, reviews: Sequence[str], max_concurrency: Optional[int] = None) -> List[SentimentDecision]:
+        guesses, uncertain, audit = self._prepare(reviews)
+        prompts = self._prompts(reviews, uncertain + audit)
+        outputs = await self.llm.abatch(prompts, config={"max_concurrency": max_concurrency}) if prompts else []
+        return self._finish(guesses, uncertain, audit, [output.sentiment for output in outputs])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "reviews": self.reviews,
+                "fast_path": self.fast,
+                "escalated": self.escalated,
+                "llm_calls_avoided": self.fast - self.audited,
+                "llm_calls_avoided_rate": (self.fast - self.audited) / self.reviews if self.reviews else 0.0,
+                "audited": self.audited,
+                "audit_disagreement_rate": self.audit_disagreements / self.audited if self.audited else 0.0,
+                "escalated_disagreement_rate": (
+                    self.escalated_disagreements / self.escalated if self.escalated else 0.0
+                ),
+            }
@@ -0,0 +1,200 @@
+"""
+Columnar version of quardatic_equation_workflow.ipynb
+
+The notebook routes every equation to one of three nodes with a conditional edge.
+Here the state holds one row per equation and the routing becomes masked branches:
+
+    notebook   calculate_discriminant ──check_condition──► real_roots | repeated_roots | no_real_roots
+    columnar   calculate_discriminant ──► solve
+                                          route = check_condition per row
+                                          real_roots     on the rows with discriminant > 0
+                                          repeated_roots on the rows with discriminant == 0
+                                          no_real_roots  on the rows with discriminant < 0
+
+    state = build_columnar_workflow().invoke({"a": np.array([1, 2, 1]), "b": np.array([-5, 4, 2]), "c": np.array([6, 2, 5])})
+    state["root1"], state["root2"] -> array([ 3., -1., nan]), array([ 2., -1., nan])
+    state["route"]                 -> array([0, 1, 2], dtype=int8)   (index into BRANCHES)
+
+- each branch only computes on its own rows, so sqrt(discriminant) never sees a
+  negative value
+- roots are numbers (nan where there is no real root), the notebook's result
+  text is built by results(state, start, stop) for the rows that are shown;
+  show_equation is only formatting and is left out for the same reason
+- a == 0 (not a quadratic) gives inf / nan instead of a ZeroDivisionError
+- build_record_workflow() is the notebook graph, used by the benchmarks as the
+  baseline and to check both give the same roots
+"""
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal, TypedDict
+
+import numpy as np
+from langgraph.graph import END, START, StateGraph
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from shared.columnar import masked_branches, run_columns, to_columns
+
+FIELDS = {"a": np.int64, "b": np.int64, "c": np.int64}
+
+BRANCHES = ("real_roots", "repeated_roots", "no_real_roots")
+
+
+class QuadColumns(TypedDict):
+    a: np.ndarray
+    b: np.ndarray
+    c: np.ndarray
+
+    discriminant: np.ndarray
+    route: np.ndarray  # int8 index into BRANCHES
+    root1: np.ndarray
+    root2: np.ndarray
+
+
+def calculate_discriminant(state: QuadColumns):
+    return {"discriminant": state["b"] ** 2 - (4 * state["a"] * state["c"])}
+
+
+def check_condition(state: QuadColumns) -> np.ndarray:
+    discriminant = state["discriminant"]
+    return np.select([discriminant > 0, discriminant == 0], [0, 1], default=2).astype(np.int8)
+
+
+# branches get the columns of their own rows only
+
+
+def real_roots(rows: dict):
+    root = rows["discriminant"] ** 0.5
+    return {"root1": (-rows["b"] + root) / (2 * rows["a"]), "root2": (-rows["b"] - root) / (2 * rows["a"])}
+
+
+def repeated_roots(rows: dict):
+    root = (-rows["b"]) / (2 * rows["a"])
+    return {"root1": root, "root2": root}
+
+
+def no_real_roots(rows: dict):
+    nan = np.full(len(rows["a"]), np.nan)
+    return {"root1": nan, "root2": nan}
+
+
+def solve(state: QuadColumns):
+    route = check_condition(state)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roots = masked_branches(route, (real_roots, repeated_roots, no_real_roots), state)
+    return {"route": route, **roots}
+
+
+@lru_cache(maxsize=None)
+def build_columnar_workflow():
+    graph = StateGraph(QuadColumns)
+    graph.add_node("calculate_discriminant", calculate_discriminant)
+    graph.add_node("solve", solve)
+    graph.add_edge(START, "calculate_discriminant")
+    graph.add_edge("calculate_discriminant", "solve")
+    graph.add_edge("solve", END)
+    return graph.compile()
+
+
+def results(state: QuadColumns, start: int = 0, stop=None) -> list:
+    """The notebook's result text for rows start..stop."""
+    texts = []
+    for route, root1, root2 in zip(*(state[key][start:stop].tolist() for key in ("route", "root1", "root2"))):
+        if BRANCHES[route] == "real_roots":
+            texts.append(f"The roots are {root1} and {root2}")
+        elif BRANCHES[route] == "repeated_roots":
+            texts.append(f"Only repeating root is {root1}")
+        else:
+            texts.append("No real roots")
+    return texts
+
+
+def score_records(records, chunk_size=None) -> dict:
+    """[{"a", "b", "c"}, ...] -> columns with discriminant, route, root1 and root2."""
+    return run_columns(build_columnar_workflow(), to_columns(records, FIELDS), chunk_size=chunk_size)
+
+
+# --- the notebook graph, one record per invoke -------------------------------
+
+
+class QuadState(TypedDict):
+    a: int
+    b: int
+    c: int
+
+    equation: str
+    discriminant: float
+    result: str
+
+
+def show_equation_record(state: QuadState):
+    return {"equation": f'{state["a"]}x2{state["b"]}x{state["c"]}'}
+
+
+def calculate_discriminant_record(state: QuadState):
+    return {"discriminant": state["b"] ** 2 - (4 * state["a"] * state["c"])}
+
+
+def real_roots_record(state: QuadState):
+    root1 = (-state["b"] + state["discriminant"] ** 0.5) / (2 * state["a"])
+    root2 = (-state["b"] - state["discriminant"] ** 0.5) / (2 * state["a"])
+    return {"result": f"The roots are {root1} and {root2}"}
+
+
+def repeated_roots_record(state: QuadState):
+    root = (-state["b"]) / (2 * state["a"])
+    return {"result": f"Only repeating root is {root}"}
+
+
+def no_real_roots_record(state: QuadState):
+    return {"result": "No real roots"}
+
+
+def check_condition_record(state: QuadState) -> Literal["real_roots", "repeated_roots", "no_real_roots"]:
+    if state["discriminant"] > 0:
+        return "real_roots"
+    elif state["discriminant"] == 0:
+        return "repeated_roots"
+    else:
+        return "no_real_roots"
+
+
+@lru_cache(maxsize=None)
+def build_record_workflow():
+    graph = StateGraph(QuadState)
+    graph.add_node("show_equation", show_equation_record)
+    graph.add_node("calculate_discriminant", calculate_discriminant_record)
+    graph.add_node("real_roots", real_roots_record)
+    graph.add_node("repeated_roots", repeated_roots_record)
+    graph.add_node("no_real_roots", no_real_roots_record)
+    graph.add_edge(START, "show_equation")
+    graph.add_edge("show_equation", "calculate_discriminant")
+    graph.add_conditional_edges("calculate_discriminant", check_condition_record)
+    for node in BRANCHES:
+        graph.add_edge(node, END)
+    return graph.compile()
+
+
+def random_columns(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 10, n) * rng.choice([-1, 1], n)
+    # b = a * (r1 + r2), c = a * r1 * r2 for a third of the rows, so all three branches get rows
+    r1, r2 = rng.integers(-10, 10, n), rng.integers(-10, 10, n)
+    r2 = np.where(rng.random(n) < 0.3, r1, r2)
+    b = np.where(rng.random(n) < 0.3, -a * (r1 + r2), rng.integers(-20, 20, n))
+    c = np.where(rng.random(n) < 0.3, a * r1 * r2, rng.integers(-20, 20, n))
+    return {"a": a, "b": b, "c": c}
+
+
+if __name__ == "__main__":
+    import time
+
+    columns = random_columns(1_000_000)
+    started = time.perf_counter()
+    state = build_columnar_workflow().invoke(columns)
+    print(f"1,000,000 equations in {(time.perf_counter() - started) * 1000:.1f} ms")
+    for index, branch in enumerate(BRANCHES):
+        print(f"  {branch:15} {np.count_nonzero(state['route'] == index):8}")
+    print("\n".join(results(state, 0, 3)))
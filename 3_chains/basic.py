@@ -1,13 +1,24 @@
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
 from typing import List, Sequence
 from dotenv import load_dotenv
 from langchain_core.messages import BaseMessage, HumanMessage
 from langgraph.graph import END, MessageGraph
-from chains import generation_chain, reflection_chain
+from chains import get_generation_chain, get_reflection_chain
 
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.checkpointing import DeltaSqliteSaver, invoke_resumable
+from shared.coalescing import coalesce
+from shared.convergence import StopPolicy, budget_reason, is_converged, is_trivial_critique, message_tokens
+from shared.history_budget import compact_history, report_compaction
+from shared.instrumentation import GraphMetrics
+from shared.response_cache import cache_report
 
-load_dotenv()
 
-graph = MessageGraph() # invoke a message graph class
+load_dotenv()
 
 # Create generate and reflect node
 # once node is ready, add it to the graph
@@ -17,63 +28,130 @@ REFLECT = "reflect"
 GENERATE = "generate"
 
 # since we know every node recieves the entire state
-# then we are invoking on the state using the chain we have created and 
+# then we are invoking on the state using the chain we have created and
 # then we are appending that response to the history
 # this generate and reflect is automatically by ai itself
 # state is just a list of messages
-def generate_node(state):
+def generate_node(state, config):
     # whatever the state has been generated that need to be sit in message placeholder
     # whatever going to be returned object of llm,it is just going to extract the content and it is going to append that message to existing state
-    return generation_chain.invoke({
-        "messages": state
+    # older turns are trimmed to a token budget before they go into the prompt
+    # (what it saved shows up in GraphMetrics as history_tokens_saved)
+    started = time.time()
+    messages, report = compact_history(state)
+    report_compaction(report)
+    response = get_generation_chain().invoke({
+        "messages": messages
         }
     )
+    # the state is only a list of messages, so the loop bookkeeping rides along in the
+    # response metadata of the generated message: when the run started, the tokens spent
+    # so far and why it stops
+    metadata = {
+        "started_at": state[1].response_metadata.get("started_at") if len(state) > 1 else started,
+        "tokens_spent": tokens_spent(state, response),
+    }
+    metadata["stop_reason"] = stop_reason(state, response, metadata["started_at"], metadata["tokens_spent"], config)
+    return response.model_copy(update={"response_metadata": {**response.response_metadata, **metadata}})
 
 def reflect_node(state):
-    return reflection_chain.invoke({
-        "messages": state
+    messages, report = compact_history(state)
+    report_compaction(report)
+    response = get_reflection_chain().invoke({
+        "messages": messages
         }
     )
+    return response.model_copy(
+        update={"response_metadata": {**response.response_metadata, "tokens_spent": tokens_spent(state, response)}}
+    )
 
 
-
-# now, add this nodes to graph
-graph.add_node(GENERATE, generate_node) 
-graph.add_node(REFLECT, reflect_node)
+# running total of the llm tokens of every call in the loop (generate and reflect): each node
+# adds its own call to the total on the message before it, so the budget check is not a
+# walk over the whole history
+def tokens_spent(state, response):
+    return state[-1].response_metadata.get("tokens_spent", 0) + message_tokens([response])
 
 
-# set entry point
-graph.set_entry_point(GENERATE)
+# now need to create should continue function node
 
+# history is [request, tweet, critique, tweet, critique, tweet, ...]
+# stop early when the new tweet is almost the same as the previous one, the critique had
+# nothing left to say, or the time / token budget is used up (see shared/convergence.py)
+# otherwise the old limit: 4 tweets, i.e. more than 6 messages
+def stop_reason(state, response, started_at, spent, config):
+    policy = StopPolicy.from_config(config)
+    reason = budget_reason(policy, started_at, spent)
+    if reason:
+        return reason
+    if len(state) >= 3:
+        if is_converged(state[-2].content, response.content, policy.min_change):
+            return "converged"
+        if is_trivial_critique(state[-1].content):
+            return "no_critique"
+    if len(state) + 1 > 6:
+        return "max_messages"
+    return None
 
-# now need to create should continue function node
 
 def should_continue(state):
-    if (len(state) > 6):
-        return END 
-    # if not Goto Reflect    
+    if state[-1].response_metadata.get("stop_reason"):
+        return END
+    # if not Goto Reflect
     return REFLECT
 
-# add conditional edges
-# right after generation is done should_continue will go to branch of two different things reflect or end 
-graph.add_conditional_edges(GENERATE, should_continue)
 
-# if it goes to reflect then it should again go to generate with critics, merits
-# connect from refect to generate
-graph.add_edge(REFLECT, GENERATE)
+# graph is built and compiled on first call instead of at import time
+# pass a checkpointer (e.g. DeltaSqliteSaver()) to save every step under a thread_id
+@lru_cache(maxsize=None)
+def build_reflection_app(checkpointer=None):
+    graph = MessageGraph() # invoke a message graph class
+
+    # now, add this nodes to graph
+    graph.add_node(GENERATE, generate_node)
+    graph.add_node(REFLECT, reflect_node)
 
+    # set entry point
+    graph.set_entry_point(GENERATE)
 
-app = graph.compile()
+    # add conditional edges
+    # right after generation is done should_continue will go to branch of two different things reflect or end
+    graph.add_conditional_edges(GENERATE, should_continue)
 
-print(app.get_graph().draw_mermaid())
-app.get_graph().print_ascii()
+    # if it goes to reflect then it should again go to generate with critics, merits
+    # connect from refect to generate
+    graph.add_edge(REFLECT, GENERATE)
 
+    return graph.compile(checkpointer=checkpointer)
 
-# whatever we add here it will added to message place | history list ()
-response = app.invoke(HumanMessage(content="AI Agents taking over content creation"))
 
-print(response)
+# entry point for serving many users: the same question asked while it is already running
+# (or again within COALESCE_RESULT_WINDOW seconds) shares that run instead of starting the
+# whole loop again - invoke / ainvoke / astream_events, see shared/coalescing.py
+def serve_reflection_app():
+    return coalesce(build_reflection_app(), "reflection")
+
+
+if __name__ == "__main__":
+    app = build_reflection_app(checkpointer=DeltaSqliteSaver())
+
+    print(app.get_graph().draw_mermaid())
+    app.get_graph().print_ascii()
+
+    # whatever we add here it will added to message place | history list ()
+    metrics = GraphMetrics()
+    response = invoke_resumable(
+        app,
+        HumanMessage(content="AI Agents taking over content creation"),
+        {"configurable": {"thread_id": "ai-agents-content"}, "callbacks": [metrics]},
+    )
+
+    print(response)
+    print("stopped:", response[-1].response_metadata["stop_reason"])
+    print(metrics.summary_table())
+    # hit rate per chain when LLM_CACHE=exact / semantic is set
+    print(cache_report())
 
 """
 system message is going to different for each of the chains and both of those chains are going to share increasing getting message history
-"""
\ No newline at end of file
+"""
@@ -4,10 +4,18 @@ The Reflection Agent (also called Generation-Reflection Loop) is a
 pattern where two LLMs work together to iteratively improve content:
 """
 
+import sys
+from functools import lru_cache
+from pathlib import Path
+
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.model_router import get_model_router
+from shared.response_cache import with_response_cache
+
 load_dotenv()
 
 
@@ -35,11 +43,24 @@ reflection_prompt = ChatPromptTemplate.from_messages(
 )
 
 
-llm = ChatOpenAI(model="gpt-4o")
+# clients and chains are created on first use, not at import time,
+# lru_cache makes every caller in the process share the same objects
+# each node gets the models of its tier - generation: strong, reflection: fast - with
+# hedging and fallback between them (see shared/model_router.py)
+def get_llm(node: str):
+    return get_model_router().for_node(node)
+
+
+# with LLM_CACHE=exact (or semantic) repeated prompts are answered from a local cache,
+# each chain keeps its own hit rate (see shared/response_cache.py)
+@lru_cache(maxsize=None)
+def get_generation_chain():
+    return generation_prompt | with_response_cache(get_llm("generation"), "generation")
 
 
-generation_chain = generation_prompt | llm
-reflection_chain = reflection_prompt | llm
+@lru_cache(maxsize=None)
+def get_reflection_chain():
+    return reflection_prompt | with_response_cache(get_llm("reflection"), "reflection")
 
 
 
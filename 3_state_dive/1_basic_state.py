@@ -36,12 +36,13 @@ graph.add_conditional_edges(
 
 app = graph.compile()
 
-state = {
-    "count": 0
-}
+if __name__ == "__main__":
+    state = {
+        "count": 0
+    }
 
-result = app.invoke(state)
-print(result)
+    result = app.invoke(state)
+    print(result)
 
 
 """
@@ -1,11 +1,20 @@
-from typing import TypedDict, List, Annotated
+import sys
+from pathlib import Path
+from typing import TypedDict, Annotated, Sequence
 from langgraph.graph import END, StateGraph
 import operator
 
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.append_log import AppendChannel
+
+# history used to be Annotated[List[int], operator.concat]: every step copied the whole
+# list into a new one (O(n) per step). AppendChannel appends in place and gives each
+# step a read-only snapshot; "q" keeps the ints in a compact array (shared/append_log.py)
 class SimpleState(TypedDict):
     count: int
     sum: Annotated[int, operator.add]
-    history: Annotated[List[int], operator.concat]
+    history: Annotated[Sequence[int], AppendChannel("q")]
 
 
 def increment(state: SimpleState) -> SimpleState: 
@@ -41,11 +50,12 @@ graph.add_conditional_edges(
 
 app = graph.compile()
 
-state = {
-    "count": 0, 
-    "sum": 0, 
-    "history": []
-}
+if __name__ == "__main__":
+    state = {
+        "count": 0, 
+        "sum": 0, 
+        "history": []
+    }
 
-result = app.invoke(state)
-print(result)
\ No newline at end of file
+    result = app.invoke(state)
+    print(result)
@@ -0,0 +1,147 @@
+"""
+Batch mode for the Reflexion agent
+
+    python batch_runner.py questions.jsonl results.jsonl --concurrency 8
+
+input  (one per line): {"id": "q1", "question": "Write about ..."}
+output (one per line): {"id": "q1", "question": ..., "answer": ..., "references": [...],
+                        "iterations": 4, "stop_reason": "converged", "latency_s": 31.2}
+                   or: {"id": "q1", "question": ..., "error": "...", "latency_s": ...}
+
+- the input file is read line by line, never loaded as a whole
+- `concurrency` graph runs are in flight at the same time (one shared compiled app)
+- --llm-rps / --search-rps put a process-wide token bucket in front of the
+  openai / tavily calls so many parallel runs do not run into 429s
+- every result is appended and flushed as soon as its run finishes
+- after a crash just start the same command again: ids that already have an
+  answer in the output file are skipped, failed ones are retried
+- with --checkpoint-db every graph step is saved under the question id, so a
+  retried question continues from its last finished node instead of the start
+- --pipelined-search starts every search query while the draft / revision is still
+  streaming (see pipelined_search.py)
+- progress and final stats: questions/min and p50 / p95 latency per question
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.batching import BatchStats, append_result, completed_ids, read_jsonl, run_pool
+from shared.checkpointing import ainvoke_resumable
+
+
+async def run_one(app, record: dict, max_iterations: int, pipelined_search: bool = False) -> dict:
+    started = time.perf_counter()
+    configurable = {"max_iterations": max_iterations, "pipelined_search": pipelined_search}
+    try:
+        # inside the try: a line without "question" is an error result like any other
+        inputs = {"messages": [HumanMessage(record["question"])]}
+        if app.checkpointer:
+            config = {"configurable": {"thread_id": str(record["id"]), **configurable}}
+            response = await ainvoke_resumable(app, inputs, config)
+        else:
+            response = await app.ainvoke(inputs, config={"configurable": configurable})
+        args = response["messages"][-1].tool_calls[0]["args"]
+        return {
+            "id": record["id"],
+            "question": record["question"],
+            "answer": args["answer"],
+            "references": args.get("references", []),
+            "iterations": response["iterations"],
+            "stop_reason": response.get("stop_reason"),
+            "latency_s": round(time.perf_counter() - started, 3),
+        }
+    except Exception as e:
+        return {
+            "id": record["id"],
+            "question": record.get("question"),
+            "error": f"{type(e).__name__}: {e}",
+            "latency_s": round(time.perf_counter() - started, 3),
+        }
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    max_iterations: int = 3,
+    progress_every: int = 50,
+    app=None,
+    checkpoint_db: Optional[str] = None,
+    pipelined_search: bool = False,
+) -> BatchStats:
+    if app is None:
+        # imported here so the rate limit env vars set by main() are seen by the clients
+        from reflexion_graph import build_reflexion_app
+        from shared.checkpointing import DeltaSqliteSaver
+
+        app = build_reflexion_app(checkpointer=DeltaSqliteSaver(checkpoint_db) if checkpoint_db else None)
+
+    done = completed_ids(output_path, "answer")
+    stats = BatchStats("questions")
+
+    def already_done(record: dict) -> bool:
+        if str(record["id"]) in done:
+            stats.skipped += 1
+            return True
+        return False
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async for result in run_pool(
+            read_jsonl(input_path),
+            lambda record: run_one(app, record, max_iterations, pipelined_search),
+            concurrency=concurrency,
+            skip=already_done,
+        ):
+            # results arrive one at a time on the event loop - lines never interleave
+            append_result(out, result)
+            stats.add(result["latency_s"], ok="answer" in result)
+            if len(stats.latencies) % progress_every == 0:
+                print(stats.summary(), flush=True)
+
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Reflexion agent over a JSONL file of questions")
+    parser.add_argument("input", help="JSONL file with {\"id\", \"question\"} per line")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="graph runs in flight at once")
+    parser.add_argument("--max-iterations", type=int, default=3)
+    parser.add_argument("--llm-rps", type=float, default=0, help="max openai requests per second (0 = no limit)")
+    parser.add_argument("--search-rps", type=float, default=0, help="max tavily requests per second (0 = no limit)")
+    parser.add_argument("--progress-every", type=int, default=50)
+    parser.add_argument("--checkpoint-db", help="sqlite file for per-question checkpoints (resume mid-run)")
+    parser.add_argument("--pipelined-search", action="store_true", help="start searches while the tool call streams")
+    args = parser.parse_args(argv)
+
+    # read by model_router.get_model_router() / execute_tools.get_cached_tavily_tool() when the clients are created
+    if args.llm_rps:
+        os.environ["OPENAI_REQUESTS_PER_SECOND"] = str(args.llm_rps)
+    if args.search_rps:
+        os.environ["TAVILY_REQUESTS_PER_SECOND"] = str(args.search_rps)
+
+    stats = asyncio.run(
+        run_batch(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            max_iterations=args.max_iterations,
+            progress_every=args.progress_every,
+            checkpoint_db=args.checkpoint_db,
+            pipelined_search=args.pipelined_search,
+        )
+    )
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import datetime
-from langchain_openai import ChatOpenAI
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
 from schema import AnswerQuestion,ReviseAnswer
 from langchain_core.output_parsers.openai_tools import PydanticToolsParser
 from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
 
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.model_router import get_model_router
+from shared.response_cache import with_response_cache
+
 load_dotenv()
 
 
 
 pydantic_parser = PydanticToolsParser(tools=[AnswerQuestion])
 
+# the current time for the prompts, only as precise as PROMPT_TIME_GRANULARITY
+# (day (default) / hour / minute / second): a timestamp with microseconds makes every
+# prompt unique, so neither the response cache (LLM_CACHE) nor the provider's prompt
+# cache could ever match two calls
+_TIME_FORMATS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%d %H:00", "minute": "%Y-%m-%d %H:%M", "second": "%Y-%m-%d %H:%M:%S"}
+
+
+def coarse_time() -> str:
+    granularity = os.getenv("PROMPT_TIME_GRANULARITY", "day")
+    return datetime.datetime.now().strftime(_TIME_FORMATS.get(granularity, _TIME_FORMATS["day"]))
+
+
 # Actor Agent Prompt - generates initial answer with self-critique
 # This agent answers questions, then critiques its own answer to identify improvements
 actor_prompt_template = ChatPromptTemplate.from_messages(
@@ -34,25 +54,89 @@ Current time: {time}
     ]
 ).partial(
     # .partial() pre-fills template variables before runtime
-    # Inject current timestamp dynamically when the prompt is used
-    # Lambda ensures fresh timestamp on each invocation, not when template is created
-    time=lambda: datetime.datetime.now().isoformat(),
+    # Inject current time dynamically when the prompt is used
+    # A function ensures a fresh value on each invocation, not when template is created
+    time=coarse_time,
 )
 
+# PROMPT_LAYOUT=prefix_cache - same content, ordered for the provider's prompt (prefix) cache
+#
+# The provider reuses the work for the longest prompt prefix it has seen recently
+# (openai: automatic from 1024 tokens on, cached tokens are billed at a discount and
+# come back faster). The layout above puts the time and the draft / revise instruction
+# at the top of the system message, so a draft and a revision never share more than
+# the first line. prefix_cache_prompt_template orders the request as
+#
+#     stable system text   - no variables, identical for every call
+#     tool schema          - both AnswerQuestion and ReviseAnswer bound on both chains,
+#                            tool_choice picks the one to call (see actor_tools)
+#     history              - the question, drafts, search results: call n+1 starts
+#                            with what call n sent
+#     volatile tail        - the instruction of this step and the date (coarse_time)
+#
+# The cached vs uncached prompt tokens of every call are in GraphMetrics.prompt_cache_table().
+PREFIX_CACHE_LAYOUT = "prefix_cache"
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "classic")
+
+prefix_cache_prompt_template = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are expert AI researcher.
+
+1. Do the task given in the last system message.
+2. Reflect and critique your answer. Be severe to maximize improvement.
+3. After the reflection, **list 1-3 search queries separately** for researching improvements. Do not include them inside the reflection.
+""",
+        ),
+        MessagesPlaceholder(variable_name="messages"),
+        (
+            "system",
+            """Task: {first_instruction}
+Current date: {time}
+
+Answer the user's question above using the required format.""",
+        ),
+    ]
+).partial(time=coarse_time)
+
+
+def actor_prompt(first_instruction: str, layout: str = PROMPT_LAYOUT) -> ChatPromptTemplate:
+    template = prefix_cache_prompt_template if layout == PREFIX_CACHE_LAYOUT else actor_prompt_template
+    return template.partial(first_instruction=first_instruction)
+
+
+# tools to bind for a chain that must call `tool`: the prefix cache layout binds the same
+# list everywhere, so the tool definitions are part of the shared prefix
+def actor_tools(tool, layout: str = PROMPT_LAYOUT) -> list:
+    return [AnswerQuestion, ReviseAnswer] if layout == PREFIX_CACHE_LAYOUT else [tool]
+
+
 # Create specialized prompt for first response by filling in the instruction
 # .partial() again to bind first_instruction, leaving only 'messages' to be filled later
 # This creates a reusable template specifically for initial answers
-first_responder_prompt_template = actor_prompt_template.partial(
-    first_instruction="Provide a detailed ~250 word answer"
-)
+first_instruction = "Provide a detailed ~250 word answer"
+first_responder_prompt_template = actor_prompt(first_instruction)
 
 # Initialize the LLM that will power the agent
 # Can be chained with prompt: first_responder_prompt_template | llm.with_structured_output(AnswerQuestion)
-llm = ChatOpenAI(model="gpt-4o")
+# Built lazily: importing this module does not create a client or touch the network,
+# the first call creates it and lru_cache hands the same object to every later caller
+# each node gets the models of its tier (first_responder / revisor: strong) with hedging
+# and fallback between them (see shared/model_router.py)
+# OPENAI_REQUESTS_PER_SECOND (optional) puts a client-side rate limit on every call made
+# through the router - one token bucket for the whole process (used by batch_runner.py)
+def get_llm(node: str):
+    return get_model_router().for_node(node)
 
 
 # first_responsder_chain
-first_responder_chain = first_responder_prompt_template | llm.bind_tools(tools=[AnswerQuestion], tool_choice='AnswerQuestion')  
+# LLM_CACHE=exact / semantic answers repeated prompts from a local cache (shared/response_cache.py);
+# tools are bound after the cache so they are part of the cache key
+@lru_cache(maxsize=None)
+def get_first_responder_chain():
+    llm = with_response_cache(get_llm("first_responder"), "first_responder")
+    return first_responder_prompt_template | llm.bind_tools(tools=actor_tools(AnswerQuestion), tool_choice='AnswerQuestion')
 
 # ← Parses AIMessage → AnswerQuestion object
 validator = PydanticToolsParser(tools=[AnswerQuestion]) 
@@ -72,21 +156,27 @@ validator = PydanticToolsParser(tools=[AnswerQuestion])
 revise_instructions = """Revise your previous answer using the new information.
     - You should use the previous critique to add important information to your answer.
         - You MUST include numerical citations in your revised answer to ensure it can be verified.
+        - Use the citation numbers given in the search results ([1], [2], ...), they stay the same across revisions.
         - Add a "References" section to the bottom of your answer (which does not count towards the word limit). In form of:
             - [1] https://example.com
             - [2] https://example.com
     - You should use the previous critique to remove superfluous information from your answer and make SURE it is not more than 250 words.
 """
 
+revisor_prompt_template = actor_prompt(revise_instructions)
+
+
 # forcing only to use ReviseAnswer 
-revisor_chain = actor_prompt_template.partial(
-    first_instruction=revise_instructions
-) | llm.bind_tools(tools=[ReviseAnswer], tool_choice="ReviseAnswer")
+@lru_cache(maxsize=None)
+def get_revisor_chain():
+    llm = with_response_cache(get_llm("revisor"), "revisor")
+    return revisor_prompt_template | llm.bind_tools(tools=actor_tools(ReviseAnswer), tool_choice="ReviseAnswer")
 
 
-# now invoke the chain 
-response = first_responder_chain.invoke({
-    "messages": [HumanMessage("AI Agents taking over content creation")]
-})
+if __name__ == "__main__":
+    # now invoke the chain 
+    response = get_first_responder_chain().invoke({
+        "messages": [HumanMessage("AI Agents taking over content creation")]
+    })
 
-print(response)
\ No newline at end of file
+    print(response)
\ No newline at end of file
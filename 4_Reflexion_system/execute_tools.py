@@ -1,13 +1,92 @@
+import asyncio
 import json
-from typing import List, Dict, Any
+import os
+import sys
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
 from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, HumanMessage
-from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from search_cache import SearchCache, CachedSearchTool
+from pipelined_search import SearchPrefetch
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.http_clients import pooled_tavily_search_results
+from shared.local_search import local_search_results
 
 # Create the Tavily search tool
-tavily_tool = TavilySearchResults(max_results=5)
+# Built lazily on first use (creating it checks the API key), one per process
+# searches go over the shared keep-alive connection pool (shared/http_clients.py)
+# SEARCH_BACKEND=local searches the local index instead (shared/local_search.py): no api,
+# works offline, same result shape
+@lru_cache(maxsize=None)
+def get_tavily_tool():
+    if os.getenv("SEARCH_BACKEND", "tavily").lower() == "local":
+        return local_search_results(max_results=5)
+    return pooled_tavily_search_results(max_results=5)
+
+
+# Cache in front of tavily - repeated queries (same revision loop or another request
+# about the same topic) are answered from memory / sqlite instead of the network
+@lru_cache(maxsize=None)
+def get_search_cache() -> SearchCache:
+    return SearchCache()
+
+
+# TAVILY_REQUESTS_PER_SECOND (optional) rate limits the real search calls of this process
+@lru_cache(maxsize=None)
+def get_cached_tavily_tool() -> CachedSearchTool:
+    requests_per_second = float(os.getenv("TAVILY_REQUESTS_PER_SECOND", "0"))
+    rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_second) if requests_per_second > 0 else None
+    return CachedSearchTool(get_tavily_tool(), get_search_cache(), rate_limiter)
+
+# Searches started while the llm is still streaming the tool call (pipelined_search.py);
+# the search is resolved at call time, so a replaced get_cached_tavily_tool is used
+@lru_cache(maxsize=None)
+def get_search_prefetch() -> SearchPrefetch:
+    return SearchPrefetch(lambda query: get_cached_tavily_tool().invoke(query))
+
+
+# Every finished search is also sent as a "search_result" custom event, so a caller
+# streaming the graph (streaming.py) sees results as they arrive, not only when the
+# whole node is done. Outside of a graph run there is nobody to send it to.
+SEARCH_RESULT_EVENT = "search_result"
+
+
+def _emit_search_result(query: str, result: Any) -> None:
+    try:
+        dispatch_custom_event(SEARCH_RESULT_EVENT, {"query": query, "results": result})
+    except RuntimeError:
+        pass
+
+
+async def _aemit_search_result(query: str, result: Any) -> None:
+    try:
+        await adispatch_custom_event(SEARCH_RESULT_EVENT, {"query": query, "results": result})
+    except RuntimeError:
+        pass
+
+# limits for the async node - how many searches may be in flight at once
+# and how long a single search may take before we give up on it
+SEARCH_CONCURRENCY = 5
+SEARCH_TIMEOUT_SECONDS = 15.0
+
+# a prefetched search gets the same time limit as one started by the async node
+def _prefetched_result(prefetched: Future, timeout: float = SEARCH_TIMEOUT_SECONDS) -> Any:
+    try:
+        return prefetched.result(timeout=timeout)
+    except FutureTimeoutError:
+        return {"error": f"search timed out after {timeout}s"}
+
 
 # Function to execute search queries from AnswerQuestion tool calls
-def execute_tools(state: List[BaseMessage]) -> List[BaseMessage]:
+# run_searches only runs the searches and returns [(tool_call_id, {query: results})],
+# execute_tools turns that into ToolMessages with the raw json
+# (reflexion_graph uses result_shaping.py instead of json for a much smaller payload)
+def run_searches(state: List[BaseMessage]) -> List[Tuple[str, Dict[str, Any]]]:
     last_ai_message: AIMessage = state[-1]
     
     # Extract tool calls from the AI message
@@ -15,7 +94,7 @@ def execute_tools(state: List[BaseMessage]) -> List[BaseMessage]:
         return []
     
     # Process the AnswerQuestion or ReviseAnswer tool calls to extract search queries
-    tool_messages = []
+    searches = []
     
     for tool_call in last_ai_message.tool_calls:
         if tool_call["name"] in ["AnswerQuestion", "ReviseAnswer"]:
@@ -52,18 +131,95 @@ def execute_tools(state: List[BaseMessage]) -> List[BaseMessage]:
             """
             query_results = {}
             for query in search_queries:
-                result = tavily_tool.invoke(query)
+                # already running (or done) when it was prefetched from the streamed tool call
+                prefetched = get_search_prefetch().take(query)
+                result = _prefetched_result(prefetched) if prefetched is not None else get_cached_tavily_tool().invoke(query)
                 query_results[query] = result
+                _emit_search_result(query, result)
             
-            # Create a tool message with the results
-            tool_messages.append(
-                ToolMessage(
-                    content=json.dumps(query_results),
-                    tool_call_id=call_id
-                )
-            )
+            searches.append((call_id, query_results))
     
-    return tool_messages
+    return searches
+
+
+def _to_tool_messages(searches: List[Tuple[str, Dict[str, Any]]]) -> List[BaseMessage]:
+    # Create a tool message with the results
+    return [
+        ToolMessage(
+            content=json.dumps(query_results),
+            tool_call_id=call_id
+        )
+        for call_id, query_results in searches
+    ]
+
+
+def execute_tools(state: List[BaseMessage]) -> List[BaseMessage]:
+    return _to_tool_messages(run_searches(state))
+
+
+# Async version of the same node
+# execute_tools runs every query one after another: 3 queries x N tool calls in sequence
+# here all queries of all tool calls are started together, a semaphore caps how many
+# run at the same time and each query gets its own timeout
+async def _search_one(query: str, semaphore: asyncio.Semaphore, timeout: float) -> Any:
+    prefetched = get_search_prefetch().take(query)
+    async with semaphore:
+        try:
+            search = asyncio.wrap_future(prefetched) if prefetched is not None else get_cached_tavily_tool().ainvoke(query)
+            result = await asyncio.wait_for(search, timeout=timeout)
+        except asyncio.TimeoutError:
+            result = {"error": f"search timed out after {timeout}s"}
+        except Exception as e:
+            # one failing query should not throw away the results of the others
+            result = {"error": str(e)}
+    await _aemit_search_result(query, result)
+    return result
+
+
+async def arun_searches(
+    state: List[BaseMessage],
+    max_concurrency: int = SEARCH_CONCURRENCY,
+    timeout: float = SEARCH_TIMEOUT_SECONDS,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    last_ai_message: AIMessage = state[-1]
+
+    if not hasattr(last_ai_message, "tool_calls") or not last_ai_message.tool_calls:
+        return []
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # (call_id, [queries]) for every AnswerQuestion / ReviseAnswer tool call
+    calls = [
+        (tool_call["id"], tool_call["args"].get("search_queries", []))
+        for tool_call in last_ai_message.tool_calls
+        if tool_call["name"] in ["AnswerQuestion", "ReviseAnswer"]
+    ]
+
+    # flatten every query of every tool call into one gather so they all overlap
+    flat_queries = [query for _, queries in calls for query in queries]
+    flat_results = await asyncio.gather(
+        *(_search_one(query, semaphore, timeout) for query in flat_queries)
+    )
+
+    # put the results back per tool call, in the same shape as run_searches
+    searches = []
+    position = 0
+    for call_id, queries in calls:
+        query_results = {}
+        for query in queries:
+            query_results[query] = flat_results[position]
+            position += 1
+        searches.append((call_id, query_results))
+
+    return searches
+
+
+async def aexecute_tools(
+    state: List[BaseMessage],
+    max_concurrency: int = SEARCH_CONCURRENCY,
+    timeout: float = SEARCH_TIMEOUT_SECONDS,
+) -> List[BaseMessage]:
+    return _to_tool_messages(await arun_searches(state, max_concurrency, timeout))
 
 # Example usage - bare bone structure that responder chain will have 
 # content is empty becuase it is going to be tool call
@@ -104,4 +260,8 @@ test_state = [
 # print("Raw results:", results)
 # if results:
 #     parsed_content = json.loads(results[0].content)
-#     print("Parsed content:", parsed_content)
\ No newline at end of file
+#     print("Parsed content:", parsed_content)
+
+# Async version
+# results = asyncio.run(aexecute_tools(test_state))
+# print(get_search_cache().stats())  # second run should be all hits
\ No newline at end of file
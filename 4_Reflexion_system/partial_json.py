@@ -0,0 +1,114 @@
+"""
+Decoders for json that arrives in pieces (streamed tool call arguments)
+
+The llm returns AnswerQuestion / ReviseAnswer as tool call arguments, streamed as
+json fragments like '{"ans' 'wer": "Small bus' 'inesses...'. json.loads only works
+once the object is complete; these pull single fields out while it is still coming:
+
+- AnswerField       the text of one string field, piece by piece (streaming.py shows
+                    the answer before the json is complete)
+- StringListField   every string of one list-of-strings field as soon as its closing
+                    quote arrives (pipelined_search.py starts a search per query)
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def decode_string(buffer: str, i: int) -> Tuple[str, int, bool]:
+    """Decode a json string body from buffer[i:] -> (text, next position, closed).
+
+    Stops before an escape sequence that is cut in half, so the caller can
+    continue from the returned position once more input arrived.
+    """
+    out = []
+    while i < len(buffer):
+        char = buffer[i]
+        if char == '"':
+            return "".join(out), i + 1, True
+        if char != "\\":
+            out.append(char)
+            i += 1
+            continue
+        # escape sequence - wait for more input if it is cut in half
+        if i + 1 >= len(buffer):
+            break
+        kind = buffer[i + 1]
+        if kind == "u":
+            if i + 6 > len(buffer):
+                break
+            out.append(chr(int(buffer[i + 2:i + 6], 16)))
+            i += 6
+        else:
+            out.append(_ESCAPES.get(kind, kind))
+            i += 2
+    return "".join(out), i, False
+
+
+class AnswerField:
+    """Incrementally decodes one string field from a json object that arrives in pieces."""
+
+    def __init__(self, name: str = "answer"):
+        self.buffer = ""
+        self.position: Optional[int] = None  # where the string value starts / continues
+        self.done = False
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(name))
+
+    def feed(self, fragment: str) -> str:
+        """Add a fragment of the arguments json, return the newly decoded text of the field."""
+        self.buffer += fragment
+        if self.done:
+            return ""
+        if self.position is None:
+            match = self._start.search(self.buffer)
+            if match is None:
+                return ""
+            self.position = match.end()
+
+        text, self.position, self.done = decode_string(self.buffer, self.position)
+        return text
+
+
+class StringListField:
+    """Incrementally decodes a list-of-strings field, returning each string once it is complete."""
+
+    def __init__(self, name: str = "search_queries"):
+        self.buffer = ""
+        self.position: Optional[int] = None  # next unread character inside the list
+        self.partial: List[str] = []  # decoded pieces of the string being read
+        self.in_string = False
+        self.done = False
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(name))
+
+    def feed(self, fragment: str) -> List[str]:
+        """Add a fragment of the arguments json, return the strings completed by it."""
+        self.buffer += fragment
+        if self.done:
+            return []
+        if self.position is None:
+            match = self._start.search(self.buffer)
+            if match is None:
+                return []
+            self.position = match.end()
+
+        completed = []
+        while self.position < len(self.buffer):
+            if self.in_string:
+                text, self.position, closed = decode_string(self.buffer, self.position)
+                self.partial.append(text)
+                if not closed:
+                    break
+                completed.append("".join(self.partial))
+                self.partial, self.in_string = [], False
+                continue
+            char = self.buffer[self.position]
+            self.position += 1
+            if char == '"':
+                self.in_string = True
+            elif char == "]":
+                self.done = True
+                break
+            # whitespace and commas between the strings are skipped
+        return completed
@@ -0,0 +1,201 @@
+"""
+Pipelined search: start the searches while the draft / revision is still being generated
+
+Without it every iteration is strictly
+
+    first_responder / revisor  ──── whole AnswerQuestion tool call ────►  execute_tools ── searches ──►
+
+The tool call arguments stream in the schema order: answer, search_queries,
+reflection (+ references for ReviseAnswer). With pipelining each query starts as
+soon as its closing quote arrives, so the searches run while the llm is still
+writing the remaining queries, the reflection and the references:
+
+    llm    answer ........ q1 q2 q3 reflection references |
+    search                  [q1 ──────────]
+                               [q2 ──────────]
+                                  [q3 ──────────]          execute_tools: results are there / almost there
+
+- QueryPrefetchHandler is a callback handler on the chain call. Being a streaming
+  handler makes the chat model stream even inside chain.invoke (so the response
+  cache is still checked first - a cached response does not stream and nothing is
+  prefetched, execute_tools then searches as before)
+- SearchPrefetch runs the searches on a small thread pool (works under invoke and
+  ainvoke) in a copy of the caller's context (tracing / callback context vars), and
+  keeps the futures by normalized query; execute_tools takes a prefetched future
+  instead of starting the same search again
+- a hedged model call (shared/model_router.py) streams two attempts under one routed
+  run. Only the first attempt to stream a query prefetches; the queries of the other
+  one are held. The first attempt to finish is the answer the router returns: if that
+  is the other one, its held queries are started then and the searches of the first
+  one that are not in the answer are discarded
+- nothing about the graph or the checkpoints changes: after a crash the prefetch is
+  simply empty and execute_tools runs the searches itself
+- the last revision also prefetches, but its queries are never executed: the
+  revisor discards them when the loop stops (searches not started yet are cancelled,
+  the ones already running still end up in the search cache)
+- prefetched futures nobody took (a run that failed half way) are dropped after `ttl`
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+
+from partial_json import StringListField
+from search_cache import normalize_query
+
+DEFAULT_PREFETCH_WORKERS = 8
+DEFAULT_PREFETCH_TTL_SECONDS = 300.0
+
+
+class SearchPrefetch:
+    def __init__(
+        self,
+        search: Callable[[str], Any],
+        max_workers: int = DEFAULT_PREFETCH_WORKERS,
+        ttl: float = DEFAULT_PREFETCH_TTL_SECONDS,
+    ):
+        self.search = search
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-prefetch")
+        self._pending: Dict[str, Tuple[float, Future]] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.discarded = 0
+        self.expired = 0
+
+    def _drop_expired(self, now: float) -> None:
+        for key in [key for key, (started_at, _) in self._pending.items() if now - started_at > self.ttl]:
+            del self._pending[key]
+            self.expired += 1
+
+    def start(self, query: str) -> None:
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            self._drop_expired(now)
+            # same query twice in one tool call (or another run asked it just now): one search
+            if key in self._pending:
+                return
+            self._pending[key] = (now, self._pool.submit(contextvars.copy_context().run, self.search, query))
+            self.started += 1
+
+    def take(self, query: str) -> Optional[Future]:
+        """The prefetched search for `query` (removed from the prefetch), or None."""
+        with self._lock:
+            entry = self._pending.pop(normalize_query(query), None)
+            if entry is not None:
+                self.used += 1
+        return entry[1] if entry else None
+
+    def discard(self, queries: Iterable[str]) -> None:
+        """Queries that will not be executed after all (the loop stopped)."""
+        with self._lock:
+            for query in queries:
+                entry = self._pending.pop(normalize_query(query), None)
+                if entry is not None:
+                    entry[1].cancel()
+                    self.discarded += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "used": self.used,
+                "discarded": self.discarded,
+                "expired": self.expired,
+                "pending": len(self._pending),
+            }
+
+
+class QueryPrefetchHandler(BaseCallbackHandler):
+    """Starts a prefetch for every search query that completes in the streamed tool call arguments."""
+
+    # called in order with the chunks, also under ainvoke
+    run_inline = True
+
+    def __init__(self, prefetch: SearchPrefetch, field: str = "search_queries"):
+        self.prefetch = prefetch
+        self.field = field
+        # sync hedged attempts stream from the router's threads at the same time
+        self._lock = threading.Lock()
+        # one parser per llm run and tool call index
+        self._fields: Dict[Tuple[UUID, int], StringListField] = {}
+        # attempts of one routed call share its run as parent (group): the attempts still
+        # running, the one that prefetches, the one that finished first, and the queries
+        # each attempt streamed (started for the leader, held for the others)
+        self._running: Dict[UUID, Set[UUID]] = {}
+        self._leader: Dict[UUID, UUID] = {}
+        self._winner: Dict[UUID, UUID] = {}
+        self._queries: Dict[UUID, Dict[UUID, List[str]]] = {}
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._running.setdefault(parent_run_id or run_id, set()).add(run_id)
+
+    def on_llm_new_token(self, token: str, *, chunk: Any = None, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        message = getattr(chunk, "message", None)
+        group = parent_run_id or run_id
+        with self._lock:
+            if group in self._winner:
+                # a losing sync attempt that still runs in the background
+                return
+            for tool_call_chunk in getattr(message, "tool_call_chunks", None) or []:
+                parser = self._fields.setdefault((run_id, tool_call_chunk.get("index") or 0), StringListField(self.field))
+                for query in parser.feed(tool_call_chunk.get("args") or ""):
+                    self._queries.setdefault(group, {}).setdefault(run_id, []).append(query)
+                    if self._leader.setdefault(group, run_id) == run_id:
+                        self.prefetch.start(query)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        group = parent_run_id or run_id
+        with self._lock:
+            leader = self._leader.get(group)
+            if group not in self._winner and leader is not None and leader != run_id:
+                # the router returns this answer: search its queries, not the leader's
+                queries = self._queries.get(group, {})
+                answer = queries.get(run_id, [])
+                for query in answer:
+                    self.prefetch.start(query)
+                asked = {normalize_query(query) for query in answer}
+                self.prefetch.discard(query for query in queries.get(leader, []) if normalize_query(query) not in asked)
+            self._winner.setdefault(group, run_id)
+            self._forget(group, run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        group = parent_run_id or run_id
+        with self._lock:
+            if group not in self._winner and self._leader.get(group) == run_id:
+                # its searches stay until the answer decides, the next query streamed leads
+                del self._leader[group]
+            self._forget(group, run_id)
+
+    def _forget(self, group: UUID, run_id: UUID) -> None:
+        # caller holds the lock
+        for key in [key for key in self._fields if key[0] == run_id]:
+            del self._fields[key]
+        running = self._running.get(group, set())
+        running.discard(run_id)
+        if not running:
+            for state in (self._running, self._leader, self._winner, self._queries):
+                state.pop(group, None)
+
+    # these two make it a streaming handler (langchain_core's _StreamingCallbackHandler
+    # protocol): with one attached, chat models stream even when called with invoke
+    def tap_output_aiter(self, run_id: UUID, output: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        return output
+
+    def tap_output_iter(self, run_id: UUID, output: Iterator[Any]) -> Iterator[Any]:
+        return output
+
+
+def prefetch_config(config: Optional[RunnableConfig], prefetch: SearchPrefetch) -> RunnableConfig:
+    """The node's config plus a QueryPrefetchHandler, for the chain call inside the node."""
+    return merge_configs(config, {"callbacks": [QueryPrefetchHandler(prefetch)]})
@@ -1,38 +1,178 @@
-from typing import List
+import operator
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Annotated, Dict, List, Optional, TypedDict
 
-from langchain_core.messages import BaseMessage, ToolMessage
-from langgraph.graph import END, MessageGraph
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
 
-from chains import revisor_chain, first_responder_chain
-from execute_tools import execute_tools
+import chains
+from chains import get_revisor_chain, get_first_responder_chain
+from execute_tools import get_search_prefetch, run_searches, arun_searches
+from pipelined_search import prefetch_config
+from result_shaping import areport_shaping, report_shaping, shape_searches
+from search_cache import normalize_query
+
+# repository root on the path for the shared/ helpers
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.checkpointing import DeltaSqliteSaver, invoke_resumable
+from shared.coalescing import coalesce
+from shared.convergence import StopPolicy, budget_reason, is_converged, is_trivial_critique, message_tokens
+from shared.history_budget import areport_compaction, compact_history, report_compaction
+from shared.instrumentation import GraphMetrics
+from shared.response_cache import cache_report
+
+
+# typed state instead of the untyped MessageGraph list
+# - messages: the same message history as before, add_messages appends what a node returns
+# - iterations: how many times execute_tools has run, every visit adds 1 (operator.add)
+# - sources: url -> citation number, so a url keeps the same [n] across iterations
+# - started_at / tokens: wall clock start and llm tokens used so far, for the run budget
+# - stop_reason: set by the revisor once the loop should end (see shared/convergence.py)
+class ReflexionState(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+    iterations: Annotated[int, operator.add]
+    sources: Annotated[Dict[str, int], operator.or_]
+    started_at: float
+    tokens: Annotated[int, operator.add]
+    stop_reason: Optional[str]
 
-graph = MessageGraph()
 
 DRAFT = "draft"
 EXECUTE_TOOLS = "execute_tools"
 REVISOR = "revisor"
 
 
-MAX_ITERATIONS = 3
+# default, can be changed per run:
+# app.invoke(..., config={"configurable": {"max_iterations": 5}})
+DEFAULT_MAX_ITERATIONS = 3
+
 
 # Create draft, execute and revisor node
 # once node is ready, add it to the graph
-# then connects to node together 
+# then connects to node together
+
+# the chains still work on a list of messages, so the nodes just unwrap / wrap the state
+# before each chain call the history is compacted: older search dumps become short
+# snippets and the prompt stays inside a token budget (see shared/history_budget.py)
+# with PROMPT_LAYOUT=prefix_cache it grows in chunks, so each call's prompt starts with the
+# previous one (provider prompt cache, see chains.py); the saved tokens go to GraphMetrics
+def _compacted(state: ReflexionState) -> tuple:
+    return compact_history(state["messages"], lazy=chains.PROMPT_LAYOUT == chains.PREFIX_CACHE_LAYOUT)
+
+
+def _chain_input(state: ReflexionState) -> dict:
+    messages, report = _compacted(state)
+    report_compaction(report)
+    return {"messages": messages}
+
+
+async def _achain_input(state: ReflexionState) -> dict:
+    messages, report = _compacted(state)
+    await areport_compaction(report)
+    return {"messages": messages}
+
+
+# configurable "pipelined_search": True starts every search query as soon as it is complete in
+# the streamed tool call, while the llm is still writing the rest (see pipelined_search.py);
+# execute_tools then picks up the running searches instead of starting them
+def _chain_config(config: RunnableConfig) -> RunnableConfig:
+    if config.get("configurable", {}).get("pipelined_search"):
+        return prefetch_config(config, get_search_prefetch())
+    return config
 
-# now, add this nodes to graph
-graph.add_node(DRAFT, first_responder_chain)
-graph.add_node(EXECUTE_TOOLS, execute_tools)
-graph.add_node(REVISOR, revisor_chain)
 
+# the run budget starts before the draft call: the first responder is often the slowest one
+def _drafted(response: AIMessage, started_at: float) -> dict:
+    return {"messages": [response], "started_at": started_at, "tokens": message_tokens([response])}
 
 
-# add edges (no conditional edges)
+def draft_node(state: ReflexionState, config: RunnableConfig):
+    started_at = time.time()
+    return _drafted(get_first_responder_chain().invoke(_chain_input(state), _chain_config(config)), started_at)
 
-graph.add_edge("draft", "execute_tools")
-graph.add_edge("execute_tools", "revisor")
 
+async def adraft_node(state: ReflexionState, config: RunnableConfig):
+    started_at = time.time()
+    return _drafted(await get_first_responder_chain().ainvoke(await _achain_input(state), _chain_config(config)), started_at)
 
-# after connection edge from execute tools to revisor we have two condtion either revise or end 
+
+# search results go into the ToolMessages as compact numbered passages instead of the
+# raw json dump (see result_shaping.py), new urls are added to state["sources"];
+# the payload size before / after goes to GraphMetrics (search_raw_chars / search_compact_chars)
+def _shape(state: ReflexionState, searches) -> tuple:
+    question = state["messages"][0].content
+    tool_messages, new_sources, stats = shape_searches(question, searches, state.get("sources", {}))
+    return {"messages": tool_messages, "iterations": 1, "sources": new_sources}, stats
+
+
+def execute_tools_node(state: ReflexionState):
+    update, stats = _shape(state, run_searches(state["messages"]))
+    report_shaping(stats)
+    return update
+
+
+async def aexecute_tools_node(state: ReflexionState):
+    update, stats = _shape(state, await arun_searches(state["messages"]))
+    await areport_shaping(stats)
+    return update
+
+
+# the revisor also decides whether another round is worth it, event_loop only reads
+# the result - a router cannot write to the state, and this way the reason is kept
+def stop_reason(state: ReflexionState, response: AIMessage, config: RunnableConfig) -> Optional[str]:
+    policy = StopPolicy.from_config(config)
+    reason = budget_reason(policy, state.get("started_at"), state.get("tokens", 0) + message_tokens([response]))
+    if reason:
+        return reason
+
+    args = response.tool_calls[0]["args"] if response.tool_calls else {}
+    previous = [m for m in state["messages"] if isinstance(m, AIMessage) and m.tool_calls]
+    if previous and is_converged(previous[-1].tool_calls[0]["args"].get("answer"), args.get("answer", ""), policy.min_change):
+        return "converged"
+    if is_trivial_critique((args.get("reflection") or {}).get("missing")):
+        return "no_critique"
+
+    executed = {
+        normalize_query(query)
+        for message in previous
+        for query in message.tool_calls[0]["args"].get("search_queries", [])
+    }
+    queries = args.get("search_queries") or []
+    if all(normalize_query(query) in executed for query in queries):
+        return "no_new_queries"
+
+    max_iterations = config.get("configurable", {}).get("max_iterations", DEFAULT_MAX_ITERATIONS)
+    if state["iterations"] > max_iterations:
+        return "max_iterations"
+    return None
+
+
+def _revised(state: ReflexionState, response: AIMessage, config: RunnableConfig) -> dict:
+    reason = stop_reason(state, response, config)
+    if reason and response.tool_calls:
+        # the loop ends here: queries prefetched from this revision are never executed
+        get_search_prefetch().discard(response.tool_calls[0]["args"].get("search_queries", []))
+    return {
+        "messages": [response],
+        "tokens": message_tokens([response]),
+        "stop_reason": reason,
+    }
+
+
+def revisor_node(state: ReflexionState, config: RunnableConfig):
+    return _revised(state, get_revisor_chain().invoke(_chain_input(state), _chain_config(config)), config)
+
+
+async def arevisor_node(state: ReflexionState, config: RunnableConfig):
+    return _revised(state, await get_revisor_chain().ainvoke(await _achain_input(state), _chain_config(config)), config)
+
+
+# after connection edge from execute tools to revisor we have two condtion either revise or end
 """
 # After the 'revisor' node runs, call 'event_loop' to decide what's next
 workflow.add_conditional_edges(
@@ -45,40 +185,92 @@ workflow.add_conditional_edges(
 )
 
 
-The Core Check: isinstance(item, ToolMessage)
-- The isinstance() function checks if a variable matches a specific "class" or type.
-- In your LangGraph code, every time a tool runs, it adds a ToolMessage to the state.
-- This part of the code asks: "Is this specific item in the list a ToolMessage?"
+Previously event_loop counted the ToolMessages in the whole history on every step:
 
-It returns True if it is, and False if it is not.
+count_tool_visits = sum(isinstance(item, ToolMessage) for item in state)
 
-count_tool_visits = 0
-for item in state:
-    if isinstance(item, ToolMessage):
-        count_tool_visits += 1
+- that is O(n) in the length of the history and only works because every
+  execute_tools visit happens to add exactly one ToolMessage
+- now execute_tools_node returns {"iterations": 1} and the operator.add reducer keeps
+  the running total in state, so the check is a single lookup
 
+max_iterations comes from the run config, so each invocation can pick its own limit
+
+The loop also ends early - answer stopped changing, empty critique, only repeated
+search queries, time / token budget used up. The revisor puts the reason in
+state["stop_reason"]: "converged", "no_critique", "no_new_queries",
+"time_budget", "token_budget" or "max_iterations".
 """
-def event_loop(state:List[BaseMessage]) -> str:
-    count_tool_visits = sum(isinstance(item, ToolMessage) for item in state)
-    num_iterations = count_tool_visits
-    if num_iterations > MAX_ITERATIONS:
+def event_loop(state: ReflexionState) -> str:
+    if state.get("stop_reason"):
         return END
     return EXECUTE_TOOLS
 
 
-# right after revisor fo to event loop check 
-graph.add_conditional_edges(REVISOR, event_loop)
-graph.set_entry_point(DRAFT)
+# Graph is compiled on first call, not at import time, and the compiled app is reused
+# (importing this module creates no clients: python -X importtime -c "import reflexion_graph")
+# with a checkpointer every finished node is saved under the run's thread_id, so a run that
+# crashed half way can continue from the last saved node (see shared/checkpointing.py)
+@lru_cache(maxsize=None)
+def build_reflexion_app(checkpointer=None):
+    graph = StateGraph(ReflexionState)
 
+    # now, add this nodes to graph
+    # RunnableLambda with afunc: app.invoke uses the sync functions,
+    # app.ainvoke uses the async ones (arun_searches runs all search queries concurrently)
+    graph.add_node(DRAFT, RunnableLambda(draft_node, afunc=adraft_node))
+    graph.add_node(EXECUTE_TOOLS, RunnableLambda(execute_tools_node, afunc=aexecute_tools_node))
+    graph.add_node(REVISOR, RunnableLambda(revisor_node, afunc=arevisor_node))
 
-app = graph.compile()
+    # add edges (no conditional edges)
+    graph.add_edge("draft", "execute_tools")
+    graph.add_edge("execute_tools", "revisor")
 
-print(app.get_graph().draw_mermaid())
+    # right after revisor fo to event loop check
+    graph.add_conditional_edges(REVISOR, event_loop)
+    graph.set_entry_point(DRAFT)
 
-response = app.invoke(
-    "Write about how small business can leverage AI to grow"
-)
+    return graph.compile(checkpointer=checkpointer)
+
+
+# entry point for serving many users: the same question asked while it is already running
+# (or again within COALESCE_RESULT_WINDOW seconds) shares that run instead of starting the
+# whole loop again - invoke / ainvoke / astream_events, see shared/coalescing.py
+def serve_reflexion_app():
+    return coalesce(build_reflexion_app(), "reflexion")
+
+
+if __name__ == "__main__":
+    app = build_reflexion_app(checkpointer=DeltaSqliteSaver())
+
+    print(app.get_graph().draw_mermaid())
+
+    # per-node timing, tokens and search calls of this run
+    metrics = GraphMetrics()
+
+    # same thread_id after a crash (ctrl-c, rate limit, ...) resumes instead of starting over
+    response = invoke_resumable(
+        app,
+        {"messages": [HumanMessage("Write about how small business can leverage AI to grow")]},
+        {
+            # pipelined_search: searches start while the tool call is still streaming
+            "configurable": {
+                "thread_id": "small-business-ai",
+                "max_iterations": DEFAULT_MAX_ITERATIONS,
+                "pipelined_search": True,
+            },
+            "callbacks": [metrics],
+        },
+    )
+
+    # get last message in the history which is going to be AI message
+    print(response["messages"][-1].tool_calls[0]["args"]["answer"])
+    print(response, "response")
+    print(f"stopped after {response['iterations']} iterations: {response['stop_reason']}")
+    print(metrics.summary_table())
+    # hit rate per chain when LLM_CACHE=exact / semantic is set
+    print(cache_report())
 
-# get last message in the history which is going to be AI message 
-print(response[-1].tool_calls[0]["args"]["answer"])
-print(response, "response")
\ No newline at end of file
+    # async run - searches inside execute_tools run concurrently
+    # import asyncio
+    # response = asyncio.run(app.ainvoke({"messages": [HumanMessage("Write about how small business can leverage AI to grow")]}))
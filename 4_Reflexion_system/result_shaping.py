@@ -0,0 +1,169 @@
+"""
+Compact search payloads for the revisor
+
+execute_tools puts json.dumps(query_results) into the ToolMessage: 5 full pages
+of `content` per query, repeated for every query, and the revisor re-reads all of
+it on every later iteration. shape_searches() turns the same results into:
+
+    ## AI tools for small business
+    [1] https://a.com
+    most relevant sentences of page 1 ...
+    [2] https://b.com
+    ...
+    ## AI in small business marketing
+    [3] https://c.com
+    ...
+    already cited above: [1], [2]
+
+- urls are deduplicated across queries and across iterations
+- every url gets a citation number once and keeps it for the whole run, so the
+  revisor can write [n] in the answer and "[n] url" in ReviseAnswer.references
+- only the sentences that overlap most with the question + query are kept
+- plain text instead of json: no quotes, braces or repeated "url"/"content" keys
+- the size before / after (ShapingStats) is logged, and report_shaping() sends it as a
+  "search_shaping" custom event from the node - GraphMetrics adds it to execute_tools
+"""
+
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import ToolMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PASSAGE_CHARS = 400
+SHAPING_EVENT = "search_shaping"
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "was", "from", "how",
+    "what", "can", "you", "your", "about", "into", "their", "they", "has", "have",
+    "will", "its", "our", "not", "but", "all", "more", "also",
+}
+
+
+def _terms(text: str) -> set:
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2 and word not in _STOPWORDS}
+
+
+def extract_passage(content: str, focus: str, max_chars: int = DEFAULT_PASSAGE_CHARS) -> str:
+    """Keep the sentences sharing the most words with `focus`, in their original order."""
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", " ".join(content.split())) if s.strip()]
+    if not sentences:
+        return ""
+
+    focus_terms = _terms(focus)
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(_terms(sentences[i]) & focus_terms), i),
+    )
+
+    chosen = []
+    used = 0
+    for i in ranked:
+        if used + len(sentences[i]) > max_chars and chosen:
+            break
+        chosen.append(i)
+        used += len(sentences[i]) + 1
+
+    passage = " ".join(sentences[i] for i in sorted(chosen))
+    return passage if len(passage) <= max_chars else passage[:max_chars] + "..."
+
+
+@dataclass
+class ShapingStats:
+    raw_chars: int  # size of json.dumps(query_results), what execute_tools would send
+    compact_chars: int
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_chars / self.compact_chars if self.compact_chars else 0.0
+
+
+def shape_query_results(
+    question: str,
+    query_results: Dict[str, Any],
+    sources: Dict[str, int],
+    max_passage_chars: int = DEFAULT_PASSAGE_CHARS,
+) -> Tuple[str, Dict[str, int]]:
+    """Format one tool call's {query: results}; returns the text and the newly numbered urls."""
+    new_sources: Dict[str, int] = {}
+    lines: List[str] = []
+
+    for query, results in query_results.items():
+        lines.append(f"## {query}")
+        if not isinstance(results, list):
+            # failed / timed out search from aexecute_tools, or an error string from tavily
+            error = results.get("error") if isinstance(results, dict) else results
+            lines.append(f"(no results: {error})")
+            continue
+
+        seen_before = []
+        for item in results:
+            if not isinstance(item, dict) or not item.get("url"):
+                continue
+            url = item["url"]
+            if url in sources or url in new_sources:
+                seen_before.append(sources.get(url) or new_sources[url])
+                continue
+
+            number = len(sources) + len(new_sources) + 1
+            new_sources[url] = number
+            lines.append(f"[{number}] {url}")
+            lines.append(extract_passage(str(item.get("content", "")), f"{question} {query}", max_passage_chars))
+
+        if seen_before:
+            lines.append("already cited above: " + ", ".join(f"[{n}]" for n in sorted(set(seen_before))))
+
+    return "\n".join(lines), new_sources
+
+
+def shape_searches(
+    question: str,
+    searches: List[Tuple[str, Dict[str, Any]]],
+    sources: Dict[str, int],
+    max_passage_chars: int = DEFAULT_PASSAGE_CHARS,
+) -> Tuple[List[ToolMessage], Dict[str, int], ShapingStats]:
+    """Turn run_searches() output into compact ToolMessages.
+
+    `sources` is the url -> citation number map of the run so far, the returned
+    dict holds only the urls numbered in this call.
+    """
+    tool_messages = []
+    all_new: Dict[str, int] = {}
+    raw_chars = 0
+    compact_chars = 0
+
+    for call_id, query_results in searches:
+        text, new_sources = shape_query_results(
+            question, query_results, {**sources, **all_new}, max_passage_chars
+        )
+        all_new.update(new_sources)
+        raw_chars += len(json.dumps(query_results))
+        compact_chars += len(text)
+        tool_messages.append(ToolMessage(content=text, tool_call_id=call_id))
+
+    stats = ShapingStats(raw_chars=raw_chars, compact_chars=compact_chars)
+    logger.info(
+        "search payload: %d -> %d chars (%.1fx smaller), %d new sources",
+        stats.raw_chars, stats.compact_chars, stats.ratio, len(all_new),
+    )
+    return tool_messages, all_new, stats
+
+
+# outside of a graph run there is nobody to report to
+def report_shaping(stats: ShapingStats) -> None:
+    try:
+        dispatch_custom_event(SHAPING_EVENT, asdict(stats))
+    except RuntimeError:
+        pass
+
+
+async def areport_shaping(stats: ShapingStats) -> None:
+    try:
+        await adispatch_custom_event(SHAPING_EVENT, asdict(stats))
+    except RuntimeError:
+        pass
@@ -0,0 +1,203 @@
+"""
+Search result cache that sits in front of the tavily tool
+
+The reflexion loop sends almost the same search queries on every revision and
+different users ask about the same topics, so we keep the results around:
+
+    query ──► memory (LRU) ──hit──► result
+                  │ miss
+                  ▼
+              sqlite (disk) ──hit──► result (also copied back into memory)
+                  │ miss
+                  ▼
+              tavily api ──► stored in both tiers
+
+- key = search tool + normalized query text + max_results
+  "AI tools  for Small Business" and "ai tools for small business" are the same search,
+  Tavily and the local index (SEARCH_BACKEND=local) never answer for each other
+- every entry has a TTL, expired entries are treated as a miss and removed
+- memory tier keeps at most `max_memory_entries`, least recently used goes out first
+- disk tier keeps at most `max_disk_entries`, oldest entries go out first
+- only a list of result dicts is stored: on a network / api error TavilySearchResults
+  returns repr(e) instead of raising (TavilySearch: {"error": e}), that is passed on
+  to the caller but never cached
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.sqlite")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def normalize_query(query: str) -> str:
+    # lower case + collapse whitespace so trivial variations hit the same entry
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10_000,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        # (source, query, max_results) -> (stored_at, result)
+        self._memory: "OrderedDict[Tuple[str, str, int], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # hit / miss counters, see stats()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # path=None keeps everything in memory only
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # the first layout had no source column: its rows could be from either backend
+            self._db.execute("DROP TABLE IF EXISTS search_cache")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS search_results (
+                    source TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    max_results INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (source, query, max_results)
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS search_results_stored_at ON search_results (stored_at)"
+            )
+            self._db.commit()
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def get(self, query: str, max_results: int, source: str = "") -> Optional[Any]:
+        key = (source, normalize_query(query), max_results)
+        with self._lock:
+            # 1. memory tier
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return result
+                del self._memory[key]
+
+            # 2. disk tier
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT stored_at, result FROM search_results WHERE source = ? AND query = ? AND max_results = ?",
+                    key,
+                ).fetchone()
+                if row is not None:
+                    stored_at, payload = row
+                    if not self._expired(stored_at):
+                        result = json.loads(payload)
+                        self._remember(key, stored_at, result)
+                        self.disk_hits += 1
+                        return result
+                    self._db.execute(
+                        "DELETE FROM search_results WHERE source = ? AND query = ? AND max_results = ?", key
+                    )
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, query: str, max_results: int, result: Any, source: str = "") -> None:
+        key = (source, normalize_query(query), max_results)
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, result)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)",
+                    (*key, stored_at, json.dumps(result)),
+                )
+                # keep only the newest max_disk_entries rows
+                self._db.execute(
+                    """DELETE FROM search_results WHERE rowid IN (
+                        SELECT rowid FROM search_results ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def _remember(self, key: Tuple[str, str, int], stored_at: float, result: Any) -> None:
+        # caller holds the lock
+        self._memory[key] = (stored_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+def is_search_result(result: Any) -> bool:
+    # a real answer is a list of {"url", "content", ...}; error strings / {"error": ...} are not
+    return isinstance(result, list) and all(isinstance(item, dict) for item in result)
+
+
+class CachedSearchTool:
+    """Wraps a search tool (TavilySearchResults) with the same invoke / ainvoke interface.
+
+    An optional rate_limiter (langchain_core InMemoryRateLimiter) is only consulted
+    on a cache miss - cached answers never wait for the search api budget.
+    Entries are keyed by the tool's name, so one SearchCache can sit in front of
+    several backends.
+    """
+
+    def __init__(self, tool: Any, cache: SearchCache, rate_limiter: Any = None):
+        self.tool = tool
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.max_results = getattr(tool, "max_results", 5)
+        self.source = getattr(tool, "name", None) or type(tool).__name__
+
+    def invoke(self, query: str) -> Any:
+        result = self.cache.get(query, self.max_results, self.source)
+        if result is None:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            result = self.tool.invoke(query)
+            # failed searches come back as an error string / dict and are not stored
+            if is_search_result(result):
+                self.cache.set(query, self.max_results, result, self.source)
+        return result
+
+    async def ainvoke(self, query: str) -> Any:
+        result = self.cache.get(query, self.max_results, self.source)
+        if result is None:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+            result = await self.tool.ainvoke(query)
+            if is_search_result(result):
+                self.cache.set(query, self.max_results, result, self.source)
+        return result
@@ -0,0 +1,126 @@
+"""
+Streaming interface for the Reflexion graph
+
+app.invoke only returns after draft → search → revise x3 is done. stream_reflexion()
+yields typed events while the graph is running:
+
+    NodeStart("draft")
+    AnswerDelta("draft", "Small businesses can ")     ← first tokens of the first draft
+    AnswerDelta("draft", "use AI to ...")
+    NodeEnd("draft")
+    NodeStart("execute_tools")
+    SearchResult("AI tools for small business", [...])   ← one per query, as it finishes
+    ...
+    NodeStart("revisor")
+    AnswerDelta("revisor", "...")
+    ...
+    FinalAnswer(answer, references)
+
+The llm returns the answer inside tool call arguments (AnswerQuestion / ReviseAnswer),
+streamed as json fragments like '{"ans' 'wer": "Small bus' 'inesses...'. AnswerField
+(partial_json.py) decodes the "answer" string from those fragments as they come in,
+so text can be shown before the json is complete.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Union
+
+from langchain_core.messages import HumanMessage
+
+from execute_tools import SEARCH_RESULT_EVENT
+from partial_json import AnswerField
+from reflexion_graph import DEFAULT_MAX_ITERATIONS, build_reflexion_app
+
+
+@dataclass
+class NodeStart:
+    node: str
+
+
+@dataclass
+class NodeEnd:
+    node: str
+
+
+@dataclass
+class SearchResult:
+    query: str
+    results: Any
+
+
+@dataclass
+class AnswerDelta:
+    node: str  # "draft" or "revisor"
+    text: str
+
+
+@dataclass
+class FinalAnswer:
+    answer: str
+    references: List[str] = field(default_factory=list)
+
+
+ReflexionEvent = Union[NodeStart, NodeEnd, SearchResult, AnswerDelta, FinalAnswer]
+
+
+async def stream_reflexion(
+    question: str,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    app: Any = None,
+) -> AsyncIterator[ReflexionEvent]:
+    app = app or build_reflexion_app()
+    nodes = {"draft", "execute_tools", "revisor"}
+    # one decoder per llm run (run_id), a new draft / revision starts a fresh answer
+    fields: Dict[str, AnswerField] = {}
+
+    async for event in app.astream_events(
+        {"messages": [HumanMessage(question)]},
+        config={"configurable": {"max_iterations": max_iterations}},
+        version="v2",
+    ):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_start" and event["name"] in nodes and event["name"] == node:
+            yield NodeStart(node)
+
+        elif kind == "on_chain_end" and event["name"] in nodes and event["name"] == node:
+            yield NodeEnd(node)
+
+        elif kind == "on_chat_model_stream":
+            chunk = event["data"]["chunk"]
+            answer = fields.setdefault(event["run_id"], AnswerField("answer"))
+            for tool_call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                text = answer.feed(tool_call_chunk.get("args") or "")
+                if text:
+                    yield AnswerDelta(node, text)
+
+        elif kind == "on_chat_model_end":
+            fields.pop(event["run_id"], None)
+
+        elif kind == "on_custom_event" and event["name"] == SEARCH_RESULT_EVENT:
+            yield SearchResult(event["data"]["query"], event["data"]["results"])
+
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            # the graph itself finished - last message is the final ReviseAnswer
+            output = event["data"].get("output") or {}
+            messages = output.get("messages") or []
+            if messages and getattr(messages[-1], "tool_calls", None):
+                args = messages[-1].tool_calls[0]["args"]
+                yield FinalAnswer(args.get("answer", ""), args.get("references", []))
+
+
+if __name__ == "__main__":
+    async def main():
+        async for event in stream_reflexion("Write about how small business can leverage AI to grow"):
+            if isinstance(event, AnswerDelta):
+                print(event.text, end="", flush=True)
+            elif isinstance(event, (NodeStart, NodeEnd)):
+                print(f"\n--- {type(event).__name__}: {event.node}")
+            elif isinstance(event, SearchResult):
+                print(f"\n[search] {event.query}")
+            elif isinstance(event, FinalAnswer):
+                print("\n\n=== FINAL ===\n" + event.answer)
+
+    asyncio.run(main())
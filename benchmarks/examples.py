@@ -0,0 +1,35 @@
+"""
+Importing the example folders from the benchmarks and the tests
+
+The example folders are scripts, not packages, and reuse module names
+(3_chains/chains.py, 4_Reflexion_system/chains.py). load_example imports a module
+the way `python module.py` inside the folder would see it, then takes everything
+it imported from that folder out of sys.modules again, so every caller gets fresh
+modules and the folders do not shadow each other.
+"""
+
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_example(folder: str, module: str) -> Dict[str, ModuleType]:
+    """Import `module` from an example folder, return the folder's modules by name."""
+    path = str(ROOT / folder)
+    before = set(sys.modules)
+    sys.path.insert(0, path)
+    try:
+        importlib.import_module(module)
+    finally:
+        sys.path.remove(path)
+
+    loaded = {}
+    for name in set(sys.modules) - before:
+        file = getattr(sys.modules[name], "__file__", None) or ""
+        if file.startswith(path):
+            loaded[name] = sys.modules.pop(name)
+    return loaded
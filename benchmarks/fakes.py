@@ -0,0 +1,282 @@
+"""
+Fake chat models and a fake search tool for offline runs
+
+Nothing here talks to the network: responses are scripted and `latency` is a
+plain sleep, so a graph run is deterministic and its timing is framework
+overhead + the latency we injected.
+
+- ScriptedChatModel   - BaseChatModel whose reply is produced by a python function
+                        (optionally with per-call latency, injected errors and a
+                        provider-style prompt prefix cache)
+- reflexion_responder - AnswerQuestion on the first call, ReviseAnswer afterwards
+- tweet_responder     - plain text replies for the 3_chains reflection loop
+- react_responder     - tavily tool call(s), then a final answer (2_introduction)
+- essay_responder     - EvaluationSchema scores, then a summary (essay_batch.py)
+- FakeSearchTool      - BaseTool with the TavilySearchResults result shape
+- cpu_scoring_node    - CPU-bound pure python node for the execution policy benchmark
+"""
+
+import asyncio
+import json
+import os
+import time
+import zlib
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import BaseTool
+
+
+def _count_tokens(text: str) -> int:
+    # rough 4 chars per token, good enough for usage numbers of fake replies
+    return len(text) // 4 + 1
+
+
+def _message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+class RateLimitError(Exception):
+    """Named like openai.RateLimitError, so code that checks the error type treats it the same."""
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers with `responder(messages, call_number)` after `latency` seconds.
+
+    latency_for(call_number) replaces the fixed latency (slow tails, ...), error_for(call_number)
+    can return an exception to raise instead of answering (rate limits, timeouts, ...).
+
+    prefix_cache=True reports usage like openai's prompt caching: the longest prefix shared
+    with an earlier prompt counts as cached (input_token_details.cache_read), from 1024
+    tokens on and in steps of 128 tokens.
+    """
+
+    responder: Callable[[List[BaseMessage], int], AIMessage]
+    latency: float = 0.0
+    latency_for: Optional[Callable[[int], float]] = None
+    error_for: Optional[Callable[[int], Optional[Exception]]] = None
+    chunk_chars: int = 16
+    prefix_cache: bool = False
+    calls: int = 0
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def _start_call(self) -> tuple:
+        self.calls += 1
+        call = self.calls
+        latency = self.latency_for(call) if self.latency_for else self.latency
+        error = self.error_for(call) if self.error_for else None
+        return call, latency, error
+
+    def _reply(self, messages: List[BaseMessage], call: int) -> ChatResult:
+        message = self.responder(messages, call)
+        prompt_tokens = sum(_count_tokens(_message_text(m)) for m in messages)
+        completion_tokens = _count_tokens(_message_text(message)) + sum(
+            _count_tokens(str(call["args"])) for call in message.tool_calls
+        )
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if self.prefix_cache:
+            message.usage_metadata["input_token_details"] = {"cache_read": min(self._cached_tokens(messages), prompt_tokens)}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _cached_tokens(self, messages: List[BaseMessage]) -> int:
+        prompt = "".join(
+            f"<{m.type}>{_message_text(m)}{json.dumps(getattr(m, 'tool_calls', None) or [])}" for m in messages
+        )
+        shared = 0
+        for earlier in self.prompts:
+            common = os.path.commonprefix([earlier, prompt])
+            shared = max(shared, len(common))
+        self.prompts.append(prompt)
+        tokens = shared // 4
+        return tokens // 128 * 128 if tokens >= 1024 else 0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        call, latency, error = self._start_call()
+        if latency:
+            time.sleep(latency)
+        if error is not None:
+            raise error
+        return self._reply(messages, call)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        call, latency, error = self._start_call()
+        if latency:
+            await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        return self._reply(messages, call)
+
+    # streaming: text content and tool call arguments (as json) come out in pieces of
+    # `chunk_chars`, with `latency` spread evenly over the pieces
+    def _chunks(self, messages: List[BaseMessage], call: int) -> List[AIMessageChunk]:
+        message = self._reply(messages, call).generations[0].message
+        chunks = [
+            AIMessageChunk(content=message.content[i:i + self.chunk_chars])
+            for i in range(0, len(message.content), self.chunk_chars)
+        ]
+        for index, call in enumerate(message.tool_calls):
+            args = json.dumps(call["args"])
+            for i in range(0, len(args), self.chunk_chars):
+                first = i == 0
+                chunks.append(AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": call["name"] if first else None,
+                    "args": args[i:i + self.chunk_chars],
+                    "id": call["id"] if first else None,
+                    "index": index,
+                }]))
+        chunks.append(AIMessageChunk(content="", usage_metadata=message.usage_metadata))
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        call, latency, error = self._start_call()
+        if error is not None:
+            raise error
+        chunks = self._chunks(messages, call)
+        for chunk in chunks:
+            if latency:
+                time.sleep(latency / len(chunks))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        call, latency, error = self._start_call()
+        if error is not None:
+            raise error
+        chunks = self._chunks(messages, call)
+        for chunk in chunks:
+            if latency:
+                await asyncio.sleep(latency / len(chunks))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    def bind_tools(self, tools: Any, *, tool_choice: Optional[str] = None, **kwargs: Any):
+        # the responder already knows which tool call to produce
+        return self
+
+
+def reflexion_responder(
+    answer_words: int = 250, queries_per_call: int = 3, converge_after: Optional[int] = None
+) -> Callable[[List[BaseMessage], int], AIMessage]:
+    # every call writes a different answer, so early stopping never kicks in -
+    # unless converge_after is set: from that call on the answer stays the same
+    def respond(messages: List[BaseMessage], call_number: int) -> AIMessage:
+        revising = any(isinstance(m, ToolMessage) for m in messages)
+        version = call_number if converge_after is None else min(call_number, converge_after)
+        args = {
+            "answer": " ".join(f"word{version}-{i}" for i in range(answer_words)),
+            "search_queries": [f"query {call_number}.{i}" for i in range(queries_per_call)],
+            "reflection": {"missing": "more numbers", "superfluous": "intro"},
+        }
+        if revising:
+            args["references"] = ["[1] https://example.com/1"]
+        return AIMessage(
+            content="",
+            tool_calls=[{
+                "name": "ReviseAnswer" if revising else "AnswerQuestion",
+                "args": args,
+                "id": f"call_{call_number}",
+            }],
+        )
+
+    return respond
+
+
+def tweet_responder(words: int = 60) -> Callable[[List[BaseMessage], int], AIMessage]:
+    def respond(messages: List[BaseMessage], call_number: int) -> AIMessage:
+        return AIMessage(content=" ".join(f"tweet{call_number}-{i}" for i in range(words)))
+
+    return respond
+
+
+def react_responder(tool_name: str = "tavily_search", queries: int = 1) -> Callable[[List[BaseMessage], int], AIMessage]:
+    # queries > 1: that many tool calls in the one turn (parallel tool calls)
+    def respond(messages: List[BaseMessage], call_number: int) -> AIMessage:
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content="It is sunny and 18°C in San Francisco.")
+        cities = ["San Francisco", "Oakland", "San Jose", "Berkeley", "Palo Alto"]
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": tool_name, "args": {"query": f"weather {cities[i % len(cities)]}"}, "id": f"call_{call_number}_{i}"}
+                for i in range(queries)
+            ],
+        )
+
+    return respond
+
+
+def essay_responder() -> Callable[[List[BaseMessage], int], AIMessage]:
+    def respond(messages: List[BaseMessage], call_number: int) -> AIMessage:
+        prompt = _message_text(messages[-1])
+        if prompt.startswith("Based on the following feedbacks"):
+            return AIMessage(content="Overall: clear structure, needs more evidence.")
+        # score depends on the prompt, so the same essay always gets the same scores
+        score = zlib.crc32(prompt.encode()) % 11
+        return AIMessage(
+            content="",
+            tool_calls=[{
+                "name": "EvaluationSchema",
+                "args": {"feedback": f"Feedback {score}/10", "score": score},
+                "id": f"call_{call_number}",
+            }],
+        )
+
+    return respond
+
+
+def cpu_scoring_node(state: dict, key: str = "score", rounds: int = 20) -> dict:
+    """Tokenize + count + hash the text `rounds` times: pure python, holds the GIL.
+
+    Module level (and used through functools.partial) so a process pool can pickle it.
+    """
+    text = state["text"]
+    total = 0
+    for round_number in range(rounds):
+        counts = {}
+        for word in text.lower().split():
+            word = word.strip(".,!?")
+            counts[word] = counts.get(word, 0) + 1
+        total += sum(zlib.crc32(word.encode()) % 97 * count for word, count in counts.items()) + round_number
+    return {key: [total]}
+
+
+class FakeSearchTool(BaseTool):
+    """Returns `max_results` results of `content_chars` characters each, like TavilySearchResults."""
+
+    name: str = "tavily_search"
+    description: str = "Search the web. Input should be a search query."
+    max_results: int = 5
+    content_chars: int = 2000
+    latency: float = 0.0
+    calls: int = 0
+
+    def _results(self, query: str) -> list:
+        self.calls += 1
+        body = (f"{query} " * (self.content_chars // (len(query) + 1) + 1))[: self.content_chars]
+        return [
+            {"url": f"https://example.com/{zlib.crc32(query.encode()) % 10_000}/{i}", "content": body}
+            for i in range(self.max_results)
+        ]
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> list:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._results(query)
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> list:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._results(query)
@@ -0,0 +1,789 @@
+"""
+Offline benchmarks for the example graphs
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json
+
+Every graph runs with the fake chat models / search tool from fakes.py, so no
+api keys are needed and the numbers only change when our code changes.
+
+- state_dive      3_state_dive/1_basic_state.py and 2_complex_state.py
+- reflection      3_chains/basic.py (generate <-> reflect)
+- reflexion[N]    4_Reflexion_system/reflexion_graph.py with max_iterations = N
+                  (reflexion_pipelined[N]: searches start while the tool call streams)
+- react           2_introduction/react_agent_basic.py (react[tools=4]: four tool calls
+                  in one turn; react_runner[...]: the same through react_runner.py)
+- essay_batch     2_langraph_workflow/2_parallel_worklfow/essay_batch.py, essays/min
+- merge[...]      reducer cost (add_messages, operator.concat) for a history of n items
+- append[...]     n appends to a history field: operator.concat vs AppendChannel
+                  (list / array), channel only and through a graph of n steps
+- columnar[...]   bmi / cricket / quadratic workflows: one invoke per record (notebook
+                  graph, timed on a sample) vs one columnar invoke over n records;
+                  the sample is also checked to give the same results
+- execution[...]  CPU-bound fan-out (START -> n pure python nodes) with every node
+                  inline / on the thread pool / on the process pool
+- router[...]     shared/model_router.py with fake models: a primary with a slow tail
+                  (every 10th call 20x slower) with and without hedging (p50 / p95 /
+                  p99 per call), and a primary that rate-limits every 3rd call
+- prompt_cache[...] reflexion run with the classic and the prefix_cache prompt layout
+                  (4_Reflexion_system/chains.py) against a fake model that reports
+                  openai-style cached prompt tokens; share of prompt tokens cached
+- coalescing[...] n concurrent reflexion requests over a few distinct questions (case /
+                  spacing variants): every request runs the graph vs shared/coalescing.py
+                  (ainvoke and astream_events subscribers); llm calls and dedup rate
+- local_search[...] shared/local_search.py over n synthetic documents (zipf word
+                  frequencies): build time, an incremental add of 1% changed documents,
+                  query latency p50 / p95 of 3-word queries
+- http_pool[...]  n search requests to a local stub server (stub_server.py): a new
+                  connection per request (what the tavily wrappers do: requests.post,
+                  an aiohttp session per call) vs the shared pools of shared/http_clients.py,
+                  with 30 ms per new connection standing in for the TLS handshake
+
+Per entry: median wall time, graph steps, time per step, time per node and
+peak python memory (tracemalloc). The output file also records the git commit
+so two files from different commits can be compared with --compare.
+"""
+
+import argparse
+import asyncio
+import json
+import operator
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from types import ModuleType
+from typing import Annotated, Callable, Dict, List, Sequence, TypedDict
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.channels import BinaryOperatorAggregate
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from examples import load_example  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+from fakes import (  # noqa: E402
+    FakeSearchTool,
+    RateLimitError,
+    ScriptedChatModel,
+    cpu_scoring_node,
+    essay_responder,
+    react_responder,
+    reflexion_responder,
+    tweet_responder,
+)
+from shared.append_log import AppendChannel  # noqa: E402
+from shared.coalescing import CoalescingApp  # noqa: E402
+from shared.execution import EXECUTIONS, ExecutionStateGraph  # noqa: E402
+from shared.instrumentation import GraphMetrics  # noqa: E402
+from shared.http_clients import apost_json, http_pool_stats, post_json  # noqa: E402
+from shared.local_search import LocalSearchIndex  # noqa: E402
+from shared.model_router import ModelRouter  # noqa: E402
+
+
+def _timed_stream(app, graph_input, config=None) -> tuple:
+    """One run through app.stream: total seconds, number of steps, seconds per node."""
+    nodes: Dict[str, float] = {}
+    steps = 0
+    started = last = time.perf_counter()
+    for update in app.stream(graph_input, config=config, stream_mode="updates"):
+        now = time.perf_counter()
+        for node in update:
+            nodes[node] = nodes.get(node, 0.0) + (now - last)
+        steps += 1
+        last = now
+    return time.perf_counter() - started, steps, nodes
+
+
+def bench_graph(name: str, make_run: Callable[[], tuple], repeats: int) -> dict:
+    """make_run() -> (app, graph_input, config); a fresh one per repeat keeps runs independent."""
+    walls, node_totals, steps = [], {}, 0
+    for _ in range(repeats):
+        app, graph_input, config = make_run()
+        wall, steps, nodes = _timed_stream(app, graph_input, config)
+        walls.append(wall)
+        for node, seconds in nodes.items():
+            node_totals.setdefault(node, []).append(seconds)
+
+    # memory in a separate run, tracemalloc slows everything down
+    app, graph_input, config = make_run()
+    tracemalloc.start()
+    app.invoke(graph_input, config=config)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall_ms = statistics.median(walls) * 1000
+    return {
+        "name": name,
+        "wall_ms": round(wall_ms, 3),
+        "steps": steps,
+        "ms_per_step": round(wall_ms / steps, 3) if steps else 0.0,
+        "node_ms": {node: round(statistics.median(values) * 1000, 3) for node, values in node_totals.items()},
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def state_dive_runs() -> List[tuple]:
+    basic = load_example("3_state_dive", "1_basic_state")["1_basic_state"]
+    complex_ = load_example("3_state_dive", "2_complex_state")["2_complex_state"]
+    return [
+        ("state_dive.basic", lambda: (basic.app, {"count": 0}, None)),
+        ("state_dive.complex", lambda: (complex_.app, {"count": 0, "sum": 0, "history": []}, None)),
+    ]
+
+
+def reflection_runs(latency: float) -> List[tuple]:
+    modules = load_example("3_chains", "basic")
+    basic, chains = modules["basic"], modules["chains"]
+
+    def make_run():
+        model = ScriptedChatModel(responder=tweet_responder(), latency=latency)
+        basic.get_generation_chain = lambda: chains.generation_prompt | model
+        basic.get_reflection_chain = lambda: chains.reflection_prompt | model
+        basic.build_reflection_app.cache_clear()
+        return basic.build_reflection_app(), HumanMessage("AI Agents taking over content creation"), None
+
+    return [("reflection", make_run)]
+
+
+def reflexion_runs(latency: float, iterations: List[int]) -> List[tuple]:
+    modules = load_example("4_Reflexion_system", "reflexion_graph")
+    graph, chains, tools, cache = (
+        modules["reflexion_graph"], modules["chains"], modules["execute_tools"], modules["search_cache"]
+    )
+
+    def make_run_for(max_iterations: int, pipelined: bool = False):
+        def make_run():
+            model = ScriptedChatModel(responder=reflexion_responder(), latency=latency)
+            search = FakeSearchTool(latency=latency)
+            graph.get_first_responder_chain = lambda: chains.first_responder_prompt_template | model
+            graph.get_revisor_chain = lambda: chains.revisor_prompt_template | model
+            # fresh in-memory cache per run: every query really goes to the fake tool
+            tools.get_cached_tavily_tool = lambda: cache.CachedSearchTool(search, cache.SearchCache(path=None))
+            graph.build_reflexion_app.cache_clear()
+            return (
+                graph.build_reflexion_app(),
+                {"messages": [HumanMessage("Write about how small business can leverage AI to grow")]},
+                {"configurable": {"max_iterations": max_iterations, "pipelined_search": pipelined}},
+            )
+        return make_run
+
+    return [(f"reflexion[iterations={n}]", make_run_for(n)) for n in iterations] + [
+        (f"reflexion_pipelined[iterations={n}]", make_run_for(n, pipelined=True)) for n in iterations
+    ]
+
+
+def react_runs(latency: float) -> List[tuple]:
+    modules = load_example("2_introduction", "react_runner")
+    react, runner = modules["react_agent_basic"], modules["react_runner"]
+    question = {"messages": [("user", "What is the weather in the Bay Area?")]}
+
+    def make_run():
+        model = ScriptedChatModel(responder=react_responder(), latency=latency)
+        agent = react.build_agent(llm=model, tools=[FakeSearchTool(latency=latency)])
+        return agent, {"messages": [("user", "What is the weather in San Francisco?")]}, None
+
+    def make_parallel_run(runner_agent: bool):
+        def make_run():
+            model = ScriptedChatModel(responder=react_responder(queries=4), latency=latency)
+            tools = [FakeSearchTool(latency=latency)]
+            if not runner_agent:
+                return react.build_agent(llm=model, tools=tools), question, None
+            # a fresh cache per run: only the in-run reuse counts, not the repeats before it
+            agent = runner.build_react_runner(llm=model, tools=tools, cache=runner.ToolResultCache())
+            return agent, question, {"callbacks": [runner.ReActTrace()]}
+        return make_run
+
+    return [
+        ("react", make_run),
+        ("react[tools=4]", make_parallel_run(False)),
+        ("react_runner[tools=4]", make_parallel_run(True)),
+    ]
+
+
+def bench_essays(latency: float, essays: int, concurrency: int) -> dict:
+    essay_batch = load_example("2_langraph_workflow/2_parallel_worklfow", "essay_batch")["essay_batch"]
+    model = ScriptedChatModel(responder=essay_responder(), latency=latency)
+    essay_batch.get_model = lambda: model
+    records = ({"id": str(i), "essay": f"essay {i} about artificial intelligence"} for i in range(essays))
+
+    async def run():
+        return [result async for result in essay_batch.evaluate_stream(records, concurrency=concurrency)]
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    wall = time.perf_counter() - started
+    return {
+        "name": f"essay_batch[n={essays},concurrency={concurrency}]",
+        "wall_ms": round(wall * 1000, 3),
+        "essays_per_min": round(len(results) / wall * 60, 1),
+        "llm_calls": model.calls,
+    }
+
+
+def bench_merge(sizes: List[int], repeats: int) -> List[dict]:
+    """Cost of appending one item to a history of n items with the reducers the graphs use."""
+    results = []
+    for n in sizes:
+        messages = [AIMessage(content=f"m{i}", id=str(i)) for i in range(n)]
+        numbers = list(range(n))
+        new_message = [AIMessage(content="new", id="new")]
+        for name, merge in (
+            ("add_messages", lambda: add_messages(messages, new_message)),
+            ("operator.concat", lambda: operator.concat(numbers, [n])),
+        ):
+            times = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                merge()
+                times.append(time.perf_counter() - started)
+            results.append({"name": f"merge[{name},n={n}]", "wall_ms": round(statistics.median(times) * 1000, 4)})
+    return results
+
+
+# the three ways to declare an append-only history field
+def _history_channels() -> Dict[str, Callable[[], object]]:
+    return {
+        "operator.concat": lambda: BinaryOperatorAggregate(list, operator.concat),
+        "AppendChannel": lambda: AppendChannel(),
+        "AppendChannel[q]": lambda: AppendChannel("q"),
+    }
+
+
+def _append_loop(make_channel: Callable[[], object], steps: int) -> None:
+    # what the graph does with the field every step: apply the update, read the value
+    channel = make_channel()
+    for i in range(steps):
+        channel.update([[i]])
+        channel.get()
+
+
+def _append_graph(make_channel: Callable[[], object]):
+    class LoopState(TypedDict):
+        count: int
+        limit: int
+        history: Annotated[Sequence[int], make_channel()]
+
+    def step(state):
+        return {"count": state["count"] + 1, "history": [state["count"]]}
+
+    graph = StateGraph(LoopState)
+    graph.add_node("step", step)
+    graph.set_entry_point("step")
+    graph.add_conditional_edges("step", lambda state: "step" if state["count"] < state["limit"] else END)
+    return graph
+
+
+def bench_append(steps: List[int], graph_steps: List[int], concat_max: int) -> List[dict]:
+    """n appends to a history field; operator.concat above concat_max is skipped (O(n²), minutes)."""
+    results = []
+    for n in steps:
+        for name, make_channel in _history_channels().items():
+            if name == "operator.concat" and n > concat_max:
+                continue
+            started = time.perf_counter()
+            _append_loop(make_channel, n)
+            wall = time.perf_counter() - started
+            tracemalloc.start()
+            _append_loop(make_channel, n)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({
+                "name": f"append[{name},n={n}]",
+                "wall_ms": round(wall * 1000, 3),
+                "us_per_append": round(wall / n * 1e6, 3),
+                "peak_kb": round(peak / 1024, 1),
+            })
+
+    for n in graph_steps:
+        for name, make_channel in _history_channels().items():
+            if name == "operator.concat" and n > concat_max:
+                continue
+            app = _append_graph(make_channel).compile()
+            started = time.perf_counter()
+            app.invoke({"count": 0, "history": [], "limit": n}, config={"recursion_limit": n + 10})
+            wall = time.perf_counter() - started
+            results.append({
+                "name": f"append_graph[{name},n={n}]",
+                "wall_ms": round(wall * 1000, 3),
+                "us_per_append": round(wall / n * 1e6, 3),
+            })
+    return results
+
+
+# (folder, module, output keys compared between the record and the columnar graph)
+COLUMNAR_WORKFLOWS = {
+    "bmi": ("2_langraph_workflow/1_sequential_workflow", "bmi_columnar", ("bmi", "category")),
+    "cricket": ("2_langraph_workflow/2_parallel_worklfow", "cricket_columnar", ("sr", "bpb", "boundary_percent")),
+    "quadratic": ("2_langraph_workflow/3_conditional_workflow", "quadratic_columnar", ("discriminant", "result")),
+}
+
+
+def _columnar_outputs(name: str, module: ModuleType, state: dict, keys: Sequence[str], n: int) -> List[tuple]:
+    # columnar state -> the values the notebook graph returns, row by row
+    columns = {key: state[key][:n].tolist() for key in keys if key in state}
+    if name == "bmi":
+        columns["category"] = module.category_labels(state["category"][:n]).tolist()
+    if name == "quadratic":
+        columns["result"] = module.results(state, 0, n)
+    return list(zip(*(columns[key] for key in keys)))
+
+
+def bench_columnar(records: int, sample: int) -> List[dict]:
+    results = []
+    for name, (folder, module_name, keys) in COLUMNAR_WORKFLOWS.items():
+        module = load_example(folder, module_name)[module_name]
+        columns = module.random_columns(records)
+        columnar = module.build_columnar_workflow()
+        record_workflow = module.build_record_workflow()
+
+        started = time.perf_counter()
+        state = columnar.invoke(columns)
+        columnar_wall = time.perf_counter() - started
+
+        n = min(sample, records)
+        started = time.perf_counter()
+        expected = [
+            tuple(record_workflow.invoke(record)[key] for key in keys)
+            for record in (dict(zip(columns, row)) for row in zip(*(column[:n].tolist() for column in columns.values())))
+        ]
+        record_wall = (time.perf_counter() - started) / n * records
+
+        results.append({
+            "name": f"columnar[{name},n={records}]",
+            "wall_ms": round(columnar_wall * 1000, 3),
+            "per_record_ms_estimate": round(record_wall * 1000, 1),
+            "speedup": round(record_wall / columnar_wall, 1),
+            "same_results": expected == _columnar_outputs(name, module, state, keys, n),
+        })
+    return results
+
+
+class ScoringState(TypedDict):
+    text: str
+    scores: Annotated[list, operator.add]
+
+
+def _fan_out_graph(branches: int, rounds: int, execution: str):
+    graph = ExecutionStateGraph(ScoringState)
+    for i in range(branches):
+        node = partial(cpu_scoring_node, key="scores", rounds=rounds + i)
+        graph.add_node(f"score_{i}", node, execution=execution, reads=("text",))
+        graph.add_edge(START, f"score_{i}")
+        graph.add_edge(f"score_{i}", END)
+    return graph.compile()
+
+
+def bench_execution(branches: int, rounds: int, repeats: int) -> List[dict]:
+    text = " ".join(f"word{i % 500} is good, not bad!" for i in range(2_000))
+    results = []
+    expected = None
+    for execution in EXECUTIONS:
+        app = _fan_out_graph(branches, rounds, execution)
+        # warm up: starts the pools, so worker start-up is not in the timing
+        scores = sorted(app.invoke({"text": text, "scores": []})["scores"])
+        expected = expected or scores
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            app.invoke({"text": text, "scores": []})
+            times.append(time.perf_counter() - started)
+        results.append({
+            "name": f"execution[{execution},branches={branches}]",
+            "wall_ms": round(statistics.median(times) * 1000, 3),
+            "same_results": scores == expected,
+        })
+    return results
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def bench_router(calls: int, latency: float, concurrency: int) -> List[dict]:
+    """Per-call latency through the router: slow tail with / without hedging, rate limits."""
+    slow_tail = lambda call: latency * 20 if call % 10 == 0 else latency  # noqa: E731
+    rate_limited = lambda call: RateLimitError("429 Too Many Requests") if call % 3 == 0 else None  # noqa: E731
+    scenarios = [
+        ("hedge=off", dict(latency_for=slow_tail), False),
+        ("hedge=on", dict(latency_for=slow_tail), True),
+        ("rate_limit", dict(latency=latency, error_for=rate_limited), True),
+    ]
+    results = []
+    for label, primary_fakes, hedge in scenarios:
+        primary = ScriptedChatModel(responder=tweet_responder(), **primary_fakes)
+        secondary = ScriptedChatModel(responder=tweet_responder(), latency=latency)
+        # hedge_delay until the histogram has samples: 3x the normal latency
+        router = ModelRouter(
+            {"fast": [("primary", primary), ("secondary", secondary)]},
+            {"reflection": "fast"},
+            hedge=hedge,
+            hedge_delay=latency * 3,
+            cooldown=0.0,
+        )
+        llm = router.for_node("reflection")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one_call(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await llm.ainvoke([HumanMessage(f"tweet {i}")])
+                    return time.perf_counter() - started, True
+                except Exception:
+                    return time.perf_counter() - started, False
+
+        async def run_all():
+            return await asyncio.gather(*(one_call(i) for i in range(calls)))
+
+        started = time.perf_counter()
+        outcomes = asyncio.run(run_all())
+        wall = time.perf_counter() - started
+        times = [seconds for seconds, _ in outcomes]
+        results.append({
+            "name": f"router[{label}]",
+            "wall_ms": round(wall * 1000, 3),
+            "p50_ms": round(_percentile(times, 0.5) * 1000, 3),
+            "p95_ms": round(_percentile(times, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(times, 0.99) * 1000, 3),
+            "success_rate": sum(ok for _, ok in outcomes) / calls,
+            "model_calls": {"primary": primary.calls, "secondary": secondary.calls},
+        })
+    return results
+
+
+def bench_prompt_cache(iterations: int) -> List[dict]:
+    modules = load_example("4_Reflexion_system", "reflexion_graph")
+    graph, chains, tools, cache = (
+        modules["reflexion_graph"], modules["chains"], modules["execute_tools"], modules["search_cache"]
+    )
+    results = []
+    for layout in ("classic", chains.PREFIX_CACHE_LAYOUT):
+        model = ScriptedChatModel(responder=reflexion_responder(), prefix_cache=True)
+        search = FakeSearchTool()
+        graph.get_first_responder_chain = lambda: chains.actor_prompt(chains.first_instruction, layout) | model
+        graph.get_revisor_chain = lambda: chains.actor_prompt(chains.revise_instructions, layout) | model
+        tools.get_cached_tavily_tool = lambda: cache.CachedSearchTool(search, cache.SearchCache(path=None))
+        # read by reflexion_graph._chain_input (lazy history compaction)
+        chains.PROMPT_LAYOUT = layout
+        graph.build_reflexion_app.cache_clear()
+        metrics = GraphMetrics()
+        started = time.perf_counter()
+        graph.build_reflexion_app().invoke(
+            {"messages": [HumanMessage("Write about how small business can leverage AI to grow")]},
+            {"configurable": {"max_iterations": iterations}, "callbacks": [metrics]},
+        )
+        wall = time.perf_counter() - started
+        prompt = sum(call["prompt_tokens"] for call in metrics.prompt_calls)
+        cached = sum(call["cached_prompt_tokens"] for call in metrics.prompt_calls)
+        results.append({
+            "name": f"prompt_cache[{layout},iterations={iterations}]",
+            "wall_ms": round(wall * 1000, 3),
+            "llm_calls": len(metrics.prompt_calls),
+            "prompt_tokens": prompt,
+            "cached_prompt_tokens": cached,
+            "cached_share": round(cached / prompt, 3) if prompt else 0.0,
+        })
+    return results
+
+
+def _question_variants(requests_total: int, distinct: int) -> List[str]:
+    # the same few questions, typed slightly differently by different users
+    questions = [f"How can small business number {i} leverage AI to grow" for i in range(distinct)]
+    styles = [str, str.upper, lambda q: "  " + q.replace(" ", "  ") + " "]
+    return [styles[i // distinct % len(styles)](questions[i % distinct]) for i in range(requests_total)]
+
+
+def bench_coalescing(requests_total: int, distinct: int, latency: float) -> List[dict]:
+    modules = load_example("4_Reflexion_system", "reflexion_graph")
+    graph, chains, tools, cache = (
+        modules["reflexion_graph"], modules["chains"], modules["execute_tools"], modules["search_cache"]
+    )
+    questions = _question_variants(requests_total, distinct)
+    config = {"configurable": {"max_iterations": 2}}
+
+    def fresh_app():
+        model = ScriptedChatModel(responder=reflexion_responder(), latency=latency)
+        search = FakeSearchTool(latency=latency)
+        graph.get_first_responder_chain = lambda: chains.first_responder_prompt_template | model
+        graph.get_revisor_chain = lambda: chains.revisor_prompt_template | model
+        tools.get_cached_tavily_tool = lambda: cache.CachedSearchTool(search, cache.SearchCache(path=None))
+        graph.build_reflexion_app.cache_clear()
+        return graph.build_reflexion_app(), model
+
+    async def invoke_all(app) -> List[dict]:
+        return await asyncio.gather(*(app.ainvoke({"messages": [HumanMessage(q)]}, config) for q in questions))
+
+    async def stream_all(app) -> List[int]:
+        async def subscriber(question: str) -> int:
+            return sum([1 async for _ in app.astream_events({"messages": [HumanMessage(question)]}, config, version="v2")])
+        return await asyncio.gather(*(subscriber(q) for q in questions))
+
+    results = []
+    for mode in ("direct", "coalesced", "coalesced_stream"):
+        app, model = fresh_app()
+        served = CoalescingApp(app, "bench") if mode != "direct" else app
+        started = time.perf_counter()
+        outputs = asyncio.run((stream_all if mode == "coalesced_stream" else invoke_all)(served))
+        wall = time.perf_counter() - started
+        stats = served.stats() if mode != "direct" else {"runs": requests_total, "joined": 0, "reused": 0, "dedup_rate": 0.0}
+        result = {
+            "name": f"coalescing[{mode},requests={requests_total},distinct={distinct}]",
+            "wall_ms": round(wall * 1000, 3),
+            "llm_calls": model.calls,
+            "runs": stats["runs"],
+            "joined": stats["joined"],
+            "reused": stats["reused"],
+            "dedup_rate": round(stats["dedup_rate"], 3),
+        }
+        if mode == "coalesced_stream":
+            # every subscriber, early or late, sees the whole stream of its run
+            result["events_per_subscriber"] = sorted(set(outputs))
+        results.append(result)
+    return results
+
+
+def _synthetic_docs(n: int, words_per_doc: int, vocabulary: int, seed: int, prefix: str = "") -> List[dict]:
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocabulary)])
+    ids = np.minimum(rng.zipf(1.3, size=(n, words_per_doc)) - 1, vocabulary - 1)
+    return [
+        {"url": f"https://example.com/{i}", "title": "", "content": prefix + " ".join(words[row])}
+        for i, row in enumerate(ids)
+    ]
+
+
+def bench_local_search(docs: int, queries: int) -> List[dict]:
+    corpus = _synthetic_docs(docs, words_per_doc=30, vocabulary=200_000, seed=0)
+    rng = np.random.default_rng(1)
+    # words that occur in some documents but not in most of them, like real query terms
+    query_words = [f"w{i}" for i in rng.integers(10, 5_000, size=(queries, 3)).ravel()]
+    texts = [" ".join(query_words[i * 3:i * 3 + 3]) for i in range(queries)]
+    with tempfile.TemporaryDirectory() as directory:
+        index = LocalSearchIndex(directory)
+        started = time.perf_counter()
+        index.add(iter(corpus))
+        build = time.perf_counter() - started
+
+        changed = [dict(doc, content="updated " + doc["content"]) for doc in corpus[: max(docs // 100, 1)]]
+        started = time.perf_counter()
+        report = index.add(iter(changed))
+        incremental = time.perf_counter() - started
+
+        reader = LocalSearchIndex(directory)
+        reader.search(texts[0])
+        latencies = []
+        for text in texts:
+            started = time.perf_counter()
+            reader.search(text, k=5)
+            latencies.append(time.perf_counter() - started)
+        stats = reader.stats()
+    return [{
+        "name": f"local_search[docs={docs}]",
+        "build_s": round(build, 2),
+        "incremental_add_s": round(incremental, 2),
+        "incremental_replaced": report["replaced"],
+        "segments": stats["segments"],
+        "index_mb": round(stats["bytes"] / 2**20, 1),
+        "wall_ms": round(statistics.median(latencies) * 1000, 3),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+    }]
+
+
+def bench_http_pool(requests_total: int, concurrency: int, latency: float, connect_latency: float) -> List[dict]:
+    """Connections opened and wall time for the same requests, unpooled vs pooled, sync and async.
+
+    connect_latency is the stub's stand-in for a TCP + TLS handshake (free on localhost).
+    """
+    import aiohttp
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    payload = {"query": "ai for small business", "max_results": 5}
+
+    def unpooled_sync(url):
+        response = requests.post(url, json=payload)
+        response.raise_for_status()
+
+    # the calls the pooled tavily wrappers make
+    def pooled_sync(url):
+        post_json(url, payload)
+
+    async def unpooled_async(url):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload) as response:
+                await response.text()
+
+    async def pooled_async(url):
+        await apost_json(url, payload)
+
+    def run_sync(call, url):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: call(url), range(requests_total)))
+
+    def run_async(call, url):
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with semaphore:
+                    await call(url)
+
+            await asyncio.gather(*(one() for _ in range(requests_total)))
+        asyncio.run(run_all())
+
+    scenarios = [
+        ("sync,unpooled", run_sync, unpooled_sync),
+        ("sync,pooled", run_sync, pooled_sync),
+        ("async,unpooled", run_async, unpooled_async),
+        ("async,pooled", run_async, pooled_async),
+    ]
+    results = []
+    for label, run, call in scenarios:
+        server, base_url = start_stub_server(latency=latency, connect_latency=connect_latency)
+        started = time.perf_counter()
+        run(call, f"{base_url}/search")
+        wall = time.perf_counter() - started
+        server.shutdown()
+        server.server_close()
+        results.append({
+            "name": f"http_pool[{label},n={requests_total}]",
+            "wall_ms": round(wall * 1000, 3),
+            "connections": server.connections,
+            "requests": server.requests,
+        })
+    results[-1]["pool_stats"] = http_pool_stats()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old: dict, new: dict) -> None:
+    old_results = {r["name"]: r for r in old["results"]}
+    print(f"\n{'benchmark':40} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for result in new["results"]:
+        before = old_results.get(result["name"])
+        if before is None or not before["wall_ms"]:
+            continue
+        change = (result["wall_ms"] - before["wall_ms"]) / before["wall_ms"] * 100
+        print(f"{result['name']:40} {before['wall_ms']:10.3f} {result['wall_ms']:10.3f} {change:+7.1f}%")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the example graphs")
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", help="earlier output file to compare against")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="injected seconds per fake llm / search call")
+    parser.add_argument("--iterations", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--essays", type=int, default=200, help="essays in the essay_batch run")
+    parser.add_argument("--essay-concurrency", type=int, default=16)
+    parser.add_argument("--merge-sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--append-steps", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--append-graph-steps", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--concat-max", type=int, default=100_000, help="largest n run with operator.concat")
+    parser.add_argument("--columnar-records", type=int, default=1_000_000)
+    parser.add_argument("--columnar-sample", type=int, default=2_000, help="records run one by one for the baseline")
+    parser.add_argument("--branches", type=int, default=4, help="parallel CPU-bound nodes in the execution benchmark")
+    parser.add_argument("--branch-rounds", type=int, default=20, help="work per node in the execution benchmark")
+    parser.add_argument("--router-calls", type=int, default=200)
+    parser.add_argument("--router-latency", type=float, default=0.05, help="normal fake model latency in the router benchmark")
+    parser.add_argument("--coalesce-requests", type=int, default=64, help="concurrent requests in the coalescing benchmark")
+    parser.add_argument("--coalesce-distinct", type=int, default=4, help="distinct questions among them")
+    parser.add_argument("--search-docs", type=int, default=1_000_000, help="documents in the local search benchmark")
+    parser.add_argument("--search-queries", type=int, default=200)
+    parser.add_argument("--http-requests", type=int, default=500, help="requests per scenario in the http pool benchmark")
+    parser.add_argument("--http-concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    runs = (
+        state_dive_runs()
+        + reflection_runs(args.latency)
+        + reflexion_runs(args.latency, args.iterations)
+        + react_runs(args.latency)
+    )
+    results = []
+    for name, make_run in runs:
+        result = bench_graph(name, make_run, args.repeats)
+        print(f"{name:40} {result['wall_ms']:10.3f} ms  {result['steps']:3} steps  {result['peak_kb']:10.1f} KiB")
+        results.append(result)
+    essays = bench_essays(args.latency, args.essays, args.essay_concurrency)
+    print(f"{essays['name']:40} {essays['wall_ms']:10.3f} ms  {essays['essays_per_min']:10.1f} essays/min")
+    results.append(essays)
+    results += bench_merge(args.merge_sizes, args.repeats)
+    for result in bench_append(args.append_steps, args.append_graph_steps, args.concat_max):
+        print(f"{result['name']:40} {result['wall_ms']:10.3f} ms  {result['us_per_append']:8.3f} us/append")
+        results.append(result)
+    for result in bench_columnar(args.columnar_records, args.columnar_sample):
+        print(
+            f"{result['name']:40} {result['wall_ms']:10.3f} ms  per record ~{result['per_record_ms_estimate']:.0f} ms"
+            f"  x{result['speedup']}  same results: {result['same_results']}"
+        )
+        results.append(result)
+    for result in bench_execution(args.branches, args.branch_rounds, args.repeats):
+        print(f"{result['name']:40} {result['wall_ms']:10.3f} ms  same results: {result['same_results']}")
+        results.append(result)
+    for result in bench_router(args.router_calls, args.router_latency, concurrency=16):
+        print(
+            f"{result['name']:40} {result['wall_ms']:10.3f} ms  p50 {result['p50_ms']:.0f} / p95 {result['p95_ms']:.0f}"
+            f" / p99 {result['p99_ms']:.0f} ms  success {result['success_rate']:.0%}  calls {result['model_calls']}"
+        )
+        results.append(result)
+    for result in bench_prompt_cache(max(args.iterations)):
+        print(
+            f"{result['name']:40} {result['prompt_tokens']:8} prompt tokens  {result['cached_prompt_tokens']:8} cached"
+            f"  ({result['cached_share']:.0%})"
+        )
+        results.append(result)
+    for result in bench_coalescing(args.coalesce_requests, args.coalesce_distinct, latency=max(args.latency, 0.02)):
+        print(
+            f"{result['name']:40} {result['wall_ms']:10.3f} ms  {result['llm_calls']:5} llm calls  {result['runs']:4} runs"
+            f"  dedup {result['dedup_rate']:.0%}"
+        )
+        results.append(result)
+    for result in bench_local_search(args.search_docs, args.search_queries):
+        print(
+            f"{result['name']:40} build {result['build_s']:.1f} s  +1% {result['incremental_add_s']:.1f} s"
+            f"  query p50 {result['p50_ms']:.2f} / p95 {result['p95_ms']:.2f} ms  {result['index_mb']} MiB"
+        )
+        results.append(result)
+    for result in bench_http_pool(args.http_requests, args.http_concurrency, latency=0.005, connect_latency=0.03):
+        print(f"{result['name']:40} {result['wall_ms']:10.3f} ms  {result['connections']:5} connections for {result['requests']} requests")
+        results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "latency": args.latency,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwritten to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
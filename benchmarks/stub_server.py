@@ -0,0 +1,103 @@
+"""
+Local stub of the OpenAI chat completions and Tavily search endpoints
+
+    server, base_url = start_stub_server(latency=0.02, connect_latency=0.03)
+    os.environ["OPENAI_BASE_URL"] = base_url       # ChatOpenAI -> POST {base_url}/chat/completions
+    os.environ["TAVILY_API_URL"] = base_url        # tavily     -> POST {base_url}/search
+    ...
+    print(server.connections, server.requests)
+    server.shutdown()
+
+HTTP/1.1 with keep-alive, so a client that pools its connections opens a few
+connections for many requests - server.connections counts the TCP connections
+accepted, which is what the http pool benchmark compares. On localhost a new
+connection costs almost nothing; connect_latency is slept once per connection,
+before its first response, to stand in for the TCP + TLS handshake to a real api.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # many clients connect at once in the benchmarks (default backlog is 5)
+    request_queue_size = 256
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes: without TCP_NODELAY a kept-alive
+    # connection waits for the delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.path.endswith("/chat/completions"):
+            payload = _chat_completion(body)
+        elif self.path.endswith("/search"):
+            payload = _search(body)
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _chat_completion(body: dict) -> dict:
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"stub answer to {len(body.get('messages', []))} messages"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def _search(body: dict) -> dict:
+    query = body.get("query", "")
+    return {
+        "query": query,
+        "results": [
+            {"title": f"{query} {i}", "url": f"https://example.com/{i}", "content": f"about {query}", "score": 0.9}
+            for i in range(body.get("max_results") or 5)
+        ],
+        "response_time": 0.01,
+    }
+
+
+def start_stub_server(latency: float = 0.0, connect_latency: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.latency = latency
+    server.connect_latency = connect_latency
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
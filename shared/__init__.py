@@ -0,0 +1,6 @@
+"""
+Helpers shared by the example folders (3_chains, 4_Reflexion_system, ...)
+
+The example scripts are run from their own folder (python basic.py), so they put
+the repository root on sys.path before importing from here.
+"""
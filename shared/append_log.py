@@ -0,0 +1,163 @@
+"""
+Append-only history field for graph state
+
+    class SimpleState(TypedDict):
+        history: Annotated[Sequence[int], AppendChannel("q")]   # was: Annotated[List[int], operator.concat]
+
+With operator.concat (or operator.add) every step builds a new list and copies the
+whole history into it: step n copies n items, a loop of N steps copies ~N²/2 items.
+
+AppendChannel keeps one growing buffer and hands out AppendLog snapshots:
+
+    buffer  [1, 2, 3, 4, 5, 6]          one list / array, only ever appended to
+    step 3  AppendLog(len=3)  -> [1, 2, 3]
+    step 6  AppendLog(len=6)  -> [1, 2, 3, 4, 5, 6]
+
+- append is amortized O(1) (list.extend / array.extend), a snapshot is O(1) (buffer + length)
+- older snapshots never change: they only look at their first `len` items
+- appending to an old snapshot (a forked run) copies first, so branches never mix
+- typecode ("q" ints, "d" floats) stores numbers in an array.array: 8 bytes per item
+  instead of a pointer + int object
+- a node reads the history like a list (len, index, slice, iterate, ==) and returns
+  new items as before: {"history": [new_count]}
+- checkpoint() hands the saver a plain list (array.tolist runs in C), a checkpointed
+  run restores into a fresh buffer
+"""
+
+import threading
+from array import array
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+from langgraph.channels.base import BaseChannel
+from langgraph.types import Overwrite
+
+
+class AppendLog(Sequence):
+    """Read-only snapshot of the first `len` items of a shared append-only buffer."""
+
+    __slots__ = ("_buffer", "_length", "_lock")
+
+    def __init__(self, items: Iterable[Any] = (), typecode: Optional[str] = None):
+        self._buffer = array(typecode, items) if typecode else list(items)
+        self._length = len(self._buffer)
+        # one lock per buffer, shared by all its snapshots
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _snapshot(cls, buffer, length: int, lock: threading.Lock) -> "AppendLog":
+        log = cls.__new__(cls)
+        log._buffer, log._length, log._lock = buffer, length, lock
+        return log
+
+    @property
+    def typecode(self) -> Optional[str]:
+        return self._buffer.typecode if isinstance(self._buffer, array) else None
+
+    def extend(self, items: Iterable[Any]) -> "AppendLog":
+        """A new snapshot with `items` appended; this one is left unchanged."""
+        items = items if isinstance(items, (list, tuple, array)) else list(items)
+        with self._lock:
+            if self._length == len(self._buffer):
+                self._buffer.extend(items)
+                return self._snapshot(self._buffer, len(self._buffer), self._lock)
+        # the buffer already grew past this snapshot (forked run): copy on write
+        log = AppendLog(islice(self._buffer, self._length), self.typecode)
+        return log.extend(items)
+
+    def __add__(self, other: Iterable[Any]) -> "AppendLog":
+        return self.extend(other)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._buffer[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("AppendLog index out of range")
+        return self._buffer[index]
+
+    def __iter__(self) -> Iterator[Any]:
+        return islice(self._buffer, self._length)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(other) == self._length and self.tolist() == list(other)
+
+    def tolist(self) -> list:
+        if isinstance(self._buffer, array):
+            return self._buffer[: self._length].tolist()
+        return self._buffer[: self._length]
+
+    def __repr__(self) -> str:
+        return f"AppendLog({self.tolist()!r})"
+
+    def __reduce__(self):
+        # pickles as its items only (used when state crosses a process boundary)
+        return (AppendLog, (self.tolist(), self.typecode))
+
+
+class AppendChannel(BaseChannel):
+    """State channel that appends every update to an AppendLog.
+
+    An update can be a list of items or a single item; Overwrite(value) replaces
+    the whole history, like with the built-in reducers.
+    """
+
+    __slots__ = ("value", "typecode")
+
+    def __init__(self, typecode: Optional[str] = None):
+        super().__init__(AppendLog)
+        self.typecode = typecode
+        self.value = AppendLog(typecode=typecode)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, AppendChannel) and other.typecode == self.typecode
+
+    @property
+    def ValueType(self) -> Any:
+        return AppendLog
+
+    @property
+    def UpdateType(self) -> Any:
+        return Any
+
+    def copy(self) -> "AppendChannel":
+        # snapshots are immutable, sharing one is safe
+        channel = self.__class__(self.typecode)
+        channel.key = self.key
+        channel.value = self.value
+        return channel
+
+    def from_checkpoint(self, checkpoint: Any) -> "AppendChannel":
+        channel = self.__class__(self.typecode)
+        channel.key = self.key
+        if isinstance(checkpoint, (list, tuple, AppendLog)):
+            channel.value = AppendLog(checkpoint, self.typecode)
+        return channel
+
+    def update(self, values: Sequence[Any]) -> bool:
+        if not values:
+            return False
+        for value in values:
+            if isinstance(value, Overwrite):
+                self.value = AppendLog(value.value, self.typecode)
+            elif isinstance(value, (list, tuple, AppendLog, array)):
+                self.value = self.value.extend(value)
+            else:
+                self.value = self.value.extend((value,))
+        return True
+
+    def get(self) -> AppendLog:
+        return self.value
+
+    def is_available(self) -> bool:
+        return True
+
+    def checkpoint(self) -> list:
+        return self.value.tolist()
@@ -0,0 +1,143 @@
+"""
+Building blocks for running a graph over a large JSONL file
+
+Used by 4_Reflexion_system/batch_runner.py and the essay batch evaluator:
+
+    records = read_jsonl("in.jsonl")                  # streamed, never loaded as a whole
+    done = completed_ids("out.jsonl", "answer")       # resume: skip what already succeeded
+    async for result in run_pool(records, handle, concurrency=8):
+        ...                                           # results in completion order
+
+- run_pool keeps `concurrency` handlers in flight; a bounded queue means the reader
+  never runs more than a few records ahead of the workers
+- a handler that raises yields {"id", "error", "latency_s"} for its record, the
+  same shape the batch runners' own error results have
+- append_result writes + flushes one line, so a crash loses at most the runs in flight
+- BatchStats: done / failed / skipped, throughput per minute, p50 / p95 latency
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional, Set, TextIO
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    # "-" reads from stdin, so records can be piped in from another process
+    f = open(0, encoding="utf-8", closefd=False) if path == "-" else open(path, encoding="utf-8")
+    with f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            # the line number is the id when the file has none
+            record.setdefault("id", str(line_number))
+            yield record
+
+
+def completed_ids(path: str, result_key: str) -> Set[str]:
+    """Ids of records in an output file that have `result_key` (i.e. did not fail)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # half written last line from a crash - that record just runs again
+                continue
+            if result_key in record:
+                done.add(str(record["id"]))
+    return done
+
+
+def append_result(out: TextIO, result: dict) -> None:
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class BatchStats:
+    def __init__(self, unit: str = "questions"):
+        self.unit = unit
+        self.started_at = time.perf_counter()
+        self.latencies = []
+        self.failed = 0
+        self.skipped = 0
+
+    def add(self, latency: float, ok: bool) -> None:
+        self.latencies.append(latency)
+        if not ok:
+            self.failed += 1
+
+    @property
+    def per_minute(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return len(self.latencies) / elapsed * 60 if elapsed else 0.0
+
+    def summary(self) -> str:
+        latencies = sorted(self.latencies)
+        return (
+            f"done={len(self.latencies)} failed={self.failed} skipped={self.skipped} "
+            f"throughput={self.per_minute:.1f} {self.unit}/min "
+            f"p50={percentile(latencies, 0.50):.2f}s p95={percentile(latencies, 0.95):.2f}s"
+        )
+
+
+async def run_pool(
+    records: Iterable[dict],
+    handle: Callable[[dict], Awaitable[dict]],
+    concurrency: int = 8,
+    skip: Optional[Callable[[dict], bool]] = None,
+) -> AsyncIterator[dict]:
+    """Run `handle` over `records` with at most `concurrency` in flight, yield results as they finish."""
+    # bounded queues: the reader never gets more than a few records ahead of the workers
+    queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=concurrency * 2)
+    results: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=concurrency * 2)
+    finished = object()
+
+    async def worker():
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            started = time.perf_counter()
+            try:
+                result = await handle(record)
+            except Exception as e:
+                # handlers return their own error results; one that raises anyway must not
+                # take its worker down (with all workers gone the reader waits forever)
+                result = {"id": record.get("id"), "error": f"{type(e).__name__}: {e}",
+                          "latency_s": round(time.perf_counter() - started, 3)}
+            await results.put(result)
+
+    async def feed():
+        try:
+            for record in records:
+                if skip is not None and skip(record):
+                    continue
+                await queue.put(record)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            await results.put(finished)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    feeder = asyncio.create_task(feed())
+    try:
+        while (result := await results.get()) is not finished:
+            yield result
+        await feeder
+    finally:
+        for task in (*workers, feeder):
+            task.cancel()
@@ -0,0 +1,430 @@
+"""
+Durable checkpoints for long graph runs, stored in a local SQLite file
+
+    saver = DeltaSqliteSaver(".cache/checkpoints.sqlite")
+    app = build_reflexion_app(checkpointer=saver)
+    config = {"configurable": {"thread_id": "question-42"}}
+    result = invoke_resumable(app, inputs, config)   # after a crash: same call resumes
+
+LangGraph saves a checkpoint after every step. A channel is only written when its
+version changed in that step, and for list channels that only grow (the message
+history) we store just the appended items:
+
+    messages v1  full     [question]
+    messages v2  delta    base=v1  + [draft]
+    messages v3  delta    base=v2  + [search results]
+    ...
+    messages v20 full     (every SNAPSHOT_EVERY deltas, keeps reads short)
+
+So a checkpoint write costs the size of what the step added, not the size of the
+whole history. Reading walks back to the last full snapshot and appends.
+
+The previous value of each list is remembered in memory to detect "only appended",
+for the MAX_CACHED_THREADS most recently written threads (a server runs one thread
+per conversation, so keeping all of them would grow forever). A thread that is not
+in memory - evicted, or written by an earlier process - reads the value at its
+parent checkpoint back from SQLite once, so it keeps writing deltas after a restart.
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+SNAPSHOT_EVERY = 20
+MAX_CACHED_THREADS = int(os.getenv("CHECKPOINT_CACHED_THREADS", "64"))
+
+# channel without a value at that version (None is a real value for trigger channels)
+_EMPTY = object()
+
+
+def _is_append(old: Any, new: Any) -> bool:
+    if not isinstance(old, list) or not isinstance(new, list) or len(new) < len(old):
+        return False
+    # list == compares identical elements by `is` first (in C), no deep compare
+    return new[: len(old)] == old
+
+
+class DeltaSqliteSaver(BaseCheckpointSaver[str]):
+    def __init__(
+        self,
+        path: str = DEFAULT_CHECKPOINT_PATH,
+        snapshot_every: int = SNAPSHOT_EVERY,
+        serde: Any = None,
+        max_cached_threads: int = MAX_CACHED_THREADS,
+    ):
+        super().__init__(serde=serde)
+        self.snapshot_every = snapshot_every
+        self.max_cached_threads = max_cached_threads
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        # (thread_id, checkpoint_ns) -> {channel: (version, value, delta depth) of the last write},
+        # least recently written thread first
+        self._last: OrderedDict[Tuple[str, str], Dict[str, Tuple[str, Any, int]]] = OrderedDict()
+        with self.lock:
+            self.conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    parent_checkpoint_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                );
+                CREATE TABLE IF NOT EXISTS blobs (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    channel TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    kind TEXT NOT NULL,          -- 'full', 'delta' or 'empty'
+                    base_version TEXT,           -- for 'delta': the version the items are appended to
+                    type TEXT,
+                    blob BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+                );
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    task_path TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                );
+                """
+            )
+            self.conn.commit()
+
+    # --- channel values ----------------------------------------------------
+
+    def _thread_last(self, thread_id: str, ns: str) -> Dict[str, Tuple[str, Any, int]]:
+        key = (thread_id, ns)
+        last = self._last.get(key)
+        if last is None:
+            last = self._last[key] = {}
+            while len(self._last) > self.max_cached_threads:
+                self._last.popitem(last=False)
+        else:
+            self._last.move_to_end(key)
+        return last
+
+    def _previous(self, thread_id: str, ns: str, channel: str, parent_id: Optional[str], last: dict) -> Optional[tuple]:
+        if channel in last:
+            return last[channel]
+        if not parent_id:
+            return None
+        # not in memory: the value at the parent checkpoint is the one this step appended to
+        row = self.conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, ns, parent_id),
+        ).fetchone()
+        version = self.serde.loads_typed(row)["channel_versions"].get(channel) if row else None
+        if version is None:
+            return None
+        value, depth = self._read_channel(thread_id, ns, channel, version)
+        if not isinstance(value, list):
+            return None
+        last[channel] = (version, value, depth)
+        return last[channel]
+
+    def _dump_channel(
+        self, thread_id: str, ns: str, channel: str, version: str, values: dict, parent_id: Optional[str]
+    ) -> tuple:
+        last = self._thread_last(thread_id, ns)
+        if channel not in values:
+            last.pop(channel, None)
+            return (thread_id, ns, channel, version, "empty", None, None, None)
+
+        value = values[channel]
+        previous = self._previous(thread_id, ns, channel, parent_id, last) if isinstance(value, list) else None
+        if previous is not None and previous[2] < self.snapshot_every and _is_append(previous[1], value):
+            base_version, base_value, depth = previous
+            type_, blob = self.serde.dumps_typed(value[len(base_value):])
+            row = (thread_id, ns, channel, version, "delta", base_version, type_, blob)
+            depth += 1
+        else:
+            type_, blob = self.serde.dumps_typed(value)
+            row = (thread_id, ns, channel, version, "full", None, type_, blob)
+            depth = 0
+        # keep a copy of the list: the channel may mutate it in place later
+        last[channel] = (version, list(value) if isinstance(value, list) else value, depth)
+        return row
+
+    def _read_channel(self, thread_id: str, ns: str, channel: str, version: str) -> Tuple[Any, int]:
+        # -> (value, number of deltas on top of the full snapshot)
+        appended: List[list] = []
+        while True:
+            row = self.conn.execute(
+                "SELECT kind, base_version, type, blob FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, version),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                return _EMPTY, 0
+            kind, base_version, type_, blob = row
+            value = self.serde.loads_typed((type_, blob))
+            if kind == "full":
+                break
+            appended.append(value)
+            version = base_version
+        for items in reversed(appended):
+            value = value + items
+        return value, len(appended)
+
+    def _load_channel(self, thread_id: str, ns: str, channel: str, version: str) -> Any:
+        return self._read_channel(thread_id, ns, channel, version)[0]
+
+    def _load_values(self, thread_id: str, ns: str, versions: ChannelVersions) -> dict:
+        values = {}
+        for channel, version in versions.items():
+            value = self._load_channel(thread_id, ns, channel, version)
+            if value is not _EMPTY:
+                values[channel] = value
+        return values
+
+    # --- reading -----------------------------------------------------------
+
+    def _tuple(self, thread_id: str, ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_values(thread_id, ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                # checkpoint ids are time ordered, the largest one is the latest
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            return self._tuple(thread_id, ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+            results = []
+            for thread_id, ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(self._tuple(thread_id, ns, tuple(row)))
+        yield from results
+
+    # --- writing -----------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        type_, blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self.lock:
+            # only channels whose version changed in this step are written at all
+            parent_id = config["configurable"].get("checkpoint_id")
+            blob_rows = [
+                self._dump_channel(thread_id, ns, channel, version, values, parent_id)
+                for channel, version in new_versions.items()
+            ]
+            self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", blob_rows)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], parent_id, type_, blob, metadata_type, metadata_blob),
+            )
+            self.conn.commit()
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path))
+        with self.lock:
+            self.conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            for table in ("checkpoints", "blobs", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+            for key in [key for key in self._last if key[0] == thread_id]:
+                del self._last[key]
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # same format as the built-in savers: zero padded counter + random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- async: sqlite calls are short, run them off the event loop ----------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+"""
+Resuming
+
+A thread that was interrupted has a checkpoint whose `next` is not empty - calling
+the graph with input None continues from there. A finished thread just returns
+its final state, a new thread starts from `inputs`.
+"""
+
+
+def invoke_resumable(app: Any, inputs: Any, config: RunnableConfig) -> Any:
+    state = app.get_state(config)
+    if state.next:
+        return app.invoke(None, config)
+    if state.values:
+        return state.values
+    return app.invoke(inputs, config)
+
+
+async def ainvoke_resumable(app: Any, inputs: Any, config: RunnableConfig) -> Any:
+    state = await app.aget_state(config)
+    if state.next:
+        return await app.ainvoke(None, config)
+    if state.values:
+        return state.values
+    return await app.ainvoke(inputs, config)
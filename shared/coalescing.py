@@ -0,0 +1,339 @@
+"""
+Request coalescing in front of a compiled graph (3_chains/basic.py, reflexion_graph.py)
+
+Under load the same question comes in several times within seconds, and every copy
+would run the whole multi-call loop. CoalescingApp sits in front of the compiled app
+and gives identical requests one run:
+
+    request ──► fingerprint (normalized input + config)
+                   │
+                   ├── finished within the result window ──► stored output (reused)
+                   ├── same fingerprint running now       ──► wait for it (joined)
+                   └── otherwise                           ──► run the graph (run)
+
+    app = coalesce(build_reflexion_app(), "reflexion")
+    app.invoke(...) / await app.ainvoke(...)
+    async for event in app.astream_events(..., version="v2"): ...   # stream_reflexion(app=app)
+
+- the fingerprint is sha256 of the input with every text lower cased and whitespace
+  collapsed ("AI Agents  taking over" == "ai agents taking over") and of the run
+  config that changes the result: configurable (max_iterations, ...) and
+  recursion_limit. Callbacks, tags and metadata are not part of it
+- runs with a thread_id are passed through: their result depends on the checkpoint
+  of that thread, not only on the input
+- astream_events: the run is read by a background task that records every event;
+  each subscriber replays the recorded events from the start and then follows the
+  live ones, so a request joining late still gets the whole stream. A subscriber
+  that stops reading does not stop the run for the others
+- ainvoke runs the graph through the same recording task, so ainvoke and
+  astream_events callers join each other's runs in both directions
+- a stream cannot join a sync invoke (there are no events to replay), a run on another
+  event loop or a stream with other astream_events arguments; streams like that share
+  a run of their own under a second key (fingerprint + arguments + loop)
+- a failed run raises the same error in every waiter and is not stored
+- the output is the same object for every waiter - treat it as read only
+- only the run that did the work reports to its callbacks (GraphMetrics, ...)
+
+Result window from the environment:
+
+    COALESCE_RESULT_WINDOW=30   seconds a finished output is reused (0: only in-flight runs)
+    COALESCE_MAX_RESULTS=256    finished outputs kept
+
+Per app: requests, runs, joined, reused, failed and the dedup rate - coalescing_report().
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+DEFAULT_RESULT_WINDOW_SECONDS = float(os.getenv("COALESCE_RESULT_WINDOW", "30"))
+DEFAULT_MAX_RESULTS = int(os.getenv("COALESCE_MAX_RESULTS", "256"))
+
+# what ainvoke records its run with, a plain astream_events(..., version="v2") matches it
+_DEFAULT_STREAM_KWARGS = {"version": "v2"}
+
+# configurable keys that identify a run rather than change its result
+_RUN_KEYS = {"thread_id", "checkpoint_id", "checkpoint_ns", "run_id", "__pregel_runtime"}
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, BaseMessage):
+        return [value.type, _normalize(value.content)]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def run_fingerprint(graph_input: Any, config: Optional[dict] = None) -> Optional[str]:
+    """Key of a run, None when the run must not be shared (it has a thread_id)."""
+    config = config or {}
+    configurable = config.get("configurable") or {}
+    if configurable.get("thread_id") is not None:
+        return None
+    payload = {
+        "input": _normalize(graph_input),
+        "configurable": {k: v for k, v in sorted(configurable.items()) if k not in _RUN_KEYS},
+        "recursion_limit": config.get("recursion_limit"),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _is_graph_end(event: dict) -> bool:
+    return event.get("event") == "on_chain_end" and not event.get("parent_ids")
+
+
+class _Run:
+    """One graph run and everything waiting for it."""
+
+    def __init__(self, key: str, stream_kwargs: Optional[dict] = None):
+        self.key = key
+        self.future: Future = Future()
+        # astream_events runs: the recorded events, the loop they are produced on and an
+        # asyncio.Event that is set (and replaced) every time one is added
+        self.stream_kwargs = stream_kwargs
+        self.events: Optional[List[dict]] = [] if stream_kwargs is not None else None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.changed: Optional[asyncio.Event] = None
+        self.done = False
+
+    def add_event(self, event: dict) -> None:
+        self.events.append(event)
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def close(self) -> None:
+        self.done = True
+        if self.changed is not None:
+            self.changed.set()
+
+    async def replay(self) -> AsyncIterator[dict]:
+        index = 0
+        while True:
+            changed = self.changed
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                break
+            await changed.wait()
+        # the run failed: the events so far were delivered, now the error
+        error = self.future.exception() if self.future.done() else None
+        if error is not None:
+            raise error
+
+
+class CoalescingApp:
+    """Compiled graph with identical in-flight requests merged and finished outputs reused."""
+
+    def __init__(
+        self,
+        app: Any,
+        name: str,
+        result_window_seconds: float = DEFAULT_RESULT_WINDOW_SECONDS,
+        max_results: int = DEFAULT_MAX_RESULTS,
+        fingerprint: Callable[..., Optional[str]] = run_fingerprint,
+    ):
+        self.app = app
+        self.name = name
+        self.result_window_seconds = result_window_seconds
+        self.max_results = max_results
+        self.fingerprint = fingerprint
+        # key -> (finished_at, output, recorded events or None, stream kwargs)
+        self._results: "OrderedDict[str, Tuple[float, Any, Optional[List[dict]], Optional[dict]]]" = OrderedDict()
+        # key -> run in flight
+        self._running: Dict[str, _Run] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.runs = 0
+        self.joined = 0
+        self.reused = 0
+        self.failed = 0
+
+    # -- bookkeeping ---------------------------------------------------------
+
+    def _lookup(
+        self, key: Optional[str], stream_kwargs: Optional[dict] = None, record_kwargs: Optional[dict] = None
+    ) -> Tuple[Optional[tuple], Optional[_Run], bool]:
+        """(stored result, run to follow, caller owns the run).
+
+        stream_kwargs: the caller needs the events of the run (astream_events)
+        record_kwargs: a new run records its events with these (ainvoke)
+        """
+        with self._lock:
+            self.requests += 1
+            if key is None:
+                self.runs += 1
+                return None, None, True
+            keys = [key] if stream_kwargs is None else [key, self._stream_key(key, stream_kwargs)]
+            free = None
+            for candidate in keys:
+                entry = self._results.get(candidate)
+                if entry is not None and time.time() - entry[0] <= self.result_window_seconds:
+                    if stream_kwargs is None or (entry[2] is not None and entry[3] == stream_kwargs):
+                        self._results.move_to_end(candidate)
+                        self.reused += 1
+                        return entry, None, False
+                elif entry is not None:
+                    del self._results[candidate]
+                running = self._running.get(candidate)
+                if running is None:
+                    free = free or candidate
+                elif stream_kwargs is None or self._can_stream(running, stream_kwargs):
+                    self.joined += 1
+                    return None, running, False
+            self.runs += 1
+            run = _Run(free or keys[-1], stream_kwargs if stream_kwargs is not None else record_kwargs)
+            if free is not None:
+                self._running[free] = run
+            return None, run, True
+
+    @staticmethod
+    def _stream_key(key: str, stream_kwargs: dict) -> str:
+        try:
+            loop = id(asyncio.get_running_loop())
+        except RuntimeError:
+            loop = None
+        return f"{key}:{json.dumps(stream_kwargs, sort_keys=True, default=str)}:{loop}"
+
+    @staticmethod
+    def _can_stream(run: _Run, stream_kwargs: dict) -> bool:
+        if run.events is None or run.stream_kwargs != stream_kwargs:
+            return False
+        try:
+            return run.loop is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    def _finish(self, run: _Run, output: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._running.get(run.key) is run:
+                del self._running[run.key]
+            if error is not None:
+                self.failed += 1
+            elif run.key is not None and self.result_window_seconds > 0:
+                self._results[run.key] = (time.time(), output, run.events, run.stream_kwargs)
+                self._results.move_to_end(run.key)
+                while len(self._results) > self.max_results:
+                    self._results.popitem(last=False)
+        if error is not None:
+            run.future.set_exception(error)
+        else:
+            run.future.set_result(output)
+        run.close()
+
+    # -- runnable interface --------------------------------------------------
+
+    def invoke(self, graph_input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        stored, run, owner = self._lookup(self.fingerprint(graph_input, config))
+        if stored is not None:
+            return stored[1]
+        if not owner:
+            return run.future.result()
+        if run is None:
+            return self.app.invoke(graph_input, config, **kwargs)
+        try:
+            output = self.app.invoke(graph_input, config, **kwargs)
+        except BaseException as error:
+            self._finish(run, error=error)
+            raise
+        self._finish(run, output)
+        return output
+
+    async def ainvoke(self, graph_input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        record_kwargs = {**_DEFAULT_STREAM_KWARGS, **kwargs}
+        stored, run, owner = self._lookup(self.fingerprint(graph_input, config), record_kwargs=record_kwargs)
+        if stored is not None:
+            return stored[1]
+        if run is None:
+            return await self.app.ainvoke(graph_input, config, **kwargs)
+        if owner:
+            self._start_recording(run, graph_input, config, record_kwargs)
+        return await asyncio.wrap_future(run.future)
+
+    def _start_recording(self, run: _Run, graph_input: Any, config: Optional[dict], kwargs: dict) -> None:
+        # a task of its own: a caller that is cancelled does not cancel the run of the others
+        run.loop = asyncio.get_running_loop()
+        run.changed = asyncio.Event()
+        run.loop.create_task(self._record_events(run, graph_input, config, kwargs))
+
+    async def _record_events(self, run: _Run, graph_input: Any, config: Optional[dict], kwargs: dict) -> None:
+        output = None
+        try:
+            async for event in self.app.astream_events(graph_input, config, **kwargs):
+                if _is_graph_end(event):
+                    output = event["data"].get("output")
+                run.add_event(event)
+        except BaseException as error:
+            self._finish(run, error=error)
+        else:
+            self._finish(run, output)
+
+    async def astream_events(self, graph_input: Any, config: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[dict]:
+        kwargs.setdefault("version", "v2")
+        stored, run, owner = self._lookup(self.fingerprint(graph_input, config), stream_kwargs=kwargs)
+        if stored is not None:
+            for event in stored[2]:
+                yield event
+            return
+        if run is None:
+            async for event in self.app.astream_events(graph_input, config, **kwargs):
+                yield event
+            return
+        if owner:
+            self._start_recording(run, graph_input, config, kwargs)
+        async for event in run.replay():
+            yield event
+
+    def stats(self) -> dict:
+        with self._lock:
+            deduplicated = self.joined + self.reused
+            return {
+                "requests": self.requests,
+                "runs": self.runs,
+                "joined": self.joined,
+                "reused": self.reused,
+                "failed": self.failed,
+                "dedup_rate": deduplicated / self.requests if self.requests else 0.0,
+                "in_flight": len(self._running),
+                "stored": len(self._results),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+
+_apps: Dict[str, CoalescingApp] = {}
+_apps_lock = threading.Lock()
+
+
+def coalesce(app: Any, name: str, **kwargs: Any) -> CoalescingApp:
+    """The CoalescingApp for `name`, created on first use (a new one if `app` changed)."""
+    with _apps_lock:
+        current = _apps.get(name)
+        if current is None or current.app is not app:
+            current = _apps[name] = CoalescingApp(app, name, **kwargs)
+        return current
+
+
+def coalescing_report() -> str:
+    header = f"{'app':20} {'requests':>9} {'runs':>6} {'joined':>7} {'reused':>7} {'failed':>7} {'dedup':>7}"
+    lines = [header, "-" * len(header)]
+    for name, app in sorted(_apps.items()):
+        s = app.stats()
+        lines.append(
+            f"{name:20} {s['requests']:9} {s['runs']:6} {s['joined']:7} {s['reused']:7} {s['failed']:7} {s['dedup_rate']:7.1%}"
+        )
+    return "\n".join(lines)
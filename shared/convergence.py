@@ -0,0 +1,104 @@
+"""
+Early stopping for the generate / critique / revise loops
+
+Both loops used to run a fixed number of rounds. Often the answer stops changing
+after one or two revisions and the remaining rounds only cost llm calls.
+
+After every revision the graph asks should_stop()-style questions in this order:
+
+    budget       - run is over max_seconds or max_tokens          -> "time_budget" / "token_budget"
+    converged    - new answer is >= (1 - min_change) similar to
+                   the previous one                               -> "converged"
+    no critique  - the critique is empty or "none", "n/a", ...    -> "no_critique"
+    no new info  - every new search query was already executed    -> "no_new_queries"
+    limit        - the old fixed iteration limit                  -> "max_iterations"
+
+The first reason found is stored in the graph state, so the caller can see why
+a run ended. Everything can be set per run through the config:
+
+    app.invoke(inputs, config={"configurable": {
+        "max_seconds": 120, "max_tokens": 40_000, "min_change": 0.05,
+    }})
+
+min_change = 0 turns the similarity check off (only identical answers stop).
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Iterable, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+DEFAULT_MIN_CHANGE = 0.05
+
+# critique texts that mean "nothing to improve"
+_TRIVIAL_CRITIQUE = re.compile(
+    r"^(none|nothing|n/?a|no|nil|-+|no issues?|nothing (is )?missing|nothing significant)\W*$",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class StopPolicy:
+    min_change: float = DEFAULT_MIN_CHANGE
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[RunnableConfig]) -> "StopPolicy":
+        configurable = (config or {}).get("configurable", {})
+        return cls(
+            min_change=configurable.get("min_change", DEFAULT_MIN_CHANGE),
+            max_seconds=configurable.get("max_seconds"),
+            max_tokens=configurable.get("max_tokens"),
+        )
+
+
+def answer_similarity(previous: str, current: str) -> float:
+    """0.0 (nothing in common) .. 1.0 (same words in the same order)."""
+    if previous == current:
+        return 1.0
+    # word level: re-wrapped lines or changed punctuation do not count as a change
+    a, b = _WORD.findall(previous.lower()), _WORD.findall(current.lower())
+    if not a or not b:
+        return 0.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    # quick_ratio is an upper bound and much cheaper - skip the full diff when it is already low
+    upper = matcher.quick_ratio()
+    if upper < 0.5:
+        return upper
+    return matcher.ratio()
+
+
+def is_converged(previous: Optional[str], current: str, min_change: float) -> bool:
+    if previous is None:
+        return False
+    return answer_similarity(previous, current) >= 1.0 - min_change
+
+
+def is_trivial_critique(critique: Optional[str]) -> bool:
+    if critique is None:
+        return False
+    text = critique.strip()
+    return not text or bool(_TRIVIAL_CRITIQUE.match(text))
+
+
+def budget_reason(policy: StopPolicy, started_at: Optional[float], tokens: int) -> Optional[str]:
+    if policy.max_seconds is not None and started_at is not None and time.time() - started_at >= policy.max_seconds:
+        return "time_budget"
+    if policy.max_tokens is not None and tokens >= policy.max_tokens:
+        return "token_budget"
+    return None
+
+
+def message_tokens(messages: Iterable) -> int:
+    """Tokens the llm reported for these messages (usage_metadata of AIMessages)."""
+    total = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            total += usage.get("total_tokens", 0)
+    return total
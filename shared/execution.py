@@ -0,0 +1,140 @@
+"""
+Per-node execution policy: inline, thread pool or process pool
+
+When a graph fans out (cricket_workflow: START -> three calculations, the essay
+workflow: START -> three evaluators) LangGraph runs the branches on threads. That
+overlaps i/o (llm calls), but pure python work (parsing, scoring, text
+processing) holds the GIL, so CPU-heavy branches still run one after the other.
+
+The policy is declared when the node is added:
+
+    graph = ExecutionStateGraph(BatsmanState)
+    graph.add_node("calculate_sr", calculate_sr)                              # inline (default)
+    graph.add_node("parse_scorecard", parse_scorecard, execution="thread")
+    graph.add_node("score_text", score_text, execution="process", reads=("text",))
+
+or for a plain StateGraph: graph.add_node("score_text", with_execution(score_text, "process", reads=("text",)))
+
+    inline   - called directly: a sync node on LangGraph's own threads, on the event
+               loop under ainvoke (no thread hop for cheap nodes)
+    thread   - shared ThreadPoolExecutor (NODE_THREAD_WORKERS, default 32); the run
+               context goes along, so llm calls inside still report to the callbacks
+    process  - shared ProcessPoolExecutor (NODE_PROCESS_WORKERS, default cpu count):
+               CPU-bound branches run on separate cores
+
+A process node gets a plain dict with only the `reads` keys (the whole state when
+reads is None), so only what the node needs is pickled. It returns its partial
+update as usual and the update goes through the normal reducers in the parent,
+so fan-ins (operator.add, add_messages, ...) work unchanged.
+
+Process nodes must be importable functions (defined in a module or a script, not
+in a notebook cell) and get no config / callbacks. Workers are started with
+forkserver (NODE_PROCESS_START_METHOD to change it): forking a process that
+already runs LangGraph's threads is not safe.
+"""
+
+import asyncio
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+EXECUTIONS = (INLINE, THREAD, PROCESS)
+
+
+@lru_cache(maxsize=None)
+def get_thread_pool() -> ThreadPoolExecutor:
+    workers = int(os.getenv("NODE_THREAD_WORKERS", "32"))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-node")
+
+
+@lru_cache(maxsize=None)
+def get_process_pool() -> ProcessPoolExecutor:
+    workers = int(os.getenv("NODE_PROCESS_WORKERS", "0")) or os.cpu_count() or 1
+    context = multiprocessing.get_context(os.getenv("NODE_PROCESS_START_METHOD", "forkserver"))
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def _pool(execution: str) -> Executor:
+    return get_thread_pool() if execution == THREAD else get_process_pool()
+
+
+def _state_slice(state: Any, reads: Optional[tuple]) -> dict:
+    if reads is None:
+        return dict(state)
+    return {key: state[key] for key in reads if key in state}
+
+
+def _drop_broken_pool(pool: Executor) -> None:
+    # a worker died (e.g. killed for memory), at submit or while a node ran on it: the
+    # next node gets a fresh pool - unless another node already replaced this one
+    if get_process_pool.cache_info().currsize and get_process_pool() is pool:
+        get_process_pool.cache_clear()
+
+
+def _submit(execution: str, fn: Callable, state: Any, reads: Optional[tuple]) -> Tuple[Executor, Future]:
+    if execution == THREAD:
+        pool = get_thread_pool()
+        # copy_context: callbacks / config of the run are found by llm calls in the node
+        return pool, pool.submit(contextvars.copy_context().run, fn, state)
+    pool = get_process_pool()
+    try:
+        return pool, pool.submit(fn, _state_slice(state, reads))
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        raise
+
+
+def with_execution(
+    fn: Callable,
+    execution: str = INLINE,
+    reads: Optional[Iterable[str]] = None,
+    name: Optional[str] = None,
+):
+    """Wrap a node function so it runs inline, on the shared thread pool or on the process pool."""
+    if execution not in EXECUTIONS:
+        raise ValueError(f"execution must be one of {EXECUTIONS}, got {execution!r}")
+    if execution == INLINE:
+        return fn
+    reads = tuple(reads) if reads is not None else None
+
+    def run(state):
+        pool, future = _submit(execution, fn, state, reads)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _drop_broken_pool(pool)
+            raise
+
+    async def arun(state):
+        pool, future = _submit(execution, fn, state, reads)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            _drop_broken_pool(pool)
+            raise
+
+    return RunnableLambda(run, afunc=arun, name=name or getattr(fn, "__name__", None))
+
+
+class ExecutionStateGraph(StateGraph):
+    """StateGraph whose add_node takes execution= ("inline" / "thread" / "process") and reads=."""
+
+    def add_node(self, node, action=None, *, execution: str = INLINE, reads: Optional[Iterable[str]] = None, **kwargs):
+        if action is None and not isinstance(node, str):
+            # add_node(fn): the name comes from the function, like in StateGraph
+            node, action = getattr(node, "__name__", None) or getattr(node, "name"), node
+        if execution != INLINE:
+            action = with_execution(action, execution, reads, name=node)
+            # visible in the node's metadata (tracing, instrumentation)
+            kwargs["metadata"] = {**(kwargs.get("metadata") or {}), "execution": execution}
+        return super().add_node(node, action, **kwargs)
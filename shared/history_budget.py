@@ -0,0 +1,237 @@
+"""
+Context-window budget for the reflection loops
+
+Every generate / reflect / revise call resends the whole history, and in the
+Reflexion loop that history contains the raw json of 5 search results per query.
+Prompt size therefore grows with every iteration (and the total cost quadratically).
+
+compact_history() runs right before a chain is invoked:
+
+    [question, draft 1, search 1, draft 2, search 2, draft 3, search 3]
+       │        └──────── older ────────┘  └───── newest keep_last ─────┘
+       │              │                              │
+     always kept   ToolMessages → short "url: snippet" lines      kept in full
+                   old drafts   → first few hundred characters
+                   still over max_tokens → oldest turns dropped
+
+- an AIMessage with tool calls and the ToolMessages answering it are kept or
+  dropped together, the OpenAI api rejects a ToolMessage without its tool call
+- a history that fits in max_tokens is returned as it is: collapsing a turn rewrites
+  the middle of the prompt, which ends the prefix the provider can serve from its
+  prompt cache, so it only happens once the budget is exceeded
+- lazy=True (PROMPT_LAYOUT=prefix_cache in the Reflexion chains): over the budget the
+  collapsed part grows keep_last messages at a time instead of one turn per call, so
+  consecutive prompts keep sharing it (a body too short for one such step is split
+  like in eager mode)
+- returns the compacted list plus a report with the tokens saved; report_compaction()
+  sends it as a "history_compaction" custom event from inside a node, GraphMetrics
+  adds it to that node's numbers
+"""
+
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import List, Sequence
+
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 6000
+DEFAULT_KEEP_LAST = 4
+DEFAULT_SNIPPET_CHARS = 200
+COMPACTION_EVENT = "history_compaction"
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    # loaded on first use - tiktoken downloads the encoding file the first time,
+    # so importing this module must not trigger it
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # not installed or no network: fall back to an estimate
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = count_text_tokens(content)
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count_text_tokens(json.dumps(tool_call["args"]))
+    # a few tokens of per-message overhead (role, separators)
+    return tokens + 4
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(count_message_tokens(message) for message in messages)
+
+
+@dataclass
+class CompactionReport:
+    tokens_before: int
+    tokens_after: int
+    collapsed: int  # old messages shortened to snippets
+    dropped: int  # old messages removed to fit max_tokens
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _snippet(text: str, chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= chars else text[:chars] + "..."
+
+
+def _collapse_tool_message(message: ToolMessage, chars: int) -> ToolMessage:
+    # execute_tools content looks like {"query": [{"url": ..., "content": ...}, ...]}
+    try:
+        results = json.loads(message.content)
+    except (TypeError, ValueError):
+        results = None
+
+    if isinstance(results, dict):
+        lines = []
+        for query, items in results.items():
+            lines.append(f"{query}:")
+            for item in items if isinstance(items, list) else []:
+                if isinstance(item, dict):
+                    lines.append(f"- {item.get('url', '')}: {_snippet(str(item.get('content', '')), chars)}")
+        summary = "\n".join(lines)
+    else:
+        # compact text from 4_Reflexion_system/result_shaping.py: keep the "## query" and
+        # "[n] url" lines so older citation numbers stay known, drop the passages
+        lines = [
+            line for line in str(message.content).splitlines()
+            if line.startswith("## ") or re.match(r"\[\d+\] ", line)
+        ]
+        summary = "\n".join(lines) if lines else _snippet(str(message.content), chars)
+
+    return message.model_copy(update={"content": summary})
+
+
+def _collapse_ai_message(message: AIMessage, chars: int) -> AIMessage:
+    tool_calls = []
+    for tool_call in message.tool_calls:
+        args = dict(tool_call["args"])
+        if isinstance(args.get("answer"), str):
+            args["answer"] = _snippet(args["answer"], chars)
+        tool_calls.append({**tool_call, "args": args})
+
+    content = message.content if isinstance(message.content, str) else ""
+    # drop the raw tool call json too, otherwise the full answer is still in there
+    additional_kwargs = {k: v for k, v in message.additional_kwargs.items() if k != "tool_calls"}
+    return message.model_copy(
+        update={
+            "content": _snippet(content, chars),
+            "tool_calls": tool_calls,
+            "additional_kwargs": additional_kwargs,
+        }
+    )
+
+
+def _collapse(message: BaseMessage, chars: int) -> BaseMessage:
+    if isinstance(message, ToolMessage):
+        return _collapse_tool_message(message, chars)
+    if isinstance(message, AIMessage):
+        return _collapse_ai_message(message, chars)
+    return message
+
+
+def _group_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    # a ToolMessage always joins the group of the message before it (its AIMessage)
+    groups: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and groups:
+            groups[-1].append(message)
+        else:
+            groups.append([message])
+    return groups
+
+
+def compact_history(
+    messages: Sequence[BaseMessage],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    keep_last: int = DEFAULT_KEEP_LAST,
+    snippet_chars: int = DEFAULT_SNIPPET_CHARS,
+    lazy: bool = False,
+) -> tuple[List[BaseMessage], CompactionReport]:
+    messages = list(messages)
+    tokens_before = count_tokens(messages)
+    if tokens_before <= max_tokens:
+        return messages, CompactionReport(tokens_before, tokens_before, collapsed=0, dropped=0)
+
+    # the user's question is the anchor of the whole loop, it always stays
+    head = messages[:1] if messages and isinstance(messages[0], HumanMessage) else []
+    body = messages[len(head):]
+
+    # newest keep_last messages stay as they are, but never start that window on a
+    # ToolMessage - its AIMessage has to come along
+    split = max(len(body) - keep_last, 0)
+    if lazy:
+        # a body shorter than 2 * keep_last rounds down to nothing: then the eager split,
+        # or a short (default 3 iteration) loop would never be held to max_tokens
+        split = split - split % keep_last or split
+    while 0 < split < len(body) and isinstance(body[split], ToolMessage):
+        split -= 1
+    old, recent = body[:split], body[split:]
+
+    collapsed = [_collapse(message, snippet_chars) for message in old]
+    groups = _group_turns(collapsed)
+
+    # still too big: drop the oldest turns until the budget fits
+    dropped = 0
+    fixed_tokens = count_tokens(head) + count_tokens(recent)
+    old_tokens = count_tokens(collapsed)
+    while groups and fixed_tokens + old_tokens > max_tokens:
+        group = groups.pop(0)
+        old_tokens -= count_tokens(group)
+        dropped += len(group)
+
+    result = head + [message for group in groups for message in group] + recent
+    report = CompactionReport(
+        tokens_before=tokens_before,
+        tokens_after=count_tokens(result),
+        collapsed=len(old) - dropped,
+        dropped=dropped,
+    )
+    logger.info(
+        "history compacted: %d -> %d tokens (saved %d, collapsed %d, dropped %d)",
+        report.tokens_before, report.tokens_after, report.tokens_saved,
+        report.collapsed, report.dropped,
+    )
+    return result, report
+
+
+def _event_data(report: CompactionReport) -> dict:
+    return {**asdict(report), "tokens_saved": report.tokens_saved}
+
+
+# outside of a graph run (or when nothing was compacted) there is nothing to report
+def report_compaction(report: CompactionReport) -> None:
+    if not (report.collapsed or report.dropped):
+        return
+    try:
+        dispatch_custom_event(COMPACTION_EVENT, _event_data(report))
+    except RuntimeError:
+        pass
+
+
+async def areport_compaction(report: CompactionReport) -> None:
+    if not (report.collapsed or report.dropped):
+        return
+    try:
+        await adispatch_custom_event(COMPACTION_EVENT, _event_data(report))
+    except RuntimeError:
+        pass
@@ -0,0 +1,463 @@
+"""
+Shared, pooled http clients for every ChatOpenAI and Tavily object of the process
+
+Without this every ChatOpenAI builds its own httpx client, and the Tavily wrappers
+are worse: requests.post per search (a new connection and TLS handshake each
+time) and a new aiohttp session per async search. Under concurrent load that is
+a handshake per call and a socket per in-flight request.
+
+    from shared.http_clients import pooled_chat_openai, pooled_tavily_search_results
+
+    llm = pooled_chat_openai(model="gpt-4o")            # instead of ChatOpenAI(model="gpt-4o")
+    search = pooled_tavily_search_results(max_results=5)  # instead of TavilySearchResults(...)
+    tool = pooled_tavily_search(max_results=5)            # instead of TavilySearch(...)
+
+All of them share one sync httpx.Client; ChatOpenAI also shares one httpx.AsyncClient,
+the async searches share one aiohttp.ClientSession:
+
+- keep-alive connections, HTTP/2 for the httpx clients when the h2 package is installed
+  (one connection carries many concurrent requests to the same host)
+- limits from the environment (all optional):
+      HTTP_MAX_CONNECTIONS            open connections per pool (100)
+      HTTP_MAX_KEEPALIVE_CONNECTIONS  idle connections kept for reuse (= HTTP_MAX_CONNECTIONS)
+      HTTP_KEEPALIVE_EXPIRY           seconds an idle connection is kept (30)
+      HTTP_POOL_TIMEOUT               seconds a request may wait for a free connection (30)
+      HTTP2=0                         HTTP/1.1 only
+- the keep-alive limit defaults to the connection limit: httpcore closes an idle
+  connection whenever the pool holds more connections than that limit (idle or
+  not), so a lower limit turns every burst above it into new connections
+- async searches go over aiohttp, not httpx: httpcore's async pool checks every
+  connection (a socket readability check through anyio) each time a request is
+  queued or released, which costs more cpu per request than the handshakes it
+  saves - the stub benchmark ran slower pooled than with a session per call
+- the async pools are kept per event loop (a connection cannot move between loops,
+  and batch runs / benchmarks call asyncio.run more than once); a loop's aiohttp
+  session is closed when asyncio.run shuts the loop down
+- http_pool_stats(): requests, new vs reused connections, TLS handshakes, time
+  spent waiting for a connection (pool wait + connect), connections in use / idle
+
+OPENAI_BASE_URL and TAVILY_API_URL point the clients somewhere else, e.g. a local
+stub server (benchmarks/stub_server.py).
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from functools import lru_cache, wraps
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, TypeVar
+
+import aiohttp
+import httpx
+
+DEFAULT_TIMEOUT_SECONDS = 60.0
+TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com")
+
+T = TypeVar("T")
+
+
+def _built_once(factory: Callable[[], T]) -> Callable[[], T]:
+    """lru_cache for a factory without arguments, holding a lock while it builds.
+
+    lru_cache alone does not: the first calls from several threads at once each build
+    (and use) a client of their own - 16 threads opened 36 connections that way
+    """
+    cached = lru_cache(maxsize=None)(factory)
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get() -> T:
+        with lock:
+            return cached()
+
+    get.cache_info = cached.cache_info
+    return get
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", os.getenv("HTTP_MAX_CONNECTIONS", "100"))),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(DEFAULT_TIMEOUT_SECONDS, connect=10.0, pool=float(os.getenv("HTTP_POOL_TIMEOUT", "30")))
+
+
+def _http2() -> bool:
+    # httpx needs the h2 package for HTTP/2 (pip install "httpx[http2]")
+    return os.getenv("HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+
+class PoolStats:
+    """Counters shared by the sync and the async pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failed = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.http_versions: Dict[str, int] = {}
+
+    def probe(self) -> "_RequestProbe":
+        return _RequestProbe(self)
+
+    def _record(self, probe: "_RequestProbe", http_version: Optional[str]) -> None:
+        # http_version None: the request failed
+        wait = (probe.connection_at or time.perf_counter()) - probe.started
+        with self._lock:
+            self.requests += 1
+            self.failed += http_version is None
+            self.new_connections += probe.connected
+            self.tls_handshakes += probe.tls
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            if http_version is not None:
+                version = http_version or "unknown"
+                self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+
+class _RequestProbe:
+    """httpcore trace callbacks of one request: when it got a connection, and whether it was new."""
+
+    def __init__(self, stats: PoolStats):
+        self.stats = stats
+        self.started = time.perf_counter()
+        # first trace event = the pool handed out a connection (new or reused)
+        self.connection_at: Optional[float] = None
+        self.connected = False
+        self.tls = False
+
+    def _event(self, name: str) -> None:
+        if self.connection_at is None:
+            self.connection_at = time.perf_counter()
+        if name == "connection.connect_tcp.started":
+            self.connected = True
+        elif name == "connection.start_tls.started":
+            self.tls = True
+
+    def trace(self, name: str, info: dict) -> None:
+        self._event(name)
+
+    async def atrace(self, name: str, info: dict) -> None:
+        self._event(name)
+
+
+def _http_version(response: httpx.Response) -> str:
+    return response.extensions.get("http_version", b"").decode()
+
+
+def _pool_counts(transport: Any) -> Dict[str, int]:
+    # httpcore's pool behind the httpx transport
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"open": len(connections), "idle": idle, "in_use": len(connections) - idle}
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        probe = self.stats.probe()
+        request.extensions["trace"] = probe.trace
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self.stats._record(probe, None)
+            raise
+        self.stats._record(probe, _http_version(response))
+        return response
+
+
+class InstrumentedAsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        probe = self.stats.probe()
+        request.extensions["trace"] = probe.atrace
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.stats._record(probe, None)
+            raise
+        self.stats._record(probe, _http_version(response))
+        return response
+
+
+class LoopLocalAsyncTransport(httpx.AsyncBaseTransport):
+    """One InstrumentedAsyncTransport (connection pool) per running event loop."""
+
+    def __init__(self, stats: PoolStats, **kwargs: Any):
+        self.stats = stats
+        self.kwargs = kwargs
+        self._transports: Dict[asyncio.AbstractEventLoop, InstrumentedAsyncTransport] = {}
+        self._lock = threading.Lock()
+
+    def current(self) -> InstrumentedAsyncTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is not None:
+            return transport
+        with self._lock:
+            # pools of finished asyncio.run calls: their sockets went with the loop
+            for closed in [other for other in self._transports if other.is_closed()]:
+                del self._transports[closed]
+            return self._transports.setdefault(loop, InstrumentedAsyncTransport(self.stats, **self.kwargs))
+
+    def transports(self) -> list:
+        with self._lock:
+            return [transport for loop, transport in self._transports.items() if not loop.is_closed()]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.current().aclose()
+
+
+def _aiohttp_trace(stats: PoolStats) -> aiohttp.TraceConfig:
+    """aiohttp's request tracing into the same PoolStats as the httpx transports."""
+    trace = aiohttp.TraceConfig()
+
+    async def request_start(session, context, params):
+        context.probe = stats.probe()
+        context.https = params.url.scheme == "https"
+
+    async def connection_create_start(session, context, params):
+        context.probe._event("connection.connect_tcp.started")
+        # aiohttp has no separate handshake event: a new https connection does one
+        if context.https:
+            context.probe._event("connection.start_tls.started")
+
+    async def connection_reuse(session, context, params):
+        context.probe._event("connection.reused")
+
+    async def request_end(session, context, params):
+        version = params.response.version
+        stats._record(context.probe, f"HTTP/{version.major}.{version.minor}")
+
+    async def request_exception(session, context, params):
+        stats._record(context.probe, None)
+
+    trace.on_request_start.append(request_start)
+    trace.on_connection_create_start.append(connection_create_start)
+    trace.on_connection_reuseconn.append(connection_reuse)
+    trace.on_request_end.append(request_end)
+    trace.on_request_exception.append(request_exception)
+    return trace
+
+
+def _session_counts(session: aiohttp.ClientSession) -> Dict[str, int]:
+    # aiohttp's connector: idle connections per host, and the ones handed out
+    connector = session.connector
+    idle = sum(len(connections) for connections in (getattr(connector, "_conns", {}) or {}).values())
+    in_use = len(getattr(connector, "_acquired", ()) or ())
+    return {"open": idle + in_use, "idle": idle, "in_use": in_use}
+
+
+class LoopLocalSessions:
+    """One aiohttp.ClientSession (connection pool) per running event loop."""
+
+    def __init__(self, stats: PoolStats):
+        self.stats = stats
+        # loop -> (session, the async generator that closes it when the loop shuts down)
+        self._sessions: Dict[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, AsyncIterator[None]]] = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> aiohttp.ClientSession:
+        limits, timeout = _limits(), _timeout()
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limits.max_connections, limit_per_host=0, keepalive_timeout=limits.keepalive_expiry),
+            # connect = waiting for a free connection + connecting, as HTTP_POOL_TIMEOUT
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT_SECONDS, connect=timeout.pool, sock_connect=timeout.connect),
+            trace_configs=[_aiohttp_trace(self.stats)],
+        )
+
+    @staticmethod
+    async def _close_on_shutdown(session: aiohttp.ClientSession) -> AsyncIterator[None]:
+        try:
+            yield
+        finally:
+            await session.close()
+
+    async def current(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is not None:
+            return entry[0]
+        session = self._new_session()
+        # the first step hands the generator to the loop's async generator hooks:
+        # asyncio.run's shutdown_asyncgens() closes it (and the session) before the loop
+        closer = self._close_on_shutdown(session)
+        await closer.__anext__()
+        with self._lock:
+            # sessions of finished asyncio.run calls, already closed by their loop
+            for closed in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[closed]
+            self._sessions[loop] = (session, closer)
+        return session
+
+    def sessions(self) -> list:
+        with self._lock:
+            return [session for loop, (session, _) in self._sessions.items() if not loop.is_closed()]
+
+
+@_built_once
+def get_pool_stats() -> PoolStats:
+    return PoolStats()
+
+
+# one client per process, created on first use (by one thread)
+@_built_once
+def get_http_client() -> httpx.Client:
+    transport = InstrumentedTransport(get_pool_stats(), limits=_limits(), http2=_http2())
+    return httpx.Client(transport=transport, timeout=_timeout(), follow_redirects=True)
+
+
+@_built_once
+def get_async_http_client() -> httpx.AsyncClient:
+    transport = LoopLocalAsyncTransport(get_pool_stats(), limits=_limits(), http2=_http2())
+    return httpx.AsyncClient(transport=transport, timeout=_timeout(), follow_redirects=True)
+
+
+@_built_once
+def get_aiohttp_sessions() -> LoopLocalSessions:
+    return LoopLocalSessions(get_pool_stats())
+
+
+async def get_aiohttp_session() -> aiohttp.ClientSession:
+    """The aiohttp session of the running event loop, for the async searches."""
+    return await get_aiohttp_sessions().current()
+
+
+def http_pool_stats() -> dict:
+    """Totals since start + what the pools hold right now."""
+    stats = get_pool_stats()
+    sync_pool = _pool_counts(get_http_client()._transport) if get_http_client.cache_info().currsize else {}
+    async_pools = [
+        _pool_counts(transport)
+        for transport in (get_async_http_client()._transport.transports() if get_async_http_client.cache_info().currsize else [])
+    ] + [
+        _session_counts(session)
+        for session in (get_aiohttp_sessions().sessions() if get_aiohttp_sessions.cache_info().currsize else [])
+    ]
+    with stats._lock:
+        requests = stats.requests
+        return {
+            "requests": requests,
+            "failed": stats.failed,
+            "new_connections": stats.new_connections,
+            "reused_connections": requests - stats.failed - stats.new_connections,
+            "tls_handshakes": stats.tls_handshakes,
+            "avg_wait_ms": round(stats.wait_seconds / requests * 1000, 3) if requests else 0.0,
+            "max_wait_ms": round(stats.max_wait_seconds * 1000, 3),
+            "http_versions": dict(stats.http_versions),
+            "in_use": sync_pool.get("in_use", 0) + sum(p["in_use"] for p in async_pools),
+            "idle": sync_pool.get("idle", 0) + sum(p["idle"] for p in async_pools),
+        }
+
+
+# --- clients handed out ------------------------------------------------------
+# (the wrapper classes are built on first use: importing this module stays cheap)
+
+
+def pooled_chat_openai(**kwargs: Any):
+    """ChatOpenAI(**kwargs) on the shared connection pools."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(http_client=get_http_client(), http_async_client=get_async_http_client(), **kwargs)
+
+
+def post_json(url: str, payload: dict, headers: Optional[dict] = None) -> dict:
+    """POST a json payload on the shared sync pool (what the pooled searches send)."""
+    response = get_http_client().post(url, json=payload, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def apost_json(url: str, payload: dict, headers: Optional[dict] = None) -> dict:
+    """POST a json payload on the running loop's aiohttp session (the async searches)."""
+    session = await get_aiohttp_session()
+    async with session.post(url, json=payload, headers=headers) as response:
+        response.raise_for_status()
+        return await response.json()
+
+
+@lru_cache(maxsize=None)
+def _pooled_community_wrapper():
+    from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+    class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+        """langchain_community's wrapper (TavilySearchResults) with the requests / aiohttp calls on the pools."""
+
+        # TavilySearchResults passes these positionally
+        def _payload(self, query, max_results=5, search_depth="advanced", include_domains=None, exclude_domains=None,
+                     include_answer=False, include_raw_content=False, include_images=False) -> dict:
+            return {
+                "api_key": self.tavily_api_key.get_secret_value(),
+                "query": query,
+                "max_results": max_results,
+                "search_depth": search_depth,
+                "include_domains": include_domains or [],
+                "exclude_domains": exclude_domains or [],
+                "include_answer": include_answer,
+                "include_raw_content": include_raw_content,
+                "include_images": include_images,
+            }
+
+        def raw_results(self, *args: Any, **kwargs: Any) -> Dict:
+            return post_json(f"{TAVILY_API_URL}/search", self._payload(*args, **kwargs))
+
+        async def raw_results_async(self, *args: Any, **kwargs: Any) -> Dict:
+            return await apost_json(f"{TAVILY_API_URL}/search", self._payload(*args, **kwargs))
+
+    return PooledTavilySearchAPIWrapper
+
+
+@lru_cache(maxsize=None)
+def _pooled_tavily_wrapper():
+    from langchain_tavily._utilities import TavilySearchAPIWrapper
+
+    class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+        """langchain_tavily's wrapper (TavilySearch) with the requests / aiohttp calls on the pools."""
+
+        def _request(self, query: str, params: dict) -> tuple:
+            payload = {"query": query, **{key: value for key, value in params.items() if value is not None}}
+            headers = {
+                "Authorization": f"Bearer {self.tavily_api_key.get_secret_value()}",
+                "X-Client-Source": "langchain-tavily",
+            }
+            return f"{self.api_base_url or TAVILY_API_URL}/search", payload, headers
+
+        def raw_results(self, query: str, **params: Any) -> Dict[str, Any]:
+            return post_json(*self._request(query, params))
+
+        async def raw_results_async(self, query: str, **params: Any) -> Dict[str, Any]:
+            return await apost_json(*self._request(query, params))
+
+    return PooledTavilySearchAPIWrapper
+
+
+def pooled_tavily_search_results(**kwargs: Any):
+    """langchain_community TavilySearchResults(**kwargs) on the shared connection pools."""
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    return TavilySearchResults(api_wrapper=_pooled_community_wrapper()(), **kwargs)
+
+
+def pooled_tavily_search(**kwargs: Any):
+    """langchain_tavily TavilySearch(**kwargs) on the shared connection pools."""
+    from langchain_tavily import TavilySearch
+
+    return TavilySearch(api_wrapper=_pooled_tavily_wrapper()(), **kwargs)
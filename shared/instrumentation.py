@@ -0,0 +1,280 @@
+"""
+Per-node timing and token instrumentation for any compiled graph
+
+    metrics = GraphMetrics()
+    app.invoke(inputs, config={"callbacks": [metrics]})
+    print(metrics.summary_table())
+    print(metrics.prompt_cache_table())
+    print(metrics.openmetrics())
+
+LangGraph runs every node added with add_node as a child run tagged with
+metadata["langgraph_node"], and every llm / tool call inside a node inherits
+that tag. So one callback handler sees all nodes of any graph (reflexion_graph,
+3_chains/basic.py, the notebooks) without changing how the graph is built.
+
+Per node execution one event (a plain dict) is recorded:
+
+    node, step, wall_ms   - how long the node ran
+    wait_ms               - time between the previous node of the same graph run
+                            finishing and this node starting (scheduling / queueing)
+    prompt_tokens, completion_tokens, llm_calls   - from the llm usage metadata
+    cached_prompt_tokens  - prompt tokens the provider served from its prefix cache
+                            (usage input_token_details.cache_read, openai: cached_tokens)
+    search_calls          - tool calls made inside the node (cache hits never reach the tool)
+    state_size            - messages in the node input (or number of state keys)
+    history_tokens_saved  - prompt tokens removed by history compaction in the node
+                            (a "history_compaction" custom event, shared/history_budget.py)
+    search_raw_chars, search_compact_chars   - search payload before / after shaping
+                            (a "search_shaping" custom event, 4_Reflexion_system/result_shaping.py)
+    error                 - exception type name if the node failed
+
+The handler only does a few dict updates per callback, which LangChain calls
+anyway, so it can stay on in production. Pass on_event to stream the events
+somewhere (a logger, a queue) instead of only keeping them in memory.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def _state_size(inputs: Any) -> int:
+    # cheap on purpose: no serialization, just lengths
+    if isinstance(inputs, dict):
+        messages = inputs.get("messages")
+        return len(messages) if isinstance(messages, list) else len(inputs)
+    if isinstance(inputs, list):
+        return len(inputs)
+    return 1
+
+
+def _token_usage(response: Any) -> tuple:
+    prompt = completion = cached = 0
+    for generations in getattr(response, "generations", []) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+                cached += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    if not (prompt or completion):
+        # older integrations only report it in llm_output
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+    return prompt, completion, cached
+
+
+# custom events a node sends about its own work (dispatch_custom_event):
+# event name -> {key in the event data: field of the node event it is added to}
+REPORTED_EVENTS = {
+    "history_compaction": {"tokens_saved": "history_tokens_saved"},
+    "search_shaping": {"raw_chars": "search_raw_chars", "compact_chars": "search_compact_chars"},
+}
+REPORTED_FIELDS = [field for fields in REPORTED_EVENTS.values() for field in fields.values()]
+
+
+class GraphMetrics(BaseCallbackHandler):
+    def __init__(self, on_event: Optional[Callable[[dict], None]] = None, keep_events: bool = True):
+        self.on_event = on_event
+        self.keep_events = keep_events
+        self.events: List[dict] = []
+        self._lock = threading.Lock()
+        # node run_id -> event being filled in
+        self._open: Dict[UUID, dict] = {}
+        # llm / tool run_id -> node run_id it belongs to
+        self._owner: Dict[UUID, UUID] = {}
+        # graph run_id -> when its last node finished (or when the graph started)
+        self._last_end: Dict[UUID, float] = {}
+        # one entry per llm call: node, prompt tokens, how many of them were cached
+        self.prompt_calls: List[dict] = []
+        # running totals per node name for summary_table / openmetrics
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    # --- node runs -------------------------------------------------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        now = time.perf_counter()
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        with self._lock:
+            if node is None or kwargs.get("name") != node:
+                # the graph itself (no node tag yet) - remember its start for wait_ms
+                if parent_run_id is None or node is None:
+                    self._last_end.setdefault(run_id, now)
+                if parent_run_id in self._open:
+                    self._owner[run_id] = parent_run_id
+                elif parent_run_id in self._owner:
+                    self._owner[run_id] = self._owner[parent_run_id]
+                return
+            previous_end = self._last_end.get(parent_run_id, now)
+            self._open[run_id] = {
+                "node": node,
+                "step": metadata.get("langgraph_step"),
+                "graph_run_id": str(parent_run_id),
+                "started": now,
+                "wait_ms": max(now - previous_end, 0.0) * 1000,
+                "state_size": _state_size(inputs),
+                "prompt_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "completion_tokens": 0,
+                "llm_calls": 0,
+                "search_calls": 0,
+                **dict.fromkeys(REPORTED_FIELDS, 0),
+                "error": None,
+            }
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self._finish(run_id, parent_run_id, None)
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._finish(run_id, parent_run_id, type(error).__name__)
+
+    def _finish(self, run_id, parent_run_id, error):
+        now = time.perf_counter()
+        with self._lock:
+            self._owner.pop(run_id, None)
+            event = self._open.pop(run_id, None)
+            if event is None:
+                # graph run (or some other chain) finished
+                self._last_end.pop(run_id, None)
+                return
+            started = event.pop("started")
+            event["wall_ms"] = (now - started) * 1000
+            event["error"] = error
+            self._last_end[parent_run_id] = now
+
+            totals = self.totals.setdefault(event["node"], {
+                "runs": 0, "errors": 0, "wall_ms": 0.0, "wait_ms": 0.0,
+                "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0, "search_calls": 0,
+                **dict.fromkeys(REPORTED_FIELDS, 0),
+            })
+            totals["runs"] += 1
+            totals["errors"] += 1 if error else 0
+            for key in ("wall_ms", "wait_ms", "prompt_tokens", "cached_prompt_tokens", "completion_tokens", "llm_calls", "search_calls",
+                        *REPORTED_FIELDS):
+                totals[key] += event[key]
+
+            if self.keep_events:
+                self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    # --- llm and tool calls inside a node --------------------------------
+
+    def _attach(self, run_id, parent_run_id) -> Optional[dict]:
+        node_run = parent_run_id if parent_run_id in self._open else self._owner.get(parent_run_id)
+        if node_run is None:
+            return None
+        self._owner[run_id] = node_run
+        return self._open.get(node_run)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            event = self._attach(run_id, parent_run_id)
+            if event is not None:
+                event["llm_calls"] += 1
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, parent_run_id=parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, parent_run_id=None, **kwargs):
+        prompt, completion, cached = _token_usage(response)
+        with self._lock:
+            node_run = self._owner.pop(run_id, None)
+            event = self._open.get(node_run)
+            if event is not None:
+                event["prompt_tokens"] += prompt
+                event["cached_prompt_tokens"] += cached
+                event["completion_tokens"] += completion
+                self.prompt_calls.append({"node": event["node"], "prompt_tokens": prompt, "cached_prompt_tokens": cached})
+
+    def on_llm_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._owner.pop(run_id, None)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            event = self._attach(run_id, parent_run_id)
+            if event is not None:
+                event["search_calls"] += 1
+
+    def on_tool_end(self, output, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._owner.pop(run_id, None)
+
+    def on_tool_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._owner.pop(run_id, None)
+
+    def on_custom_event(self, name, data, *, run_id, tags=None, metadata=None, **kwargs):
+        fields = REPORTED_EVENTS.get(name)
+        if not fields or not isinstance(data, dict):
+            return
+        with self._lock:
+            # sent from the node function itself (run_id is the node run) or from inside a chain
+            event = self._open.get(run_id) or self._open.get(self._owner.get(run_id))
+            if event is not None:
+                for key, field in fields.items():
+                    event[field] += data.get(key, 0)
+
+    # --- reports ---------------------------------------------------------
+
+    def summary_table(self) -> str:
+        header = (
+            f"{'node':24} {'runs':>5} {'total ms':>10} {'avg ms':>9} {'wait ms':>9} {'prompt tok':>10} "
+            f"{'cached tok':>10} {'compl tok':>9} {'llm':>4} {'search':>6} {'hist saved':>10}"
+        )
+        lines = [header, "-" * len(header)]
+        for node, t in sorted(self.totals.items(), key=lambda item: -item[1]["wall_ms"]):
+            lines.append(
+                f"{node:24} {int(t['runs']):5} {t['wall_ms']:10.1f} {t['wall_ms'] / t['runs']:9.1f} "
+                f"{t['wait_ms']:9.1f} {int(t['prompt_tokens']):10} {int(t['cached_prompt_tokens']):10} "
+                f"{int(t['completion_tokens']):9} {int(t['llm_calls']):4} {int(t['search_calls']):6} "
+                f"{int(t['history_tokens_saved']):10}"
+            )
+        return "\n".join(lines)
+
+    def prompt_cache_table(self) -> str:
+        """Per llm call: prompt tokens served from the provider's prefix cache vs sent uncached."""
+        header = f"{'call':>4} {'node':24} {'prompt tok':>10} {'cached':>8} {'uncached':>9} {'cached %':>9}"
+        lines = [header, "-" * len(header)]
+        with self._lock:
+            calls = list(self.prompt_calls)
+        for number, call in enumerate(calls, 1):
+            prompt, cached = call["prompt_tokens"], call["cached_prompt_tokens"]
+            lines.append(
+                f"{number:4} {call['node']:24} {prompt:10} {cached:8} {prompt - cached:9} "
+                f"{(cached / prompt * 100 if prompt else 0.0):8.1f}%"
+            )
+        prompt = sum(call["prompt_tokens"] for call in calls)
+        cached = sum(call["cached_prompt_tokens"] for call in calls)
+        lines.append(f"{'':4} {'total':24} {prompt:10} {cached:8} {prompt - cached:9} {(cached / prompt * 100 if prompt else 0.0):8.1f}%")
+        return "\n".join(lines)
+
+    def openmetrics(self, prefix: str = "langgraph_node") -> str:
+        metrics = [
+            ("runs", "counter", "runs", 1),
+            ("errors", "counter", "errors", 1),
+            ("duration_seconds", "counter", "wall_ms", 0.001),
+            ("wait_seconds", "counter", "wait_ms", 0.001),
+            ("prompt_tokens", "counter", "prompt_tokens", 1),
+            ("cached_prompt_tokens", "counter", "cached_prompt_tokens", 1),
+            ("completion_tokens", "counter", "completion_tokens", 1),
+            ("llm_calls", "counter", "llm_calls", 1),
+            ("search_calls", "counter", "search_calls", 1),
+            ("history_tokens_saved", "counter", "history_tokens_saved", 1),
+            ("search_raw_chars", "counter", "search_raw_chars", 1),
+            ("search_compact_chars", "counter", "search_compact_chars", 1),
+        ]
+        lines = []
+        for name, kind, key, scale in metrics:
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for node, t in sorted(self.totals.items()):
+                lines.append(f'{prefix}_{name}_total{{node="{node}"}} {t[key] * scale:g}')
+        lines.append("# EOF")
+        return "\n".join(lines)
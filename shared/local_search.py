@@ -0,0 +1,572 @@
+"""
+Local search index - an offline drop-in for the Tavily search tools
+
+execute_tools.py and react_agent_basic.py only get evidence from the Tavily api:
+slow, rate limited, and not there at all without internet. With SEARCH_BACKEND=local
+they search a document collection on disk instead, and get the same result shape:
+
+    [{"title": ..., "url": ..., "content": ..., "score": ...}, ...]     (TavilySearchResults)
+    {"query": ..., "results": [...]}                                    (TavilySearch)
+
+Building and updating the index (one writer at a time):
+
+    python -m shared.local_search add corpus.jsonl more/ --index .cache/search_index
+    python -m shared.local_search add new.jsonl          # only new / changed documents
+    python -m shared.local_search compact                # merge the segments
+    python -m shared.local_search search "ai tools for small business"
+
+A corpus is JSONL with {"url", "content", "title"} per line ("text" is read as
+content, a missing url becomes the file + line) or a folder of .txt / .md files.
+
+Layout - every array is a .npy file opened with mmap_mode="r", so opening the index
+reads only the manifest, and worker processes share one copy of it in the page cache:
+
+    search_index/
+        manifest.json                    segment list + generation
+        seg-000001/
+            term_hash.npy    uint64      64-bit hash of every term, sorted
+            term_offsets.npy int64       postings of term i: [offsets[i], offsets[i+1])
+            post_doc.npy     uint32      document ids, sorted per term
+            post_tf.npy      uint16      term frequency in that document
+            doc_len.npy      uint32      terms per document (bm25 length normalization)
+            live.npy         bool        False once a later add replaced the document
+            url_hash.npy / digest.npy    url and content hash, for incremental adds
+            doc_offsets.npy + docs.bin   the documents as json
+            vectors.npy      float32     unit vectors per document (dense index only)
+
+- query: hash the terms, np.searchsorted in term_hash of each segment, bm25 on the
+  postings with numpy (k1=1.2, b=0.75). Scores are added into a per-thread scratch
+  array and only the touched documents are read back and reset, so a query costs
+  the length of its postings, not the size of the collection. Stop words are not
+  indexed - their postings would be the largest and add nothing to the ranking
+- incremental add: documents whose url is already indexed with the same content are
+  skipped, a changed document goes into the new segment and the old copy is marked
+  dead (live.npy). Every add writes one segment; compact merges them into one and
+  drops the dead documents
+- a running process sees a new add / compact on its next query (manifest changed)
+- dense (optional, add --dense N): vectors from an Embeddings object, brute force
+  dot product over the mmap'ed matrix, fused with the bm25 ranking (reciprocal rank
+  fusion). The built-in one is the local HashingEmbeddings of response_cache.py;
+  an index built with other embeddings needs the same object at query time
+  (get_local_index(path, embeddings)), without it the query is bm25 only
+
+Environment:
+
+    SEARCH_BACKEND=local                 execute_tools / react_agent_basic use this index
+    LOCAL_SEARCH_INDEX=.cache/search_index
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.tools import BaseTool
+
+DEFAULT_INDEX_PATH = os.getenv("LOCAL_SEARCH_INDEX", ".cache/search_index")
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+# documents read (and checked against the index) at a time while adding
+ADD_BATCH_SIZE = 10_000
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from had has have how i if in into is it its "
+    "of on or so such than that the their then there these they this to was we were what when where "
+    "which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def _atomic_save(path: Path, array_: np.ndarray) -> None:
+    # readers may have the old file mapped: write next to it and swap
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, array_)
+    os.replace(tmp, path)
+
+
+class _SegmentWriter:
+    """Writes one segment; documents are streamed to disk, postings built on close()."""
+
+    def __init__(self, directory: Path, embeddings: Optional[Embeddings] = None, dense: bool = False):
+        self.directory = directory
+        directory.mkdir(parents=True)
+        self.embeddings = embeddings
+        self.dense = dense or embeddings is not None
+        self.vocab: Dict[str, int] = {}
+        self.term_ids = array("I")
+        self.doc_len = array("I")
+        self.url_hash = array("Q")
+        self.digest = array("Q")
+        self.doc_offsets = array("q", [0])
+        self.vectors: List[np.ndarray] = []
+        self._docs = open(directory / "docs.bin", "wb")
+
+    def add(self, docs: List[dict], vectors: Optional[np.ndarray] = None) -> None:
+        vocab = self.vocab
+        for doc in docs:
+            tokens = tokenize(f"{doc.get('title') or ''} {doc['content']}")
+            self.term_ids.extend(vocab.setdefault(token, len(vocab)) for token in tokens)
+            self.doc_len.append(len(tokens))
+            self.url_hash.append(doc["_url_hash"])
+            self.digest.append(doc["_digest"])
+            data = json.dumps({"url": doc["url"], "title": doc.get("title") or "", "content": doc["content"]}).encode()
+            self._docs.write(data)
+            self.doc_offsets.append(self.doc_offsets[-1] + len(data))
+        if vectors is not None:
+            self.vectors.append(np.asarray(vectors, dtype=np.float32))
+        elif self.embeddings is not None and docs:
+            vectors = np.asarray(self.embeddings.embed_documents([d["content"] for d in docs]), dtype=np.float32)
+            self.vectors.append(vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12))
+
+    def close(self) -> int:
+        self._docs.close()
+        n = len(self.doc_len)
+        doc_len = np.frombuffer(self.doc_len, dtype=np.uint32) if n else np.zeros(0, np.uint32)
+        term_ids = np.frombuffer(self.term_ids, dtype=np.uint32) if len(self.term_ids) else np.zeros(0, np.uint32)
+
+        # terms ordered by hash, so a query finds them with searchsorted
+        hashes = np.array([_hash64(term) for term in self.vocab], dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        rank = np.empty(len(hashes), dtype=np.int64)
+        rank[order] = np.arange(len(hashes))
+
+        # (term rank, doc) pairs -> sorted unique pairs + counts = postings with tf
+        doc_ids = np.repeat(np.arange(n, dtype=np.int64), doc_len)
+        keys, tf = np.unique((rank[term_ids] << 32) | doc_ids, return_counts=True)
+        post_term = keys >> 32
+        offsets = np.zeros(len(hashes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_term, minlength=len(hashes)), out=offsets[1:])
+
+        url_hash = np.frombuffer(self.url_hash, dtype=np.uint64) if n else np.zeros(0, np.uint64)
+        # the same url twice in one add: the last one is the document
+        _, last = np.unique(url_hash[::-1], return_index=True)
+        live = np.zeros(n, dtype=bool)
+        live[n - 1 - last] = True
+
+        arrays = {
+            "term_hash": hashes[order],
+            "term_offsets": offsets,
+            "post_doc": (keys & 0xFFFFFFFF).astype(np.uint32),
+            "post_tf": np.minimum(tf, np.iinfo(np.uint16).max).astype(np.uint16),
+            "doc_len": doc_len,
+            "live": live,
+            "url_hash": url_hash,
+            "digest": np.frombuffer(self.digest, dtype=np.uint64) if n else np.zeros(0, np.uint64),
+            "doc_offsets": np.frombuffer(self.doc_offsets, dtype=np.int64),
+        }
+        if self.dense:
+            dimensions = self.vectors[0].shape[1] if self.vectors else 0
+            arrays["vectors"] = np.concatenate(self.vectors) if self.vectors else np.zeros((0, dimensions), np.float32)
+        for name, values in arrays.items():
+            np.save(self.directory / f"{name}.npy", values)
+        with open(self.directory / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"docs": n, "tokens": int(doc_len.sum())}, f)
+        return n
+
+
+class _Segment:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.name = directory.name
+        with open(directory / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.docs = meta["docs"]
+        self.tokens = meta["tokens"]
+        load = lambda name: np.load(directory / f"{name}.npy", mmap_mode="r")  # noqa: E731
+        self.term_hash = load("term_hash")
+        self.term_offsets = load("term_offsets")
+        self.post_doc = load("post_doc")
+        self.post_tf = load("post_tf")
+        self.doc_len = load("doc_len")
+        self.url_hash = load("url_hash")
+        self.digest = load("digest")
+        self.doc_offsets = load("doc_offsets")
+        self.vectors = load("vectors") if (directory / "vectors.npy").exists() else None
+        size = (directory / "docs.bin").stat().st_size
+        self.doc_bytes = np.memmap(directory / "docs.bin", dtype=np.uint8, mode="r") if size else None
+        self.load_live()
+
+    def load_live(self) -> None:
+        self.live = np.load(self.directory / "live.npy", mmap_mode="r")
+
+    def postings(self, term_hash: np.uint64) -> Tuple[np.ndarray, np.ndarray]:
+        i = int(np.searchsorted(self.term_hash, term_hash))
+        if i == len(self.term_hash) or self.term_hash[i] != term_hash:
+            return self.post_doc[:0], self.post_tf[:0]
+        start, end = int(self.term_offsets[i]), int(self.term_offsets[i + 1])
+        return self.post_doc[start:end], self.post_tf[start:end]
+
+    def document(self, doc: int) -> dict:
+        start, end = int(self.doc_offsets[doc]), int(self.doc_offsets[doc + 1])
+        return json.loads(self.doc_bytes[start:end].tobytes())
+
+    def live_batches(self, size: int) -> Iterator[Tuple[List[dict], Optional[np.ndarray]]]:
+        """(documents, their vectors) of the live documents, `size` at a time."""
+        live = np.flatnonzero(self.live)
+        for start in range(0, len(live), size):
+            ids = live[start:start + size]
+            docs = [self.document(int(doc)) for doc in ids]
+            for doc, i in zip(docs, ids):
+                doc["_url_hash"], doc["_digest"] = int(self.url_hash[i]), int(self.digest[i])
+            yield docs, (np.asarray(self.vectors[ids]) if self.vectors is not None else None)
+
+
+def _read_corpus(paths: Iterable[str]) -> Iterator[dict]:
+    """{"url", "title", "content"} from JSONL files and folders of .txt / .md files."""
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob("*") if p.suffix in (".txt", ".md", ".jsonl")) if path.is_dir() else [path]
+        for file in files:
+            if file.suffix != ".jsonl":
+                yield {"url": file.resolve().as_uri(), "title": file.stem, "content": file.read_text(encoding="utf-8")}
+                continue
+            with open(file, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    content = record.get("content") or record.get("text") or ""
+                    url = record.get("url") or f"{file.resolve().as_uri()}#{number}"
+                    yield {"url": url, "title": record.get("title") or "", "content": content}
+
+
+def _batches(docs: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LocalSearchIndex:
+    """BM25 (+ optional dense) index in memory-mapped segments under `path`."""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, embeddings: Optional[Embeddings] = None):
+        self.path = Path(path)
+        self.embeddings = embeddings
+        self.segments: List[_Segment] = []
+        self.manifest: dict = {"generation": 0, "segments": [], "dense": None}
+        self._manifest_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+        self._scratch = threading.local()
+        self.refresh()
+
+    # -- reading -------------------------------------------------------------
+
+    def refresh(self) -> None:
+        """Reopen the index when an add / compact changed the manifest since the last call."""
+        manifest_path = self.path / "manifest.json"
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            opened = {segment.name: segment for segment in self.segments}
+            segments = []
+            for name in manifest["segments"]:
+                segment = opened.get(name) or _Segment(self.path / name)
+                segment.load_live()
+                segments.append(segment)
+            dense = manifest.get("dense")
+            if self.embeddings is None and dense and dense.get("embeddings") == "hashing":
+                self.embeddings = _hashing_embeddings(dense["dimensions"])
+            self.manifest, self.segments, self._manifest_mtime = manifest, segments, mtime
+
+    def stats(self) -> dict:
+        self.refresh()
+        return {
+            "segments": len(self.segments),
+            "docs": sum(s.docs for s in self.segments),
+            "live_docs": sum(int(np.count_nonzero(s.live)) for s in self.segments),
+            "terms": sum(len(s.term_hash) for s in self.segments),
+            "dense": self.manifest.get("dense"),
+            "bytes": sum(f.stat().st_size for f in self.path.rglob("*") if f.is_file()),
+        }
+
+    def _scores(self, segment: _Segment) -> np.ndarray:
+        # one zeroed array per segment and thread; search() resets what it touched
+        arrays = getattr(self._scratch, "arrays", None)
+        if arrays is None or len(arrays) > len(self.segments):
+            # first query of this thread, or segments were merged away since
+            arrays = self._scratch.arrays = {k: v for k, v in (arrays or {}).items() if k in self.manifest["segments"]}
+        scores = arrays.get(segment.name)
+        if scores is None or len(scores) != segment.docs:
+            scores = arrays[segment.name] = np.zeros(segment.docs, dtype=np.float32)
+        return scores
+
+    def _bm25(self, query: str, k: int) -> List[Tuple[float, _Segment, int]]:
+        hashes = np.unique(np.array([_hash64(token) for token in tokenize(query)], dtype=np.uint64))
+        if not len(hashes) or not self.segments:
+            return []
+        n_docs = sum(s.docs for s in self.segments)
+        avgdl = max(sum(s.tokens for s in self.segments) / max(n_docs, 1), 1.0)
+        postings = [[segment.postings(h) for h in hashes] for segment in self.segments]
+        df = np.array([sum(len(per_segment[t][0]) for per_segment in postings) for t in range(len(hashes))])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        hits = []
+        for segment, per_segment in zip(self.segments, postings):
+            scores = self._scores(segment)
+            touched = []
+            for weight, (docs, tf) in zip(idf, per_segment):
+                if not len(docs):
+                    continue
+                tf = tf.astype(np.float32)
+                norm = K1 * (1 - B + B * segment.doc_len[docs].astype(np.float32) / avgdl)
+                # a term appears once per document in its postings, so plain fancy indexing adds up
+                scores[docs] += weight * tf * (K1 + 1) / (tf + norm)
+                touched.append(docs)
+            if not touched:
+                continue
+            touched = np.concatenate(touched) if len(touched) > 1 else np.asarray(touched[0])
+            values = scores[touched] * segment.live[touched]
+            scores[touched] = 0.0
+            # a document is in touched once per matching term: take enough to get k distinct ones
+            take = min(k * len(per_segment), len(values))
+            best = np.argpartition(-values, take - 1)[:take] if take < len(values) else np.arange(len(values))
+            seen = set()
+            for i in best[np.argsort(-values[best], kind="stable")]:
+                doc = int(touched[i])
+                if values[i] > 0 and doc not in seen:
+                    seen.add(doc)
+                    hits.append((float(values[i]), segment, doc))
+                    if len(seen) == k:
+                        break
+        hits.sort(key=lambda hit: -hit[0])
+        return hits[:k]
+
+    def _dense(self, query: str, k: int) -> List[Tuple[float, _Segment, int]]:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        hits = []
+        for segment in self.segments:
+            if segment.vectors is None or not segment.docs:
+                continue
+            similarity = np.where(segment.live, segment.vectors @ vector, -np.inf)
+            take = min(k, len(similarity))
+            best = np.argpartition(-similarity, take - 1)[:take]
+            hits += [(float(similarity[i]), segment, int(i)) for i in best if similarity[i] > 0]
+        hits.sort(key=lambda hit: -hit[0])
+        return hits[:k]
+
+    def search(self, query: str, k: int = 5, max_content_chars: int = 2000) -> List[dict]:
+        self.refresh()
+        hits = self._bm25(query, k if self.embeddings is None else 4 * k)
+        if self.embeddings is not None and self.manifest.get("dense"):
+            # reciprocal rank fusion: 1 / (60 + rank) from each ranking
+            fused: Dict[Tuple[str, int], list] = {}
+            for ranking in (hits, self._dense(query, 4 * k)):
+                for rank, (_, segment, doc) in enumerate(ranking):
+                    entry = fused.setdefault((segment.name, doc), [0.0, segment, doc])
+                    entry[0] += 1.0 / (RRF_K + rank + 1)
+            hits = sorted(((score, segment, doc) for score, segment, doc in fused.values()), key=lambda hit: -hit[0])
+        results = []
+        for score, segment, doc in hits[:k]:
+            document = segment.document(doc)
+            results.append({
+                "title": document["title"],
+                "url": document["url"],
+                "content": document["content"][:max_content_chars],
+                "score": round(score, 4),
+            })
+        return results
+
+    # -- writing (one writer at a time) --------------------------------------
+
+    def _write_manifest(self, segments: List[str], dense: Optional[dict]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest = {"generation": self.manifest["generation"] + 1, "segments": segments, "dense": dense}
+        tmp = self.path / "manifest.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.path / "manifest.json")
+        # two writes within the file system's timestamp granularity keep the same mtime
+        self._manifest_mtime = None
+        self.refresh()
+
+    def _dense_manifest(self, dense_dimensions: Optional[int]) -> Optional[dict]:
+        current = self.manifest.get("dense")
+        if current and self.embeddings is None:
+            raise ValueError("the index was built with custom embeddings: LocalSearchIndex(path, embeddings)")
+        if current or (not dense_dimensions and self.embeddings is None):
+            return current
+        if self.segments:
+            raise ValueError("the index has no dense vectors: build a new one (or compact into one) with --dense")
+        if self.embeddings is None:
+            self.embeddings = _hashing_embeddings(dense_dimensions)
+            return {"embeddings": "hashing", "dimensions": dense_dimensions}
+        return {"embeddings": "custom", "dimensions": len(self.embeddings.embed_query("dimensions"))}
+
+    def add(self, docs: Iterable[dict], dense_dimensions: Optional[int] = None) -> dict:
+        """Index new / changed documents as one new segment; returns what was done."""
+        self.refresh()
+        dense = self._dense_manifest(dense_dimensions)
+        live_url, live_digest = self._live_keys()
+        name = f"seg-{self.manifest['generation'] + 1:06d}"
+        writer = _SegmentWriter(self.path / name, self.embeddings if dense else None)
+        report = {"read": 0, "added": 0, "unchanged": 0, "replaced": 0}
+        for batch in _batches(docs, ADD_BATCH_SIZE):
+            for doc in batch:
+                doc["_url_hash"] = _hash64(doc["url"])
+                doc["_digest"] = _hash64(f"{doc.get('title') or ''}\x00{doc['content']}")
+            url = np.array([doc["_url_hash"] for doc in batch], dtype=np.uint64)
+            digest = np.array([doc["_digest"] for doc in batch], dtype=np.uint64)
+            position = np.minimum(np.searchsorted(live_url, url), max(len(live_url) - 1, 0))
+            known = (live_url[position] == url) if len(live_url) else np.zeros(len(batch), dtype=bool)
+            unchanged = known & (live_digest[position] == digest) if len(live_url) else known
+            writer.add([doc for doc, skip in zip(batch, unchanged) if not skip])
+            report["read"] += len(batch)
+            report["unchanged"] += int(unchanged.sum())
+            report["replaced"] += int((known & ~unchanged).sum())
+        added = writer.close()
+        report["added"] = added
+        if not added:
+            shutil.rmtree(self.path / name)
+            return report
+        # older copies of the urls in the new segment are not live anymore
+        new_urls = np.load(self.path / name / "url_hash.npy")
+        for segment in self.segments:
+            replaced = segment.live & np.isin(segment.url_hash, new_urls)
+            if replaced.any():
+                _atomic_save(segment.directory / "live.npy", segment.live & ~replaced)
+        self._write_manifest(self.manifest["segments"] + [name], dense)
+        return report
+
+    def _live_keys(self) -> Tuple[np.ndarray, np.ndarray]:
+        # url hash -> content hash of every live document, sorted by url hash
+        if not self.segments:
+            return np.zeros(0, np.uint64), np.zeros(0, np.uint64)
+        urls = np.concatenate([np.asarray(s.url_hash)[np.asarray(s.live)] for s in self.segments])
+        digests = np.concatenate([np.asarray(s.digest)[np.asarray(s.live)] for s in self.segments])
+        order = np.argsort(urls, kind="stable")
+        return urls[order], digests[order]
+
+    def compact(self) -> dict:
+        """Merge every segment into one without the dead documents."""
+        self.refresh()
+        old = list(self.segments)
+        if not old:
+            return {"segments": 0, "docs": 0}
+        name = f"seg-{self.manifest['generation'] + 1:06d}"
+        # documents and vectors are copied as they are, nothing is embedded again
+        writer = _SegmentWriter(self.path / name, dense=bool(self.manifest.get("dense")))
+        for segment in old:
+            for batch, vectors in segment.live_batches(ADD_BATCH_SIZE):
+                writer.add(batch, vectors)
+        docs = writer.close()
+        self._write_manifest([name], self.manifest.get("dense"))
+        for segment in old:
+            shutil.rmtree(segment.directory, ignore_errors=True)
+        return {"segments": len(old), "docs": docs}
+
+
+def _hashing_embeddings(dimensions: int) -> Embeddings:
+    from shared.response_cache import HashingEmbeddings
+
+    return HashingEmbeddings(dimensions)
+
+
+# one open index per path and process, reopened by refresh() when the manifest changes
+@lru_cache(maxsize=None)
+def get_local_index(path: str = DEFAULT_INDEX_PATH, embeddings: Optional[Embeddings] = None) -> LocalSearchIndex:
+    if not (Path(path) / "manifest.json").exists():
+        raise FileNotFoundError(f"no search index at {path}: python -m shared.local_search add <corpus> --index {path}")
+    return LocalSearchIndex(path, embeddings)
+
+
+class LocalSearchResults(BaseTool):
+    """TavilySearchResults interface (query -> list of {title, url, content, score}) over the local index."""
+
+    name: str = "local_search_results_json"
+    description: str = (
+        "A search engine over a local document collection. Useful for when you need to answer "
+        "questions about current events or facts. Input should be a search query."
+    )
+    max_results: int = 5
+    max_content_chars: int = 2000
+    index_path: str = DEFAULT_INDEX_PATH
+
+    def _search(self, query: str) -> List[dict]:
+        return get_local_index(self.index_path).search(query, self.max_results, self.max_content_chars)
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> Any:
+        return self._search(query)
+
+
+class LocalSearch(LocalSearchResults):
+    """langchain_tavily TavilySearch interface: {"query", "results"}."""
+
+    name: str = "local_search"
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> Any:
+        return {"query": query, "results": self._search(query)}
+
+
+def local_search_results(**kwargs: Any) -> LocalSearchResults:
+    kwargs.pop("search_depth", None)
+    return LocalSearchResults(**kwargs)
+
+
+def local_search(**kwargs: Any) -> LocalSearch:
+    kwargs.pop("search_depth", None)
+    return LocalSearch(**kwargs)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Build, update and query the local search index")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="index folder")
+    # --index also after the command; SUPPRESS keeps the command from resetting one given before it
+    index_option = argparse.ArgumentParser(add_help=False)
+    index_option.add_argument("--index", default=argparse.SUPPRESS, help="index folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", parents=[index_option], help="index new / changed documents from JSONL files or folders")
+    add.add_argument("corpus", nargs="+")
+    add.add_argument("--dense", type=int, help="also build a dense index with this many dimensions (new index only)")
+    commands.add_parser("compact", parents=[index_option], help="merge all segments into one")
+    search = commands.add_parser("search", parents=[index_option], help="run a query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    commands.add_parser("stats", parents=[index_option])
+    args = parser.parse_args(argv)
+
+    index = LocalSearchIndex(args.index)
+    if args.command == "add":
+        print(index.add(_read_corpus(args.corpus), dense_dimensions=args.dense))
+    elif args.command == "compact":
+        print(index.compact())
+    elif args.command == "search":
+        for result in index.search(args.query, args.k, max_content_chars=200):
+            print(f"{result['score']:8.3f}  {result['url']}\n          {result['content']}")
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
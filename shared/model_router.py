@@ -0,0 +1,456 @@
+"""
+Latency-aware model routing for the chains (3_chains and 4_Reflexion_system)
+
+Every chain used to call one ChatOpenAI(model="gpt-4o"): the short critique steps
+paid large-model latency, and one slow upstream response stalled the whole loop.
+
+Each node now names a tier, each tier is an ordered list of models:
+
+    NODE_TIERS   generation: strong   reflection: fast   first_responder: strong   revisor: strong
+    tiers        fast: gpt-4o-mini, gpt-4.1-mini          strong: gpt-4o, gpt-4.1
+
+and a call goes through ModelRouter:
+
+    order      models of the tier, fastest recent p95 first (a model without enough
+               samples keeps its configured place behind the measured ones); a model
+               that just returned a rate limit is cooled down for `cooldown` seconds
+    hedge      no answer after the model's p95 (hedge_delay until there are samples):
+               the same request goes to the next model, the first answer wins and
+               the other request is cancelled (async) or left to finish (sync)
+    fallback   rate limit / timeout / connection / 5xx error, or no answer within
+               `timeout`: the next model of the tier is tried; any other error is
+               raised as before
+    histogram  every finished request goes into its model's LatencyHistogram, which
+               is what order and hedge read; router.report() prints them
+
+The router is a BaseChatModel, so everything the chains do with a model still
+works on it: with_response_cache (checked before routing, a cache hit never
+reaches the router and never counts as a latency sample), bind_tools and
+with_structured_output (openai tool format, passed through to the chosen model).
+Only streaming handlers (astream_events, pipelined search) are passed on to the
+model calls; callbacks like GraphMetrics see the routed call once.
+
+Environment variables (all optional):
+
+    MODELS_FAST / MODELS_STRONG      comma separated models of a tier
+    MODEL_TIER_<NODE>                tier of one node, e.g. MODEL_TIER_REVISOR=fast
+    MODEL_HEDGE=0                    no hedged requests
+    MODEL_HEDGE_DELAY                seconds before a hedge while a model has no p95 yet (10)
+    MODEL_TIMEOUT_SECONDS            give up on a request and fall back (60)
+
+Tests and benchmarks build a ModelRouter from fake models with injected latency:
+
+    router = ModelRouter({"fast": [("a", fake_a), ("b", fake_b)]}, {"reflection": "fast"})
+    llm = router.for_node("reflection")
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import CallbackManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict, Field
+
+DEFAULT_TIERS = {
+    "fast": ("gpt-4o-mini", "gpt-4.1-mini"),
+    "strong": ("gpt-4o", "gpt-4.1"),
+}
+
+NODE_TIERS = {
+    "generation": "strong",
+    "reflection": "fast",
+    "first_responder": "strong",
+    "revisor": "strong",
+}
+
+DEFAULT_HEDGE_DELAY = 10.0
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_COOLDOWN_SECONDS = 30.0
+MIN_SAMPLES = 20
+# a p95 of a few ms (tiny prompts) would hedge nearly every call
+MIN_HEDGE_DELAY = 0.2
+
+# upper bounds in seconds; the last bucket takes everything above
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+# error class names (openai, httpx, builtins) that mean "another model may still answer"
+_FALLBACK_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "TimeoutException", "ReadTimeout", "ConnectTimeout", "TimeoutError", "ConnectionError",
+}
+
+
+def _error_names(error: BaseException) -> set:
+    return {cls.__name__ for cls in type(error).__mro__}
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    return "RateLimitError" in _error_names(error) or getattr(error, "status_code", None) == 429
+
+
+def is_fallback_error(error: BaseException) -> bool:
+    return bool(_error_names(error) & _FALLBACK_ERRORS) or getattr(error, "status_code", 0) in (429, 500, 502, 503, 504)
+
+
+class LatencyHistogram:
+    """Bucket counts for the report + the last `window` samples for percentiles."""
+
+    def __init__(self, window: int = 256):
+        self.samples = deque(maxlen=window)
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        index = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS) if seconds <= bound), len(HISTOGRAM_BUCKETS))
+        self.buckets[index] += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+@dataclass
+class ModelStats:
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: int = 0
+    rate_limited: int = 0
+    timeouts: int = 0
+    hedges: int = 0  # requests sent as a hedge
+    wins: int = 0  # calls answered by this model
+    hedge_wins: int = 0
+    fallback_wins: int = 0  # calls answered after another model failed
+    cooling_until: float = 0.0
+
+
+@dataclass
+class _Attempt:
+    name: str
+    started: float
+    hedge: bool
+    handle: Any  # concurrent.futures.Future or asyncio.Task
+
+
+def _is_streaming_handler(handler: Any) -> bool:
+    # langchain_core's _StreamingCallbackHandler protocol
+    return hasattr(handler, "tap_output_iter") and hasattr(handler, "tap_output_aiter")
+
+
+def _model_config(run_manager: Any) -> dict:
+    """Config for the model calls: child of the routed run, streaming handlers only."""
+    if run_manager is None:
+        # an empty list, not None: None would pick up the callbacks of the surrounding run
+        return {"callbacks": []}
+    handlers = [h for h in run_manager.inheritable_handlers if _is_streaming_handler(h)]
+    return {"callbacks": CallbackManager(handlers, handlers, parent_run_id=run_manager.run_id)}
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        tiers: Dict[str, Sequence[Tuple[str, BaseChatModel]]],
+        node_tiers: Optional[Dict[str, str]] = None,
+        hedge: bool = True,
+        hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+        cooldown: float = DEFAULT_COOLDOWN_SECONDS,
+        min_samples: int = MIN_SAMPLES,
+        max_workers: int = 32,
+    ):
+        self.tiers = {tier: list(models) for tier, models in tiers.items()}
+        self.node_tiers = dict(NODE_TIERS if node_tiers is None else node_tiers)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+        # sync calls: the model requests run here so a hedge can start while the first one waits
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-router")
+
+    def for_node(self, node: str) -> "RoutedChatModel":
+        tier = os.getenv(f"MODEL_TIER_{node.upper()}") or self.node_tiers.get(node)
+        if tier not in self.tiers:
+            raise ValueError(f"node {node!r} has no model tier (tiers: {sorted(self.tiers)})")
+        return RoutedChatModel(node=node, tier=tier, models=self.tiers[tier], router=self)
+
+    # --- what the histograms decide -----------------------------------------
+
+    def _stats(self, name: str) -> ModelStats:
+        with self._lock:
+            return self.stats.setdefault(name, ModelStats())
+
+    def _p95(self, name: str) -> Optional[float]:
+        stats = self._stats(name)
+        if stats.histogram.count < self.min_samples:
+            return None
+        return stats.histogram.percentile(0.95)
+
+    def order(self, names: Sequence[str]) -> List[str]:
+        now = time.monotonic()
+
+        def key(item):
+            position, name = item
+            p95 = self._p95(name)
+            # cooling models last; measured models by p95; unmeasured keep their place after them
+            return (self._stats(name).cooling_until > now, p95 is None, p95 or 0.0, position)
+
+        return [name for _, name in sorted(enumerate(names), key=key)]
+
+    def hedge_after(self, name: str) -> float:
+        p95 = self._p95(name)
+        return max(p95 if p95 is not None else self.hedge_delay, MIN_HEDGE_DELAY)
+
+    # --- bookkeeping ----------------------------------------------------------
+
+    def _observe(self, name: str, started: float, handle: Any) -> None:
+        # done callback of every request, also the ones that lost the race
+        if handle.cancelled():
+            return
+        error = handle.exception()
+        stats = self._stats(name)
+        with self._lock:
+            if error is None:
+                stats.histogram.observe(time.perf_counter() - started)
+                return
+            stats.errors += 1
+            if is_rate_limit(error):
+                stats.rate_limited += 1
+                stats.cooling_until = time.monotonic() + self.cooldown
+
+    def _count_hedge(self, name: str, hedge: bool) -> None:
+        stats = self._stats(name)
+        with self._lock:
+            stats.hedges += hedge
+
+    def _timed_out(self, attempt: _Attempt) -> TimeoutError:
+        stats = self._stats(attempt.name)
+        with self._lock:
+            stats.timeouts += 1
+        return TimeoutError(f"{attempt.name} did not answer within {self.timeout}s")
+
+    def _won(self, attempt: _Attempt, message: BaseMessage, failed: bool) -> ChatResult:
+        stats = self._stats(attempt.name)
+        with self._lock:
+            stats.wins += 1
+            stats.hedge_wins += attempt.hedge
+            stats.fallback_wins += failed
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"model_name": attempt.name})
+
+    def _wait_time(self, pending: List[_Attempt], hedge_at: Optional[float]) -> Optional[float]:
+        now = time.perf_counter()
+        deadlines = [attempt.started + self.timeout for attempt in pending] if self.timeout else []
+        if hedge_at is not None:
+            deadlines.append(hedge_at)
+        return max(min(deadlines) - now, 0.0) if deadlines else None
+
+    def _next(self, queue: deque, pending: List[_Attempt], hedged: bool) -> Tuple[Optional[str], bool]:
+        """What to start now: (model, is_hedge) or (None, False)."""
+        if not pending:
+            return (queue.popleft(), False) if queue else (None, False)
+        if not hedged:
+            # a hedge goes to another model when there is one, else to the same model again
+            return (queue.popleft() if queue else pending[0].name), True
+        return None, False
+
+    # --- the race, sync and async ----------------------------------------------
+
+    def generate(self, model: "RoutedChatModel", messages: List[BaseMessage], stop, run_manager, kwargs) -> ChatResult:
+        models = dict(model.models)
+        queue = deque(self.order(list(models)))
+        config = _model_config(run_manager)
+        pending: List[_Attempt] = []
+        errors: List[BaseException] = []
+        hedged = not self.hedge
+
+        def start(name: str, hedge: bool) -> Optional[float]:
+            started = time.perf_counter()
+            future = self._pool.submit(
+                contextvars.copy_context().run, models[name].invoke, messages, config, stop=stop, **kwargs
+            )
+            future.add_done_callback(lambda f: self._observe(name, started, f))
+            pending.append(_Attempt(name, started, hedge, future))
+            return None if hedged else started + self.hedge_after(name)
+
+        hedge_at = start(queue.popleft(), False)
+        try:
+            while pending:
+                wait([attempt.handle for attempt in pending], timeout=self._wait_time(pending, hedge_at), return_when=FIRST_COMPLETED)
+                now = time.perf_counter()
+                for attempt in list(pending):
+                    if attempt.handle.done():
+                        pending.remove(attempt)
+                        error = attempt.handle.exception()
+                        if error is None:
+                            return self._won(attempt, attempt.handle.result(), bool(errors))
+                        if not is_fallback_error(error):
+                            raise error
+                        errors.append(error)
+                    elif self.timeout and now - attempt.started >= self.timeout:
+                        pending.remove(attempt)
+                        errors.append(self._timed_out(attempt))
+                if not pending or (hedge_at is not None and now >= hedge_at):
+                    name, hedge = self._next(queue, pending, hedged)
+                    if name is not None:
+                        hedged = hedged or hedge
+                        self._count_hedge(name, hedge)
+                        hedge_at = start(name, hedge)
+                    elif hedge_at is not None and now >= hedge_at:
+                        hedge_at = None
+            raise errors[-1]
+        finally:
+            # requests that already run cannot be stopped, they finish in the background
+            for attempt in pending:
+                attempt.handle.cancel()
+
+    async def agenerate(self, model: "RoutedChatModel", messages: List[BaseMessage], stop, run_manager, kwargs) -> ChatResult:
+        models = dict(model.models)
+        queue = deque(self.order(list(models)))
+        config = _model_config(run_manager)
+        pending: List[_Attempt] = []
+        errors: List[BaseException] = []
+        hedged = not self.hedge
+
+        def start(name: str, hedge: bool) -> Optional[float]:
+            started = time.perf_counter()
+            task = asyncio.ensure_future(models[name].ainvoke(messages, config, stop=stop, **kwargs))
+            task.add_done_callback(lambda t: self._observe(name, started, t))
+            pending.append(_Attempt(name, started, hedge, task))
+            return None if hedged else started + self.hedge_after(name)
+
+        hedge_at = start(queue.popleft(), False)
+        try:
+            while pending:
+                await asyncio.wait([attempt.handle for attempt in pending], timeout=self._wait_time(pending, hedge_at), return_when=asyncio.FIRST_COMPLETED)
+                now = time.perf_counter()
+                for attempt in list(pending):
+                    if attempt.handle.done():
+                        pending.remove(attempt)
+                        error = attempt.handle.exception()
+                        if error is None:
+                            return self._won(attempt, attempt.handle.result(), bool(errors))
+                        if not is_fallback_error(error):
+                            raise error
+                        errors.append(error)
+                    elif self.timeout and now - attempt.started >= self.timeout:
+                        pending.remove(attempt)
+                        attempt.handle.cancel()
+                        errors.append(self._timed_out(attempt))
+                if not pending or (hedge_at is not None and now >= hedge_at):
+                    name, hedge = self._next(queue, pending, hedged)
+                    if name is not None:
+                        hedged = hedged or hedge
+                        self._count_hedge(name, hedge)
+                        hedge_at = start(name, hedge)
+                    elif hedge_at is not None and now >= hedge_at:
+                        hedge_at = None
+            raise errors[-1]
+        finally:
+            # the losing request is cancelled (closes its connection)
+            for attempt in pending:
+                attempt.handle.cancel()
+
+    # --- reporting --------------------------------------------------------------
+
+    def histograms(self) -> Dict[str, Dict[str, int]]:
+        labels = [f"le_{bound}s" for bound in HISTOGRAM_BUCKETS] + ["inf"]
+        with self._lock:
+            return {name: dict(zip(labels, stats.histogram.buckets)) for name, stats in self.stats.items()}
+
+    def report(self) -> str:
+        header = (
+            f"{'model':16} {'done':>6} {'p50 s':>7} {'p95 s':>7} {'wins':>6} {'hedges':>7} "
+            f"{'hedge wins':>11} {'fallback wins':>14} {'errors':>7} {'429':>5} {'timeouts':>9}"
+        )
+        lines = [header, "-" * len(header)]
+        for name, stats in sorted(self.stats.items()):
+            histogram = stats.histogram
+            p50, p95 = histogram.percentile(0.5), histogram.percentile(0.95)
+            lines.append(
+                f"{name:16} {histogram.count:6} {p50 or 0:7.2f} {p95 or 0:7.2f} {stats.wins:6} {stats.hedges:7} "
+                f"{stats.hedge_wins:11} {stats.fallback_wins:14} {stats.errors:7} {stats.rate_limited:5} {stats.timeouts:9}"
+            )
+        return "\n".join(lines)
+
+
+class RoutedChatModel(BaseChatModel):
+    """The chat model a node gets: one tier of models behind the router."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    node: str
+    tier: str
+    models: List[Tuple[str, Any]]
+    router: Any = Field(exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "model-router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        # part of the response cache key: another model list never gets an old answer
+        return {"node": self.node, "tier": self.tier, "models": [name for name, _ in self.models]}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any):
+        # same request kwargs ChatOpenAI.bind_tools would produce, handed to whichever model answers
+        kwargs["tools"] = [convert_to_openai_tool(tool) for tool in tools]
+        if tool_choice in ("any", "required", True):
+            kwargs["tool_choice"] = "required"
+        elif isinstance(tool_choice, str) and tool_choice not in ("auto", "none"):
+            kwargs["tool_choice"] = {"type": "function", "function": {"name": tool_choice}}
+        elif tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(**kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return self.router.generate(self, messages, stop, run_manager, kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return await self.router.agenerate(self, messages, stop, run_manager, kwargs)
+
+
+def _env_models(tier: str, default: Sequence[str]) -> List[str]:
+    names = os.getenv(f"MODELS_{tier.upper()}")
+    return [name.strip() for name in names.split(",") if name.strip()] if names else list(default)
+
+
+# clients are created on first use; OPENAI_REQUESTS_PER_SECOND (optional) is one token
+# bucket shared by every model of the router
+@lru_cache(maxsize=None)
+def get_model_router() -> ModelRouter:
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+    from shared.http_clients import pooled_chat_openai
+
+    requests_per_second = float(os.getenv("OPENAI_REQUESTS_PER_SECOND", "0"))
+    rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_second) if requests_per_second > 0 else None
+    # one retry inside the client, after that the router falls back to the next model;
+    # all models share one connection pool (shared/http_clients.py)
+    tiers = {
+        tier: [(name, pooled_chat_openai(model=name, rate_limiter=rate_limiter, max_retries=1)) for name in _env_models(tier, names)]
+        for tier, names in DEFAULT_TIERS.items()
+    }
+    timeout = float(os.getenv("MODEL_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS))
+    return ModelRouter(
+        tiers,
+        hedge=os.getenv("MODEL_HEDGE", "1") != "0",
+        hedge_delay=float(os.getenv("MODEL_HEDGE_DELAY", DEFAULT_HEDGE_DELAY)),
+        timeout=timeout or None,
+    )
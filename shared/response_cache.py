@@ -0,0 +1,430 @@
+"""
+Response cache for the llm chains (3_chains and 4_Reflexion_system)
+
+Regression runs and retries send the exact same prompts again and again. With the
+cache on, a repeated prompt is answered from disk instead of the api:
+
+    prompt ──► exact tier: memory (LRU) ──► sqlite ──hit──► cached AIMessage
+                   │ miss
+                   ▼
+               semantic tier (opt-in): embedding of the conversation part of the
+               prompt, nearest cached prompt of the same model + tools + system prompt
+               with cosine >= threshold ──hit──► cached AIMessage
+                   │ miss
+                   ▼
+               llm api ──► stored in both tiers
+
+- exact key = sha256 of LangChain's llm_string (model, temperature, ..., bound tools
+  and tool_choice) + the rendered messages, so a different model or tool never
+  gets an answer meant for another one
+- the semantic tier only embeds the conversation part of the prompt (system
+  messages are the same for every call of a chain and would make all prompts look
+  alike) and only compares prompts with the same llm_string and the same system
+  messages - a reflection prompt never matches a generation prompt
+- timestamps in the prompt (2025-01-31T10:22:03.123456) count only with their date
+  for the key and the partition, so a prompt that embeds now() can still hit; message
+  ids, usage and response metadata are not part of the key (never sent to the api)
+- the vectors of a partition are one NumPy matrix (unit rows), a semantic lookup is
+  one matrix-vector product
+- LRU in memory, oldest rows out on disk (max_disk_entries), entries expire after ttl
+- one ResponseCache per chain on top of one shared store, so every chain has its
+  own hit / miss counters: cache_report()
+
+It plugs into LangChain's own cache hook (BaseChatModel.cache), which is checked
+before the rate limiter, so cache hits never wait for the api budget.
+
+Turned on with environment variables, off by default:
+
+    LLM_CACHE=exact          exact tier only
+    LLM_CACHE=semantic       exact + semantic tier
+    LLM_CACHE_PATH=...       sqlite file (default .cache/llm_cache.sqlite)
+    LLM_CACHE_THRESHOLD=0.95 cosine similarity needed for a semantic hit
+
+The built-in embedding is a hashed bag of words (no model, no network). Any
+LangChain Embeddings object can be passed instead for real semantic matching.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.caches import BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_THRESHOLD = 0.95
+
+_WORD = re.compile(r"\w+")
+_TIMESTAMP = re.compile(r"(\d{4}-\d{2}-\d{2})[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?")
+
+
+# message fields that are never sent to the provider: a cached answer comes back with
+# other usage numbers (total_cost) and ids, the next prompt of the loop must still match
+_UNSENT_FIELDS = ("id", "usage_metadata", "response_metadata")
+
+
+def _stable(text: str) -> str:
+    # 2025-01-31T10:22:03.123456 -> 2025-01-31
+    return _TIMESTAMP.sub(r"\1", text)
+
+
+def _stable_prompt(prompt: str) -> str:
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return _stable(prompt)
+    if not isinstance(messages, list):
+        return _stable(prompt)
+    for message in messages:
+        kwargs = message.get("kwargs") if isinstance(message, dict) else None
+        if isinstance(kwargs, dict):
+            for field in _UNSENT_FIELDS:
+                kwargs.pop(field, None)
+    return _stable(json.dumps(messages, sort_keys=True))
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag of words hashed into `dimensions` buckets - cheap, local, deterministic."""
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in _WORD.findall(text.lower()):
+            vector[zlib.crc32(word.encode()) % self.dimensions] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+class _VectorSet:
+    """Unit vectors of one partition as rows of a matrix that grows by doubling."""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix: Optional[np.ndarray] = None
+
+    def add(self, key: str, vector: Sequence[float]) -> None:
+        row = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(row))
+        row = row / norm if norm else row
+        if key in self.rows:
+            self.matrix[self.rows[key]] = row
+            return
+        if self.matrix is None:
+            self.matrix = np.zeros((16, len(row)), dtype=np.float32)
+        elif len(self.keys) == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+        self.rows[key] = len(self.keys)
+        self.matrix[len(self.keys)] = row
+        self.keys.append(key)
+
+    def remove(self, key: str) -> None:
+        # the last row moves into the freed slot
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last = self.keys.pop()
+        if last != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last
+            self.rows[last] = row
+
+    def best(self, vector: Sequence[float]) -> Tuple[Optional[str], float]:
+        if not self.keys:
+            return None, 0.0
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if not norm:
+            return None, 0.0
+        scores = self.matrix[:len(self.keys)] @ (query / norm)
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+
+def _split_prompt(prompt: str) -> Tuple[str, str]:
+    # prompt is LangChain's serialized message list -> (system text, conversation text)
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return "", prompt
+    system, parts = [], []
+    for message in messages if isinstance(messages, list) else []:
+        kwargs = message.get("kwargs", {})
+        content = kwargs.get("content", "")
+        content = content if isinstance(content, str) else json.dumps(content)
+        if (message.get("id") or [""])[-1] == "SystemMessage":
+            system.append(content)
+            continue
+        parts.append(content)
+        for tool_call in kwargs.get("tool_calls") or []:
+            parts.append(json.dumps(tool_call.get("args", {})))
+    return "\n".join(system), "\n".join(parts)
+
+
+def _dump(generations: Sequence[Generation]) -> str:
+    # plain message dicts instead of langchain's load/dumps, which warns on load
+    return json.dumps([
+        {"message": message_to_dict(g.message), "generation_info": g.generation_info}
+        for g in generations
+        if isinstance(g, ChatGeneration)
+    ])
+
+
+def _load(payload: str) -> List[ChatGeneration]:
+    return [
+        ChatGeneration(message=messages_from_dict([item["message"]])[0], generation_info=item["generation_info"])
+        for item in json.loads(payload)
+    ]
+
+
+class ResponseStore:
+    """Storage shared by all chains: exact entries + (optional) embeddings per prompt."""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10_000,
+        embeddings: Optional[Embeddings] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.embeddings = embeddings
+
+        # key -> (stored_at, payload)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # partition -> vectors of its prompts, loaded from disk on first use
+        self._vectors: Dict[str, _VectorSet] = {}
+        self._lock = threading.Lock()
+
+        # path=None keeps everything in memory only
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    partition TEXT NOT NULL,    -- see partition()
+                    stored_at REAL NOT NULL,
+                    response TEXT NOT NULL,
+                    embedding TEXT              -- json list, only with the semantic tier
+                );
+                CREATE INDEX IF NOT EXISTS llm_cache_stored_at ON llm_cache (stored_at);
+                CREATE INDEX IF NOT EXISTS llm_cache_partition ON llm_cache (partition);
+                """
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\n{_stable_prompt(prompt)}".encode()).hexdigest()
+
+    @staticmethod
+    def partition(llm_string: str, system: str) -> str:
+        # semantic matches are only searched among prompts with the same model + tools + system text
+        return hashlib.sha256(f"{llm_string}\n{_stable(system)}".encode()).hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, payload: str) -> None:
+        # caller holds the lock
+        self._memory[key] = (stored_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_exact(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT stored_at, response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or self._expired(row[0]):
+                return None
+            self._remember(key, *row)
+            return row[1]
+
+    def _vectors_for(self, partition: str) -> _VectorSet:
+        # caller holds the lock
+        if partition not in self._vectors:
+            vectors = _VectorSet()
+            if self._db is not None:
+                rows = self._db.execute(
+                    "SELECT key, embedding FROM llm_cache WHERE partition = ? AND embedding IS NOT NULL AND stored_at > ?",
+                    (partition, time.time() - self.ttl_seconds),
+                ).fetchall()
+                for key, embedding in rows:
+                    vectors.add(key, json.loads(embedding))
+            self._vectors[partition] = vectors
+        return self._vectors[partition]
+
+    def get_similar(self, partition: str, vector: List[float], threshold: float) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            best_key, best_score = self._vectors_for(partition).best(vector)
+        if best_key is None or best_score < threshold:
+            return None
+        payload = self.get_exact(best_key)
+        return (payload, best_score) if payload is not None else None
+
+    def set(self, key: str, partition: str, payload: str, vector: Optional[List[float]] = None) -> None:
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, payload)
+            if vector is not None:
+                self._vectors_for(partition).add(key, vector)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, partition, stored_at, payload, json.dumps(vector) if vector is not None else None),
+            )
+            # keep only the newest max_disk_entries rows
+            evicted = self._db.execute(
+                "SELECT key, partition FROM llm_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?",
+                (self.max_disk_entries,),
+            ).fetchall()
+            if evicted:
+                self._db.executemany("DELETE FROM llm_cache WHERE key = ?", [(k,) for k, _ in evicted])
+                for old_key, old_partition in evicted:
+                    if old_partition in self._vectors:
+                        self._vectors[old_partition].remove(old_key)
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._vectors.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+
+class ResponseCache(BaseCache):
+    """LangChain cache for one chain: lookups go to the shared store, counters stay per chain."""
+
+    def __init__(self, name: str, store: ResponseStore, semantic: bool = False, threshold: float = DEFAULT_THRESHOLD):
+        self.name = name
+        self.store = store
+        self.semantic = semantic and store.embeddings is not None
+        self.threshold = threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, prompt: str, llm_string: str) -> Tuple[str, Optional[List[float]]]:
+        system, conversation = _split_prompt(prompt) if self.semantic else ("", "")
+        partition = ResponseStore.partition(llm_string, system)
+        if not self.semantic:
+            return partition, None
+        return partition, self.store.embeddings.embed_query(conversation)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[List[Generation]]:
+        payload = self.store.get_exact(ResponseStore.key(prompt, llm_string))
+        if payload is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return _load(payload)
+        if self.semantic:
+            match = self.store.get_similar(*self._vector(prompt, llm_string), self.threshold)
+            if match is not None:
+                with self._lock:
+                    self.semantic_hits += 1
+                return _load(match[0])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        partition, vector = self._vector(prompt, llm_string)
+        self.store.set(ResponseStore.key(prompt, llm_string), partition, _dump(return_val), vector)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+"""
+Wiring into the chains
+
+    llm = with_response_cache(get_llm("generation"), "generation")
+    chain = generation_prompt | llm
+
+with_response_cache returns a copy of the model with the cache attached (the
+underlying http client is shared), or the model unchanged when LLM_CACHE is not set.
+Bind tools after it, so they are part of the cache key.
+"""
+
+
+@lru_cache(maxsize=None)
+def get_response_store() -> ResponseStore:
+    semantic = os.getenv("LLM_CACHE", "").lower() == "semantic"
+    return ResponseStore(embeddings=HashingEmbeddings() if semantic else None)
+
+
+_caches: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(name: str) -> Optional[ResponseCache]:
+    mode = os.getenv("LLM_CACHE", "").lower()
+    if mode not in ("exact", "semantic"):
+        return None
+    if name not in _caches:
+        threshold = float(os.getenv("LLM_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+        _caches[name] = ResponseCache(name, get_response_store(), semantic=mode == "semantic", threshold=threshold)
+    return _caches[name]
+
+
+def with_response_cache(llm: Any, name: str) -> Any:
+    cache = get_response_cache(name)
+    if cache is None:
+        return llm
+    return llm.model_copy(update={"cache": cache})
+
+
+def cache_report() -> str:
+    header = f"{'chain':20} {'exact':>7} {'semantic':>9} {'miss':>6} {'hit rate':>9}"
+    lines = [header, "-" * len(header)]
+    for name, cache in sorted(_caches.items()):
+        s = cache.stats()
+        lines.append(f"{name:20} {s['exact_hits']:7} {s['semantic_hits']:9} {s['misses']:6} {s['hit_rate']:9.1%}")
+    return "\n".join(lines)
@@ -0,0 +1,15 @@
+"""
+Shared test helpers
+
+load_example (benchmarks/examples.py) imports a module of an example folder the
+way `python module.py` inside the folder would see it and hands every test fresh
+modules, so the folders do not shadow each other.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from benchmarks.examples import load_example  # noqa: E402,F401
@@ -0,0 +1,84 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from conftest import load_example
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Overwrite
+
+from shared.append_log import AppendChannel, AppendLog
+
+
+@pytest.mark.parametrize("typecode", [None, "q"])
+def test_extend_shares_the_buffer_and_keeps_old_snapshots(typecode):
+    first = AppendLog([1, 2], typecode)
+    second = first.extend([3])
+    third = second + [4, 5]
+    assert first == [1, 2] and second == [1, 2, 3] and third == [1, 2, 3, 4, 5]
+    # appending at the end of the buffer does not copy
+    assert third._buffer is first._buffer
+    assert third[-1] == 5 and third[1:3] == [2, 3] and list(second) == [1, 2, 3]
+    with pytest.raises(IndexError):
+        second[3]
+
+
+@pytest.mark.parametrize("typecode", [None, "q"])
+def test_fork_copies_on_write(typecode):
+    base = AppendLog([1, 2], typecode)
+    main = base.extend([3])
+    fork = base.extend([9])
+    assert fork == [1, 2, 9] and fork._buffer is not main._buffer and fork.typecode == typecode
+
+    # both branches keep growing without seeing each other
+    main, fork = main.extend([4]), fork.extend([8])
+    assert base == [1, 2] and main == [1, 2, 3, 4] and fork == [1, 2, 9, 8]
+
+
+def test_concurrent_forks_do_not_mix():
+    base = AppendLog(range(100), "q")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        logs = list(pool.map(lambda i: base.extend([1000 + i]), range(64)))
+    assert all(log.tolist() == list(range(100)) + [1000 + i] for i, log in enumerate(logs))
+    assert base == list(range(100))
+
+
+def test_snapshot_pickles_as_its_items():
+    log = AppendLog([1, 2, 3], "q").extend([4])
+    restored = pickle.loads(pickle.dumps(log))
+    assert restored == [1, 2, 3, 4] and restored.typecode == "q"
+
+
+def test_channel_copies_fork_and_checkpoint():
+    channel = AppendChannel("q")
+    channel.update([[1, 2], 3])
+    copy = channel.copy()
+    channel.update([[4]])
+    copy.update([7])
+    assert channel.get() == [1, 2, 3, 4] and copy.get() == [1, 2, 3, 7]
+
+    assert channel.checkpoint() == [1, 2, 3, 4]
+    restored = channel.from_checkpoint(channel.checkpoint())
+    restored.update([[5]])
+    assert restored.get() == [1, 2, 3, 4, 5] and channel.get() == [1, 2, 3, 4]
+
+    channel.update([Overwrite([0])])
+    assert channel.get() == [0] and copy.get() == [1, 2, 3, 7]
+    assert channel.update([]) is False
+
+
+def test_graph_fork_from_an_earlier_checkpoint():
+    graph = load_example("3_state_dive", "2_complex_state")["2_complex_state"].graph
+    app = graph.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "t"}}
+    result = app.invoke({"count": 0, "sum": 0, "history": []}, config)
+    assert result["history"] == [1, 2, 3, 4, 5]
+    original = app.get_state(config)
+
+    # time travel: change the history after the second step and run on from there
+    earlier = next(state for state in app.get_state_history(config) if state.values.get("count") == 2)
+    fork_config = app.update_state(earlier.config, {"history": [100]})
+    forked = app.invoke(None, fork_config)
+    assert forked["history"] == [1, 2, 100, 3, 4, 5]
+    # the first run's checkpoints are untouched by the fork
+    assert app.get_state(original.config).values["history"] == [1, 2, 3, 4, 5]
+    assert app.get_state(earlier.config).values["history"] == [1, 2]
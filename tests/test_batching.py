@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from conftest import load_example
+
+from shared.batching import run_pool
+
+
+def _collect(records, handle, concurrency):
+    async def main():
+        return [result async for result in run_pool(records, handle, concurrency=concurrency)]
+
+    # a pool whose workers died would wait forever
+    return asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+
+def test_results_of_every_record():
+    async def handle(record):
+        await asyncio.sleep(0.001 * (record["id"] % 3))
+        return {"id": record["id"], "answer": record["id"] * 2}
+
+    results = _collect(({"id": i} for i in range(50)), handle, concurrency=4)
+    assert sorted(result["answer"] for result in results) == [i * 2 for i in range(50)]
+
+
+def test_raising_handler_yields_error_results():
+    async def handle(record):
+        if record["id"] % 2:
+            raise KeyError("question")
+        return {"id": record["id"], "answer": "ok", "latency_s": 0.0}
+
+    results = _collect(({"id": i} for i in range(20)), handle, concurrency=2)
+    assert len(results) == 20
+    errors = sorted(result["id"] for result in results if "error" in result)
+    assert errors == list(range(1, 20, 2))
+    assert all(result["error"] == "KeyError: 'question'" and "latency_s" in result for result in results if "error" in result)
+
+
+def test_record_without_question_is_an_error_result():
+    batch_runner = load_example("4_Reflexion_system", "batch_runner")["batch_runner"]
+    app = SimpleNamespace(checkpointer=None)
+    result = asyncio.run(batch_runner.run_one(app, {"id": "7"}, max_iterations=1))
+    assert result["id"] == "7" and result["question"] is None
+    assert result["error"] == "KeyError: 'question'"
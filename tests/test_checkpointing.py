@@ -0,0 +1,73 @@
+import operator
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from shared.checkpointing import DeltaSqliteSaver, invoke_resumable
+
+
+class State(TypedDict):
+    log: Annotated[List[str], operator.add]
+
+
+def _app(saver, fail_at=None, steps=3):
+    def step(state: State):
+        if len(state["log"]) == fail_at:
+            raise RuntimeError("crash")
+        return {"log": [f"step {len(state['log'])}"]}
+
+    graph = StateGraph(State)
+    graph.add_node("step", step)
+    graph.add_edge(START, "step")
+    graph.add_conditional_edges("step", lambda state: END if len(state["log"]) > steps else "step")
+    return graph.compile(checkpointer=saver)
+
+
+def _kinds(saver, thread_id):
+    rows = saver.conn.execute(
+        "SELECT kind FROM blobs WHERE thread_id = ? AND channel = 'log' ORDER BY version", (thread_id,)
+    ).fetchall()
+    return [kind for (kind,) in rows]
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_appends_are_stored_as_deltas(tmp_path):
+    saver = DeltaSqliteSaver(str(tmp_path / "cp.sqlite"))
+    result = _app(saver).invoke({"log": ["question"]}, _config("t"))
+    assert result["log"] == ["question", "step 1", "step 2", "step 3"]
+    assert _kinds(saver, "t") == ["full", "delta", "delta", "delta"]
+    assert _app(saver).get_state(_config("t")).values == result
+
+
+def test_resume_after_crash_in_a_new_process(tmp_path):
+    path = str(tmp_path / "cp.sqlite")
+    with pytest.raises(RuntimeError):
+        invoke_resumable(_app(DeltaSqliteSaver(path), fail_at=2), {"log": ["question"]}, _config("t"))
+
+    # a fresh saver has nothing in memory: it reads the last value back and keeps writing deltas
+    saver = DeltaSqliteSaver(path)
+    result = invoke_resumable(_app(saver), {"log": ["ignored"]}, _config("t"))
+    assert result["log"] == ["question", "step 1", "step 2", "step 3"]
+    assert _kinds(saver, "t") == ["full", "delta", "delta", "delta"]
+    # a finished thread just returns its state
+    assert invoke_resumable(_app(saver), {"log": ["ignored"]}, _config("t")) == result
+
+
+def test_remembered_values_are_bounded(tmp_path):
+    saver = DeltaSqliteSaver(str(tmp_path / "cp.sqlite"), max_cached_threads=2)
+    app = _app(saver, steps=1)
+    for i in range(10):
+        app.invoke({"log": ["question"]}, _config(f"t{i}"))
+    assert list(saver._last) == [("t8", ""), ("t9", "")]
+
+    # an evicted thread continues with deltas on top of what is stored
+    app = _app(saver, steps=3)
+    assert app.invoke({"log": ["more"]}, _config("t0"))["log"] == ["question", "step 1", "more", "step 3"]
+    assert _kinds(saver, "t0")[-2:] == ["delta", "delta"]
+
+    saver.delete_thread("t0")
+    assert ("t0", "") not in saver._last
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+
+from shared.coalescing import CoalescingApp, run_fingerprint
+
+
+class State(TypedDict):
+    question: str
+    answer: str
+
+
+class SlowGraph:
+    """Counts how often the graph really ran; fails while `fail` is set."""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+        if self.fail:
+            raise ValueError("llm down")
+
+    def build(self):
+        def answer(state: State):
+            self._count()
+            time.sleep(0.05)
+            return {"answer": state["question"].upper()}
+
+        async def aanswer(state: State):
+            self._count()
+            await asyncio.sleep(0.05)
+            return {"answer": state["question"].upper()}
+
+        graph = StateGraph(State)
+        graph.add_node("answer", RunnableLambda(answer, afunc=aanswer))
+        graph.add_edge(START, "answer")
+        graph.add_edge("answer", END)
+        return graph.compile()
+
+
+@pytest.fixture
+def graph():
+    return SlowGraph()
+
+
+def _coalesced(graph, **kwargs):
+    return CoalescingApp(graph.build(), "test", **kwargs)
+
+
+async def _stream(app, question, **kwargs):
+    return [event async for event in app.astream_events({"question": question}, **kwargs)]
+
+
+def _names(events):
+    return [(event["event"], event["name"]) for event in events]
+
+
+def test_fingerprint_normalizes_input_and_skips_threads():
+    assert run_fingerprint({"question": "AI  Agents"}) == run_fingerprint({"question": "ai agents"})
+    assert run_fingerprint({"question": "a"}, {"configurable": {"max_iterations": 2}}) != run_fingerprint({"question": "a"})
+    assert run_fingerprint({"question": "a"}, {"configurable": {"thread_id": "t"}}) is None
+
+
+def test_ainvoke_and_streams_share_one_run(graph):
+    app = _coalesced(graph)
+
+    async def main():
+        return await asyncio.gather(
+            app.ainvoke({"question": "q"}),
+            _stream(app, "q"),
+            _stream(app, " Q "),
+            app.ainvoke({"question": "q"}),
+        )
+
+    first, stream_a, stream_b, second = asyncio.run(main())
+    assert graph.calls == 1
+    assert first == second == {"question": "q", "answer": "Q"}
+    assert _names(stream_a) == _names(stream_b)
+    assert stream_a[-1]["data"]["output"] == first
+    assert app.stats()["runs"] == 1 and app.stats()["joined"] == 3
+
+
+def test_ainvoke_joins_a_running_stream(graph):
+    app = _coalesced(graph)
+
+    async def main():
+        return await asyncio.gather(_stream(app, "q"), app.ainvoke({"question": "q"}))
+
+    events, output = asyncio.run(main())
+    assert graph.calls == 1
+    assert events[-1]["data"]["output"] == output
+
+
+def test_streams_with_other_arguments_share_a_run_of_their_own(graph):
+    app = _coalesced(graph)
+
+    async def main():
+        return await asyncio.gather(
+            app.ainvoke({"question": "q"}),
+            _stream(app, "q", include_names=["answer"]),
+            _stream(app, "q", include_names=["answer"]),
+        )
+
+    _, filtered_a, filtered_b = asyncio.run(main())
+    assert graph.calls == 2
+    assert filtered_a == filtered_b
+    assert {event["name"] for event in filtered_a} == {"answer"}
+
+
+def test_finished_result_is_reused_within_the_window(graph):
+    app = _coalesced(graph, result_window_seconds=60)
+    assert app.invoke({"question": "q"}) == {"question": "q", "answer": "Q"}
+    assert app.invoke({"question": "Q"}) == {"question": "q", "answer": "Q"}
+    assert graph.calls == 1 and app.stats()["reused"] == 1
+
+    # a stream needs events: the sync invoke did not record any
+    asyncio.run(_stream(app, "q"))
+    assert graph.calls == 2
+    asyncio.run(_stream(app, "q"))
+    assert graph.calls == 2
+
+
+def test_concurrent_sync_invokes_share_one_run(graph):
+    app = _coalesced(graph, result_window_seconds=0)
+    with ThreadPoolExecutor(8) as pool:
+        outputs = list(pool.map(lambda _: app.invoke({"question": "q"}), range(8)))
+    assert graph.calls == 1
+    assert all(output is outputs[0] for output in outputs)
+
+
+def test_thread_runs_are_not_shared(graph):
+    app = _coalesced(graph)
+    config = {"configurable": {"thread_id": "t"}}
+    app.invoke({"question": "q"}, config)
+    app.invoke({"question": "q"}, config)
+    assert graph.calls == 2
+
+
+def test_failed_run_raises_in_every_waiter_and_is_not_stored():
+    graph = SlowGraph(fail=True)
+    app = _coalesced(graph, result_window_seconds=60)
+
+    async def main():
+        return await asyncio.gather(app.ainvoke({"question": "q"}), _stream(app, "q"), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert graph.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+    graph.fail = False
+    assert app.invoke({"question": "q"})["answer"] == "Q"
+    assert app.stats()["failed"] == 1
@@ -0,0 +1,44 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from shared.execution import get_process_pool, with_execution
+
+
+# process nodes must be importable functions
+def _double(state):
+    return {"x": state["x"] * 2}
+
+
+def _kill_worker(state):
+    os._exit(1)
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setenv("NODE_PROCESS_WORKERS", "1")
+    get_process_pool.cache_clear()
+    yield
+    get_process_pool().shutdown()
+    get_process_pool.cache_clear()
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_next_node_after_a_dead_worker_gets_a_fresh_pool(process_pool, asynchronous):
+    double = with_execution(_double, "process")
+    die = with_execution(_kill_worker, "process")
+
+    def invoke(node, state):
+        return asyncio.run(node.ainvoke(state)) if asynchronous else node.invoke(state)
+
+    assert invoke(double, {"x": 2}) == {"x": 4}
+    with pytest.raises(BrokenProcessPool):
+        invoke(die, {"x": 1})
+    assert invoke(double, {"x": 3}) == {"x": 6}
+
+
+def test_process_node_gets_only_its_reads(process_pool):
+    node = with_execution(dict, "process", reads=("x",))
+    assert node.invoke({"x": 1, "big": "y" * 1000}) == {"x": 1}
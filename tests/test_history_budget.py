@@ -0,0 +1,78 @@
+import asyncio
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from shared.history_budget import areport_compaction, compact_history, count_tokens, report_compaction
+from shared.instrumentation import GraphMetrics
+
+HISTORY = [HumanMessage("question")] + [AIMessage("draft " + "word " * 200) for _ in range(8)]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_history_within_budget_is_left_alone(lazy):
+    messages, report = compact_history(HISTORY, max_tokens=count_tokens(HISTORY), lazy=lazy)
+    assert messages == HISTORY
+    assert (report.collapsed, report.dropped, report.tokens_saved) == (0, 0, 0)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_history_over_budget_is_compacted(lazy):
+    messages, report = compact_history(HISTORY, max_tokens=count_tokens(HISTORY) - 1, lazy=lazy)
+    assert messages[0] == HISTORY[0] and messages[-4:] == HISTORY[-4:]
+    assert report.collapsed and report.tokens_saved > 0
+
+
+def _reflexion_turn(i):
+    # a draft with its tool call and the search results answering it
+    draft = AIMessage("", tool_calls=[{"name": "AnswerQuestion", "args": {"answer": "draft " * 300}, "id": f"call_{i}"}])
+    results = ToolMessage('{"q": [{"url": "https://example.com", "content": "%s"}]}' % ("result " * 1500), tool_call_id=f"call_{i}")
+    return [draft, results]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_short_body_over_budget_is_compacted(lazy):
+    # 3 iterations: a body of 6 messages, shorter than the 2 * keep_last a lazy step needs
+    history = [HumanMessage("question")] + [message for i in range(3) for message in _reflexion_turn(i)]
+    max_tokens = count_tokens(history) - 1
+    messages, report = compact_history(history, max_tokens=max_tokens, lazy=lazy)
+    assert report.tokens_after <= max_tokens and report.collapsed + report.dropped == 2
+    assert messages[0] == history[0] and messages[-4:] == history[-4:]
+
+
+class State(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+
+
+def _app():
+    def compact(state: State):
+        messages, report = compact_history(state["messages"], max_tokens=500)
+        report_compaction(report)
+        return {"messages": [AIMessage("done")]}
+
+    async def acompact(state: State):
+        messages, report = compact_history(state["messages"], max_tokens=500)
+        await areport_compaction(report)
+        return {"messages": [AIMessage("done")]}
+
+    graph = StateGraph(State)
+    graph.add_node("compact", compact)
+    graph.add_node("acompact", acompact)
+    graph.add_edge(START, "compact")
+    graph.add_edge("compact", "acompact")
+    graph.add_edge("acompact", END)
+    return graph.compile()
+
+
+def test_saved_tokens_reach_graph_metrics():
+    metrics = GraphMetrics()
+    asyncio.run(_app().ainvoke({"messages": HISTORY}, {"callbacks": [metrics]}))
+    saved = {event["node"]: event["history_tokens_saved"] for event in metrics.events}
+    assert saved["compact"] > 0 and saved["acompact"] > 0
+    assert 'langgraph_node_history_tokens_saved_total{node="compact"}' in metrics.openmetrics()
+
+    # outside of a graph run there is nobody to report to
+    report_compaction(compact_history(HISTORY, max_tokens=500)[1])
@@ -0,0 +1,49 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stub_server import start_stub_server
+from shared.http_clients import apost_json, get_aiohttp_session, http_pool_stats, post_json
+
+
+@pytest.fixture
+def search_url():
+    server, base_url = start_stub_server()
+    yield server, f"{base_url}/search"
+    server.shutdown()
+    server.server_close()
+
+
+def test_threads_share_one_sync_pool(search_url):
+    server, url = search_url
+    # the first calls race to build the client: they must still end up on one pool
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: post_json(url, {"query": f"q{i}"}), range(64)))
+    assert all(result["results"] for result in results)
+    assert server.requests == 64 and server.connections <= 8
+
+
+def test_async_searches_share_a_session_per_loop(search_url):
+    server, url = search_url
+
+    async def run():
+        session = await get_aiohttp_session()
+        semaphore = asyncio.Semaphore(4)
+
+        async def one(i):
+            async with semaphore:
+                return await apost_json(url, {"query": f"q{i}"})
+
+        results = await asyncio.gather(*(one(i) for i in range(32)))
+        assert await get_aiohttp_session() is session
+        return session, results
+
+    before = http_pool_stats()["requests"]
+    first, results = asyncio.run(run())
+    second, _ = asyncio.run(run())
+    assert all(result["results"] for result in results)
+    # a new loop gets a new session, the finished loop closed its own
+    assert first is not second and first.closed and second.closed
+    assert server.requests == 64 and server.connections <= 8
+    assert http_pool_stats()["requests"] - before == 64
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from shared.local_search import LocalSearchIndex, local_search, local_search_results, main
+
+DOCS = [
+    {"url": "https://example.com/ai", "title": "AI", "content": "small business owners use ai tools to grow sales"},
+    {"url": "https://example.com/pasta", "title": "Pasta", "content": "tomato pasta recipe with basil and garlic"},
+    {"url": "https://example.com/bikes", "title": "Bikes", "content": "commuting by bike in the city saves time"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LocalSearchIndex(str(tmp_path / "index"))
+    index.add([dict(doc) for doc in DOCS])
+    return index
+
+
+def _urls(results):
+    return [result["url"] for result in results]
+
+
+def test_add_and_search(index):
+    assert _urls(index.search("ai tools for small business", k=2))[0] == "https://example.com/ai"
+    assert index.search("quantum chromodynamics") == []
+    assert index.stats()["docs"] == 3 and index.stats()["segments"] == 1
+
+
+def test_adding_the_same_documents_again_is_a_no_op(index):
+    report = index.add([dict(doc) for doc in DOCS])
+    assert report == {"read": 3, "added": 0, "unchanged": 3, "replaced": 0}
+    assert index.stats()["segments"] == 1
+
+
+def test_changed_document_replaces_the_old_copy(index):
+    changed = {**DOCS[1], "content": "pizza dough with tomato sauce"}
+    report = index.add([changed, {"url": "https://example.com/new", "title": "", "content": "sourdough bread"}])
+    assert report == {"read": 2, "added": 2, "unchanged": 0, "replaced": 1}
+
+    results = index.search("tomato", k=5)
+    assert [r["content"] for r in results] == ["pizza dough with tomato sauce"]
+    assert index.search("basil garlic") == []
+    stats = index.stats()
+    assert (stats["segments"], stats["docs"], stats["live_docs"]) == (2, 5, 4)
+
+    # another process opening the index sees the same
+    assert _urls(LocalSearchIndex(str(index.path)).search("tomato")) == [DOCS[1]["url"]]
+
+
+def test_compact_drops_dead_documents_and_keeps_results(index):
+    index.add([{**DOCS[1], "content": "pizza dough with tomato sauce"}])
+    before = {query: index.search(query) for query in ("tomato", "ai tools", "bike city")}
+    old_segments = [segment.directory for segment in index.segments]
+
+    assert index.compact() == {"segments": 2, "docs": 3}
+    stats = index.stats()
+    assert (stats["segments"], stats["docs"], stats["live_docs"]) == (1, 3, 3)
+    assert {query: _urls(index.search(query)) for query in before} == {q: _urls(r) for q, r in before.items()}
+    assert not any(directory.exists() for directory in old_segments)
+
+
+def test_dense_vectors_survive_compaction(tmp_path):
+    index = LocalSearchIndex(str(tmp_path / "index"))
+    index.add([dict(doc) for doc in DOCS], dense_dimensions=64)
+    index.add([{**DOCS[2], "content": "cycling to work across town"}])
+    index.compact()
+    vectors = np.asarray(index.segments[0].vectors)
+    assert vectors.shape == (3, 64)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    assert _urls(index.search("cycling to work"))[0] == DOCS[2]["url"]
+
+
+def test_tools_have_the_tavily_result_shapes(index):
+    results = local_search_results(max_results=1, index_path=str(index.path)).invoke("ai tools")
+    assert results[0].keys() == {"title", "url", "content", "score"}
+    answer = local_search(max_results=1, search_depth="basic", index_path=str(index.path)).invoke("ai tools")
+    assert answer["query"] == "ai tools" and _urls(answer["results"]) == [DOCS[0]["url"]]
+
+
+@pytest.mark.parametrize("index_first", [True, False])
+def test_cli_takes_the_index_before_or_after_the_command(tmp_path, capsys, index_first):
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text('{"url": "https://example.com/a", "content": "ai tools for small business"}\n')
+    path = str(tmp_path / "index")
+    command = ["add", str(corpus)]
+    main(["--index", path, *command] if index_first else [*command, "--index", path])
+    main(["search", "small business", "--index", path])
+    assert "https://example.com/a" in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.fakes import RateLimitError, ScriptedChatModel
+from shared.model_router import ModelRouter
+
+
+def _model(name, latency=0.0, error=None, answered=None):
+    def respond(messages, call_number):
+        if answered is not None:
+            answered.append(time.perf_counter())
+        return AIMessage(content=name)
+
+    return ScriptedChatModel(responder=respond, latency=latency, error_for=(lambda call: error) if error else None)
+
+
+def _call(router, asynchronous):
+    llm = router.for_node("reflection")
+    if asynchronous:
+        return asyncio.run(llm.ainvoke([HumanMessage("q")]))
+    return llm.invoke([HumanMessage("q")])
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_hedge_fires_after_the_p95_and_the_first_answer_wins(asynchronous):
+    answered = []
+    slow, fast = _model("slow", latency=1.0), _model("fast", answered=answered)
+    router = ModelRouter({"fast": [("slow", slow), ("fast", fast)]}, {"reflection": "fast"},
+                         hedge_delay=10.0, min_samples=3)
+    for _ in range(3):
+        router._stats("slow").histogram.observe(0.3)
+
+    started = time.perf_counter()
+    answer = _call(router, asynchronous)
+    # the hedge waits for slow's p95 (0.3s), not for hedge_delay or for slow's answer
+    assert answer.content == "fast"
+    assert 0.3 <= answered[0] - started < 0.9
+    assert router.stats["fast"].hedges == 1 and router.stats["fast"].hedge_wins == 1
+    assert router.stats["slow"].wins == 0
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+@pytest.mark.parametrize("error", [RateLimitError("429 too many requests"), TimeoutError("read timed out")])
+def test_fallback_error_goes_to_the_next_model(error, asynchronous):
+    first, second = _model("first", error=error), _model("second")
+    router = ModelRouter({"fast": [("first", first), ("second", second)]}, {"reflection": "fast"}, hedge=False)
+
+    assert _call(router, asynchronous).content == "second"
+    assert router.stats["first"].errors == 1 and router.stats["second"].fallback_wins == 1
+    assert router.stats["first"].rate_limited == isinstance(error, RateLimitError)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_no_answer_within_the_timeout_falls_back(asynchronous):
+    first, second = _model("first", latency=1.0), _model("second")
+    router = ModelRouter({"fast": [("first", first), ("second", second)]}, {"reflection": "fast"},
+                         hedge=False, timeout=0.2)
+
+    started = time.perf_counter()
+    assert _call(router, asynchronous).content == "second"
+    assert time.perf_counter() - started < 0.9
+    assert router.stats["first"].timeouts == 1 and router.stats["second"].fallback_wins == 1
+
+
+def test_rate_limited_model_is_skipped_while_it_cools_down():
+    first, second = _model("first", error=RateLimitError("429")), _model("second")
+    router = ModelRouter({"fast": [("first", first), ("second", second)]}, {"reflection": "fast"}, hedge=False)
+
+    assert _call(router, False).content == "second"
+    assert router.order(["first", "second"]) == ["second", "first"]
+    # the next calls go straight to the second model, the first one is not asked again
+    assert _call(router, False).content == "second" and _call(router, True).content == "second"
+    assert first.calls == 1 and second.calls == 3
+
+    router.stats["first"].cooling_until = 0.0
+    assert router.order(["first", "second"]) == ["first", "second"]
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_other_errors_are_raised_without_fallback(asynchronous):
+    first, second = _model("first", error=ValueError("bad request")), _model("second")
+    router = ModelRouter({"fast": [("first", first), ("second", second)]}, {"reflection": "fast"}, hedge=False)
+
+    with pytest.raises(ValueError, match="bad request"):
+        _call(router, asynchronous)
+    assert second.calls == 0
@@ -0,0 +1,66 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future
+
+import pytest
+from conftest import load_example
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.fakes import ScriptedChatModel
+from shared.model_router import ModelRouter
+
+modules = load_example("4_Reflexion_system", "execute_tools")
+pipelined_search, execute_tools = modules["pipelined_search"], modules["execute_tools"]
+
+REQUEST = contextvars.ContextVar("request", default=None)
+
+
+def _responder(prefix):
+    def respond(messages, call_number):
+        args = {"answer": "short", "search_queries": [f"{prefix} query {i}" for i in range(3)], "reflection": {}}
+        return AIMessage(content="", tool_calls=[{"name": "AnswerQuestion", "args": args, "id": "call_1"}])
+    return respond
+
+
+def test_prefetched_search_runs_in_the_callers_context():
+    prefetch = pipelined_search.SearchPrefetch(lambda query: (query, REQUEST.get()))
+    REQUEST.set("request-42")
+    prefetch.start("ai agents")
+    assert prefetch.take("AI agents").result(timeout=5) == ("ai agents", "request-42")
+
+
+def test_sync_node_does_not_wait_forever_for_a_prefetched_search():
+    started = time.monotonic()
+    result = execute_tools._prefetched_result(Future(), timeout=0.05)
+    assert result == {"error": "search timed out after 0.05s"}
+    assert time.monotonic() - started < 1
+
+
+def _hedged_router():
+    # the slow model streams its queries, then hedge_delay passes and the fast one answers first
+    slow = ScriptedChatModel(responder=_responder("slow"), latency=3.0, chunk_chars=8)
+    fast = ScriptedChatModel(responder=_responder("fast"))
+    router = ModelRouter({"strong": [("slow", slow), ("fast", fast)]}, {"revisor": "strong"},
+                         hedge_delay=2.0, cooldown=0.0)
+    return router.for_node("revisor")
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_only_the_answer_the_router_returns_is_prefetched(asynchronous):
+    searched = []
+    prefetch = pipelined_search.SearchPrefetch(lambda query: searched.append(query) or [])
+    config = pipelined_search.prefetch_config({}, prefetch)
+    model = _hedged_router()
+
+    if asynchronous:
+        answer = asyncio.run(model.ainvoke([HumanMessage("q")], config))
+    else:
+        answer = model.invoke([HumanMessage("q")], config)
+
+    queries = answer.tool_calls[0]["args"]["search_queries"]
+    assert queries[0].startswith("fast")
+    # the slow attempt's searches were started while it led, and dropped once it lost
+    assert prefetch.stats()["discarded"] >= 1
+    assert all(prefetch.take(query) is not None for query in queries)
+    assert prefetch.stats()["pending"] == 0
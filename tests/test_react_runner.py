@@ -0,0 +1,50 @@
+import pytest
+from conftest import load_example
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+react_runner = load_example("2_introduction", "react_runner")["react_runner"]
+
+KEY = react_runner.tool_call_key("tavily_search", {"query": "weather sf"})
+ERRORS = [
+    {"error": "ConnectionError(MaxRetryError())"},
+    '{"error": "ConnectionError(MaxRetryError())"}',
+    "{'error': ConnectionError(MaxRetryError(...))}",
+]
+
+
+def _tool_message(content, status="success"):
+    return ToolMessage(content=content, tool_call_id="call_1", name="tavily_search", status=status)
+
+
+@pytest.mark.parametrize("content", ERRORS)
+def test_shared_cache_does_not_store_tool_errors(content):
+    cache = react_runner.ToolResultCache()
+    _, running, owner = cache.lookup(KEY)
+    assert owner
+    cache.finish(KEY, _tool_message(content))
+
+    # joined waiters are told to run the tool themselves
+    assert running.result() is None
+    cached, _, owner = cache.lookup(KEY)
+    assert cached is None and owner
+
+
+def test_shared_cache_stores_results():
+    cache = react_runner.ToolResultCache()
+    cache.lookup(KEY)
+    cache.finish(KEY, _tool_message('{"results": []}'))
+    cached, _, owner = cache.lookup(KEY)
+    assert cached == ('{"results": []}', None) and not owner
+
+
+@pytest.mark.parametrize("content", ERRORS)
+def test_run_history_does_not_reuse_tool_errors(content):
+    messages = [
+        HumanMessage("weather?"),
+        AIMessage(content="", tool_calls=[{"name": "tavily_search", "args": {"query": "Weather  SF"}, "id": "call_1"}]),
+        _tool_message(content),
+    ]
+    assert react_runner._earlier_result(messages, KEY) is None
+
+    messages[-1] = _tool_message('{"results": []}')
+    assert react_runner._earlier_result(messages, KEY) is messages[-1]
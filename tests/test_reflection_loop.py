@@ -0,0 +1,39 @@
+import itertools
+
+from conftest import load_example
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+WORDS = ["cats", "rockets", "gardens", "oceans", "guitars", "mountains"]
+
+
+def _app():
+    basic = load_example("3_chains", "basic")["basic"]
+    drafts, critiques = itertools.count(), itertools.count()
+
+    def generate(_):
+        n = next(drafts)
+        return AIMessage(f"a tweet about {WORDS[n]} and {WORDS[-n - 1]}",
+                         usage_metadata={"input_tokens": 90, "output_tokens": 10, "total_tokens": 100})
+
+    def reflect(_):
+        return AIMessage(f"critique {next(critiques)}: add hashtags",
+                         usage_metadata={"input_tokens": 45, "output_tokens": 5, "total_tokens": 50})
+
+    basic.get_generation_chain = lambda: RunnableLambda(generate)
+    basic.get_reflection_chain = lambda: RunnableLambda(reflect)
+    return basic.build_reflection_app()
+
+
+def test_token_budget_uses_the_running_total_of_every_call():
+    result = _app().invoke(HumanMessage("write a tweet"), {"configurable": {"max_tokens": 300}})
+    # generate 100, reflect 150, generate 250, reflect 300, generate 400 >= 300
+    assert [m.response_metadata.get("tokens_spent") for m in result[1:]] == [100, 150, 250, 300, 400]
+    assert result[-1].response_metadata["stop_reason"] == "token_budget"
+
+
+def test_without_budget_the_message_limit_ends_the_loop():
+    result = _app().invoke(HumanMessage("write a tweet"))
+    assert len(result) == 8
+    assert result[-1].response_metadata["stop_reason"] == "max_messages"
+    assert result[-1].response_metadata["tokens_spent"] == 4 * 100 + 3 * 50
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pytest
+from conftest import load_example
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import FakeSearchTool, ScriptedChatModel, reflexion_responder
+from shared.instrumentation import GraphMetrics
+
+
+def _app(latency=0.0):
+    modules = load_example("4_Reflexion_system", "reflexion_graph")
+    graph, chains, tools, cache = (
+        modules["reflexion_graph"], modules["chains"], modules["execute_tools"], modules["search_cache"]
+    )
+    model = ScriptedChatModel(responder=reflexion_responder(), latency=latency)
+    search = FakeSearchTool()
+    graph.get_first_responder_chain = lambda: chains.first_responder_prompt_template | model
+    graph.get_revisor_chain = lambda: chains.revisor_prompt_template | model
+    tools.get_cached_tavily_tool = lambda: cache.CachedSearchTool(search, cache.SearchCache(path=None))
+    return graph.build_reflexion_app()
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_search_shaping_reaches_graph_metrics(asynchronous):
+    app, metrics = _app(), GraphMetrics()
+    inputs = {"messages": [HumanMessage("Write about how small business can leverage AI to grow")]}
+    config = {"configurable": {"max_iterations": 2}, "callbacks": [metrics]}
+    if asynchronous:
+        asyncio.run(app.ainvoke(inputs, config))
+    else:
+        app.invoke(inputs, config)
+
+    searches = [event for event in metrics.events if event["node"] == "execute_tools"]
+    assert searches
+    for event in searches:
+        assert event["search_raw_chars"] > event["search_compact_chars"] > 0
+    assert metrics.totals["draft"]["search_raw_chars"] == 0
+    assert 'langgraph_node_search_raw_chars_total{node="execute_tools"}' in metrics.openmetrics()
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_run_budget_includes_the_draft_call(asynchronous):
+    app = _app(latency=0.3)
+    inputs = {"messages": [HumanMessage("Write about how small business can leverage AI to grow")]}
+    config = {"configurable": {"max_iterations": 1}}
+    before = time.time()
+    result = asyncio.run(app.ainvoke(inputs, config)) if asynchronous else app.invoke(inputs, config)
+    # taken before the first responder ran, not when it returned
+    assert before <= result["started_at"] < before + 0.3
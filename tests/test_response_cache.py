@@ -0,0 +1,85 @@
+import json
+import re
+
+from conftest import load_example
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, messages_to_dict
+from langchain_core.outputs import ChatGeneration
+
+from shared.response_cache import HashingEmbeddings, ResponseCache, ResponseStore
+
+LLM = "model=gpt-4o-mini tools=AnswerQuestion"
+
+
+def _prompt(system: str, question: str) -> str:
+    # the serialized message list LangChain hands to the cache
+    return json.dumps([{"id": ["SystemMessage"], "kwargs": {"content": system}},
+                       {"id": ["HumanMessage"], "kwargs": {"content": question}}])
+
+
+def _answer(text: str):
+    return [ChatGeneration(message=AIMessage(text))]
+
+
+def test_exact_hit_ignores_time_of_day_in_prompt(tmp_path):
+    cache = ResponseCache("first_responder", ResponseStore(path=str(tmp_path / "llm.sqlite")))
+    cache.update(_prompt("Current time: 2025-01-31T10:22:03.123456", "ai agents"), LLM, _answer("draft"))
+
+    hit = cache.lookup(_prompt("Current time: 2025-01-31T17:01:59.000001", "ai agents"), LLM)
+    assert hit[0].message.content == "draft"
+    # another day, another tool binding: a different prompt
+    assert cache.lookup(_prompt("Current time: 2025-02-01T10:22:03.123456", "ai agents"), LLM) is None
+    assert cache.lookup(_prompt("Current time: 2025-01-31T10:22:03.123456", "ai agents"), LLM + "x") is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_exact_hit_survives_restart(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    ResponseCache("generation", ResponseStore(path=path)).update(_prompt("s", "q"), LLM, _answer("tweet"))
+    assert ResponseCache("generation", ResponseStore(path=path)).lookup(_prompt("s", "q"), LLM)[0].message.content == "tweet"
+
+
+def test_semantic_hit_within_partition_only(tmp_path):
+    store = ResponseStore(path=str(tmp_path / "llm.sqlite"), embeddings=HashingEmbeddings())
+    cache = ResponseCache("revisor", store, semantic=True, threshold=0.8)
+    cache.update(_prompt("system a", "how can small business use ai to grow"), LLM, _answer("answer"))
+
+    near = cache.lookup(_prompt("system a", "how can a small business use ai to grow"), LLM)
+    assert near[0].message.content == "answer"
+    assert cache.lookup(_prompt("system b", "how can a small business use ai to grow"), LLM) is None
+    assert cache.lookup(_prompt("system a", "pasta recipes with tomato"), LLM) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+    # vectors are loaded back from disk
+    reopened = ResponseCache("revisor", ResponseStore(path=str(tmp_path / "llm.sqlite"), embeddings=HashingEmbeddings()),
+                             semantic=True, threshold=0.8)
+    assert reopened.lookup(_prompt("system a", "how can a small business use ai to grow"), LLM) is not None
+
+
+def test_evicted_entries_leave_the_semantic_index(tmp_path):
+    store = ResponseStore(path=str(tmp_path / "llm.sqlite"), embeddings=HashingEmbeddings(), max_disk_entries=2)
+    cache = ResponseCache("revisor", store, semantic=True, threshold=0.99)
+    for i in range(40):
+        cache.update(_prompt("s", f"question number {i}"), LLM, _answer(str(i)))
+    partition = ResponseStore.partition(LLM, "s")
+    assert len(store._vectors[partition].keys) == 2
+    assert cache.lookup(_prompt("s", "question number 39"), LLM)[0].message.content == "39"
+
+
+def test_reflexion_prompt_time_is_not_unique_per_call():
+    chains = load_example("4_Reflexion_system", "chains")["chains"]
+    first = chains.actor_prompt_template.partial(first_instruction="x").format_messages(messages=[HumanMessage("q")])
+    second = chains.actor_prompt_template.partial(first_instruction="x").format_messages(messages=[HumanMessage("q")])
+    assert first == second
+    assert isinstance(first[0], SystemMessage)
+    assert re.search(r"Current time: \d{4}-\d{2}-\d{2}\n", first[0].content)
+    assert messages_to_dict(first) == messages_to_dict(second)
+
+
+def test_usage_and_ids_of_earlier_answers_are_not_part_of_the_key():
+    # a cached answer comes back with other usage numbers, the next prompt must still hit
+    draft = AIMessage("draft", id="run-1", usage_metadata={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2})
+    cached = AIMessage("draft", id="run-2", usage_metadata={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2,
+                                                            "total_cost": 0})
+    first = json.dumps([{"id": ["AIMessage"], "kwargs": m["data"]} for m in messages_to_dict([HumanMessage("q"), draft])])
+    second = json.dumps([{"id": ["AIMessage"], "kwargs": m["data"]} for m in messages_to_dict([HumanMessage("q"), cached])])
+    assert ResponseStore.key(first, LLM) == ResponseStore.key(second, LLM)
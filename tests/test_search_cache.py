@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from conftest import load_example
+
+search_cache = load_example("4_Reflexion_system", "search_cache")["search_cache"]
+
+
+class FlakySearchTool:
+    """Fails like TavilySearchResults (returns repr(e)) until `up` is set."""
+
+    max_results = 5
+
+    def __init__(self, failure):
+        self.failure = failure
+        self.up = False
+        self.calls = 0
+
+    def _answer(self, query):
+        self.calls += 1
+        if not self.up:
+            return self.failure
+        return [{"url": "https://example.com", "content": f"about {query}"}]
+
+    def invoke(self, query):
+        return self._answer(query)
+
+    async def ainvoke(self, query):
+        return self._answer(query)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return search_cache.SearchCache(path=str(tmp_path / "search.sqlite"))
+
+
+def test_memory_and_disk_hit_for_normalized_query(tmp_path, cache):
+    cache.set("AI tools  for Small Business", 5, [{"url": "u", "content": "c"}])
+    assert cache.get("ai tools for small business", 5) == [{"url": "u", "content": "c"}]
+
+    reopened = search_cache.SearchCache(path=str(tmp_path / "search.sqlite"))
+    assert reopened.get("ai tools for small business", 5) == [{"url": "u", "content": "c"}]
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.get("ai tools for small business", 3) is None
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = search_cache.SearchCache(path=str(tmp_path / "search.sqlite"), ttl_seconds=-1)
+    cache.set("query", 5, [])
+    assert cache.get("query", 5) is None
+
+
+@pytest.mark.parametrize("failure", [
+    "ConnectError('[Errno 111] Connection refused')",
+    {"error": "ConnectionError(MaxRetryError())"},
+])
+def test_failed_search_is_not_cached(tmp_path, cache, failure):
+    tool = FlakySearchTool(failure)
+    cached = search_cache.CachedSearchTool(tool, cache)
+
+    assert cached.invoke("ai agents") == failure
+    assert asyncio.run(cached.ainvoke("ai agents")) == failure
+
+    # the api is back: the next call goes to the tool instead of serving the error
+    tool.up = True
+    assert cached.invoke("ai agents")[0]["url"] == "https://example.com"
+    assert tool.calls == 3
+    # and a fresh process does not find the error on disk either
+    reopened = search_cache.SearchCache(path=str(tmp_path / "search.sqlite"))
+    assert isinstance(reopened.get("ai agents", 5, cached.source), list)
+
+
+def test_successful_search_is_cached(cache):
+    tool = FlakySearchTool(None)
+    tool.up = True
+    cached = search_cache.CachedSearchTool(tool, cache)
+    cached.invoke("ai agents")
+    cached.invoke("AI  agents")
+    assert tool.calls == 1
+
+
+def test_backends_do_not_answer_for_each_other(tmp_path):
+    # SEARCH_BACKEND=tavily and =local share the cache file, not the entries
+    tavily, local = FlakySearchTool(None), FlakySearchTool(None)
+    tavily.up = local.up = True
+    tavily.name, local.name = "tavily_search_results_json", "local_search_results_json"
+    path = str(tmp_path / "search.sqlite")
+
+    search_cache.CachedSearchTool(tavily, search_cache.SearchCache(path=path)).invoke("ai agents")
+    search_cache.CachedSearchTool(local, search_cache.SearchCache(path=path)).invoke("ai agents")
+    assert (tavily.calls, local.calls) == (1, 1)
+
+    search_cache.CachedSearchTool(local, search_cache.SearchCache(path=path)).invoke("ai agents")
+    assert local.calls == 1